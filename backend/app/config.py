@@ -4,3 +4,6 @@ from dotenv import load_dotenv
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Worker threads running background timetable generation jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
@@ -2,7 +2,7 @@ from sqlalchemy.orm import Session
 from app.models.timetables import Timetable
 from uuid import UUID
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Optional
 
 def create_timetable(db: Session, timetable_data: dict):
     timetable = Timetable(**timetable_data)
@@ -58,6 +58,22 @@ def save_timetable_json(
     db.commit()
     return existing
 
+def get_timetable_json(
+        db: Session,
+        dept: str,
+        sem: int,
+        user_id: Optional[str] = None
+) -> Optional[dict]:
+    """
+    The saved timetable_json of a department/semester: the user's own when
+    user_id is given, otherwise the most recently saved one.
+    """
+    query = db.query(Timetable).filter_by(department_name=dept, semester_number=sem)
+    if user_id:
+        query = query.filter(Timetable.user_id == UUID(user_id))
+    timetable = query.order_by(Timetable.created_at.desc()).first()
+    return timetable.timetable_json if timetable else None
+
 # timetables.py - Update the get_timetables_by_user function in CRUD
 def get_timetables_by_user(db: Session, user_id: str):
     try:
@@ -76,9 +92,17 @@ def get_timetable(db: Session, timetable_id: int):
     """
     return db.query(Timetable).filter(Timetable.id == timetable_id).first()
 
-def delete_timetable(db: Session, timetable: Timetable):
+def delete_timetable(db: Session, timetable: Timetable, on_delete: Optional[Callable[[], None]] = None):
     """
-    Delete a timetable.
+    Delete a timetable. ``on_delete`` runs after the row is flushed and
+    before the commit; if it raises, the deletion is rolled back.
     """
     db.delete(timetable)
+    if on_delete is not None:
+        try:
+            db.flush()
+            on_delete()
+        except Exception:
+            db.rollback()
+            raise
     db.commit()
\ No newline at end of file
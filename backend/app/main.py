@@ -1,5 +1,6 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.routers import (
     departments,
     semesters,
@@ -9,6 +10,9 @@ from app.routers import (
     timetables,
     excel
 )
+from app.services.job_service import job_pool
+from app.services.multistart_service import shutdown_pool
+from app.utils.metrics import MetricsMiddleware
 
 app = FastAPI(
     title="Timetable",
@@ -24,6 +28,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(departments.router)
 app.include_router(semesters.router)
@@ -33,6 +38,20 @@ app.include_router(faculty_assignments.router)
 app.include_router(timetables.router)
 app.include_router(excel.router)
 
+@app.on_event("startup")
+def start_job_workers():
+    job_pool.start()
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    job_pool.stop()
+    shutdown_pool()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/")
 def root():
     return {"message": "Welcome to Timetable API"}
\ No newline at end of file
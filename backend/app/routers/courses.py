@@ -4,6 +4,8 @@ from app.database import SessionLocal
 from app.crud import courses as crud_courses
 from typing import List, Optional
 from app.schemas.courses import CourseBase
+from app.services.cache_service import invalidate_cache
+from app.utils.redis_client import get_redis
 
 router = APIRouter(prefix="/courses", tags=["courses"])
 
@@ -22,6 +24,7 @@ def add_course(course_data: CourseBase, db: Session = Depends(get_db)):
         department_name, semester_number, code, name, t_hrs, tu_hrs, p_hrs, credits
     """
     course = crud_courses.create_course(db, course_data.dict())
+    invalidate_cache(get_redis(), course.department_name, course.semester_number)
     return {
         "message": "Course created successfully",
         "course_code": course.course_code,
@@ -100,7 +103,11 @@ def edit_course(course_code: str, updates: CourseBase, db: Session = Depends(get
     course = db.query(crud_courses.Course).filter_by(course_code=course_code).first()
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
+    old_dept, old_sem = course.department_name, course.semester_number
     updated_course = crud_courses.update_course(db, course_code, updates.dict(exclude_unset=True))
+    invalidate_cache(get_redis(), old_dept, old_sem)
+    if (updated_course.department_name, updated_course.semester_number) != (old_dept, old_sem):
+        invalidate_cache(get_redis(), updated_course.department_name, updated_course.semester_number)
     return {"message": "Course updated successfully", "course_code": updated_course.course_code}
 
 @router.delete("/{course_code}", response_model=dict)
@@ -112,4 +119,5 @@ def remove_course(course_code: str, db: Session = Depends(get_db)):
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     crud_courses.delete_course(db, course_code)
+    invalidate_cache(get_redis(), course.department_name, course.semester_number)
     return {"message": "Course deleted successfully"}
\ No newline at end of file
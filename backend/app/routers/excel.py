@@ -8,6 +8,8 @@ from app.services.layout_service import generate_timetable_layout
 from app.crud.courses import create_course
 from app.crud import departments as dept_crud
 from app.crud import semesters as sem_crud
+from app.services.cache_service import invalidate_cache
+from app.services.availability_service import clear_faculty_busy
 import json
 import redis
 import os
@@ -91,6 +93,7 @@ async def upload_excel(
             course["semester_number"] = semester_number
             create_course(db, course)
         db.commit()
+        invalidate_cache(redis_client, department_name, semester_number)
 
         # 6. Generate timetable layout
         timetable_layout = generate_timetable_layout(
@@ -104,6 +107,8 @@ async def upload_excel(
         # 7. Save layout in Redis
         rkey_layout = f"tt:{department_name}:{semester_number}:layout"
         redis_client.set(rkey_layout, json.dumps(timetable_layout), ex=300)
+        # The fresh layout replaces the live timetable, and with it its faculty bookings
+        clear_faculty_busy(redis_client, department_name, semester_number)
 
         return {
             "message": "Data stored in DB & Redis, timetable layout generated",
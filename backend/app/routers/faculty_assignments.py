@@ -14,8 +14,11 @@ from app.utils.redis_client import (
     get_redis
 )
 from typing import List
-from app.services.constraint_service import get_assignment_constraints
+from app.services.constraint_service import ConstraintValidationError, get_assignment_constraints
 from app.services.timetable_service import generate_timetable
+from app.services.feasibility_service import InfeasibleScheduleError
+from app.services.job_service import GENERATE_TIMETABLE, QUEUED, submit_job
+from app.services.cache_service import invalidate_cache
 from uuid import UUID
 import json
 import logging
@@ -65,17 +68,107 @@ def get_faculty_and_subjects_by_name(
     return results
 
 
+def _layout_config(department_name: str, semester_number: int) -> dict:
+    """Schedule form settings (times, durations, breaks) recovered from the stored layout"""
+    r = get_redis()
+    rkey_layout = f"tt:{department_name}:{semester_number}:layout"
+
+    try:
+        layout_data = json.loads(r.get(rkey_layout) or "{}")
+        layout = layout_data.get("layout", {})
+
+        # Extract start_time and end_time from time_slots
+        time_slots = layout.get("time_slots", [])
+        start_time = None
+        end_time = None
+
+        if time_slots:
+            # Sort time slots to get the earliest start and latest end
+            sorted_slots = sorted(time_slots, key=lambda x: x.get("start", ""))
+            start_time = sorted_slots[0].get("start") if sorted_slots else None
+            end_time = sorted_slots[-1].get("end") if sorted_slots else None
+
+        # FIXED: Extract breaks from layout instead of grid, and use proper structure
+        breaks = []
+
+        # First try to get breaks from layout configuration
+        if layout.get("breaks"):
+            for break_item in layout.get("breaks", []):
+                if break_item.get("start_time") and break_item.get("end_time"):
+                    breaks.append({
+                        "start_time": break_item["start_time"],
+                        "end_time": break_item["end_time"],
+                        "name": break_item.get("name", "Break")
+                    })
+
+        # Fallback: Extract breaks from grid if not found in layout
+        if not breaks:
+            grid = layout_data.get("grid", {})
+            break_intervals = set()  # Use set to avoid duplicates
+
+            for day, day_schedule in grid.items():
+                if not isinstance(day_schedule, dict):
+                    continue
+
+                for time_slot, activities in day_schedule.items():
+                    if activities and isinstance(activities, (list, dict)):
+                        # Handle both list and single dict formats
+                        activities_list = activities if isinstance(activities, list) else [activities]
+
+                        for activity in activities_list:
+                            if isinstance(activity, dict) and activity.get("type") in ("break", "Break"):
+                                # Extract time slot components
+                                if '-' in time_slot:
+                                    start, end = time_slot.split('-')
+                                    break_intervals.add((start, end))
+
+            # Convert unique break intervals to proper format
+            for start, end in break_intervals:
+                breaks.append({
+                    "start_time": start,
+                    "end_time": end,
+                    "name": "Break"
+                })
+
+        # FIXED: Change slot_duration to minutes_per_lecture to match frontend expectation
+        slot_duration = layout.get("slot_duration", 55)
+        lab_minutes = layout.get("lab_minutes", 110)
+
+        config = {
+            "start_time": start_time or "07:30",
+            "end_time": end_time or "13:40",
+            "minutes_per_lecture": slot_duration,  # FIXED: Changed key name
+            "lab_minutes": lab_minutes,
+            "breaks": breaks
+        }
+
+    except (json.JSONDecodeError, KeyError, AttributeError) as e:
+        logger.error(f"Failed to extract layout information: {str(e)}")
+        # Provide default config if layout extraction fails
+        config = {
+            "start_time": "07:30",
+            "end_time": "13:40",
+            "minutes_per_lecture": 55,
+            "lab_minutes": 110,
+            "breaks": []
+        }
+
+    return config
+
+
 @router.post("/with-constraints")
 def create_faculty_assignments_with_constraints(
         request: FacultyAssignmentsRequest,
         department_name: str = Query(..., alias="department_name"),
         semester_number: int = Query(..., alias="semester_number"),
+        background: bool = Query(False, description="Generate in a background job, see GET /timetables/jobs/{id}"),
         db: Session = Depends(get_db),
         user_id: str = Depends(get_current_user)
 ):
     """
     Create faculty assignments with constraints stored in Redis,
-    then return generated timetable.
+    then return generated timetable (or, with background, the job id
+    generating it).
     """
     results = []
     errors = []
@@ -151,6 +244,7 @@ def create_faculty_assignments_with_constraints(
         rkey = f"tt:{department_name}:{semester_number}:faculty"
         try:
             r.set(rkey, json.dumps(consolidated_assignments))
+            invalidate_cache(r, department_name, semester_number)
             logger.info(f"Stored consolidated assignments in Redis: {rkey}")
         except Exception as e:
             errors.append(f"Failed to store consolidated assignments: {str(e)}")
@@ -165,6 +259,19 @@ def create_faculty_assignments_with_constraints(
             "errors": errors
         }
 
+    if background:
+        job_id = submit_job(GENERATE_TIMETABLE, {
+            "dept": department_name,
+            "sem": semester_number,
+            "user_id": user_id,
+            "persist_to_db": True
+        })
+        return {
+            "job_id": job_id,
+            "status": QUEUED,
+            "config": _layout_config(department_name, semester_number)
+        }
+
     # Generate timetable
     try:
         timetable_output = generate_timetable(
@@ -174,6 +281,10 @@ def create_faculty_assignments_with_constraints(
             user_id=user_id,
             persist_to_db=True
         )
+    except ConstraintValidationError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    except InfeasibleScheduleError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), **e.report.to_dict()})
     except Exception as e:
         # Log the full error for debugging
         logger.error(f"Timetable generation failed: {str(e)}", exc_info=True)
@@ -186,88 +297,7 @@ def create_faculty_assignments_with_constraints(
         raise HTTPException(status_code=500, detail=error_detail)
 
     # 6. Extract layout information from Redis
-    r = get_redis()
-    rkey_layout = f"tt:{department_name}:{semester_number}:layout"
-
-    try:
-        layout_data = json.loads(r.get(rkey_layout) or "{}")
-        layout = layout_data.get("layout", {})
-
-        # Extract start_time and end_time from time_slots
-        time_slots = layout.get("time_slots", [])
-        start_time = None
-        end_time = None
-
-        if time_slots:
-            # Sort time slots to get the earliest start and latest end
-            sorted_slots = sorted(time_slots, key=lambda x: x.get("start", ""))
-            start_time = sorted_slots[0].get("start") if sorted_slots else None
-            end_time = sorted_slots[-1].get("end") if sorted_slots else None
-
-        # FIXED: Extract breaks from layout instead of grid, and use proper structure
-        breaks = []
-
-        # First try to get breaks from layout configuration
-        if layout.get("breaks"):
-            for break_item in layout.get("breaks", []):
-                if break_item.get("start_time") and break_item.get("end_time"):
-                    breaks.append({
-                        "start_time": break_item["start_time"],
-                        "end_time": break_item["end_time"],
-                        "name": break_item.get("name", "Break")
-                    })
-
-        # Fallback: Extract breaks from grid if not found in layout
-        if not breaks:
-            grid = layout_data.get("grid", {})
-            break_intervals = set()  # Use set to avoid duplicates
-
-            for day, day_schedule in grid.items():
-                if not isinstance(day_schedule, dict):
-                    continue
-
-                for time_slot, activities in day_schedule.items():
-                    if activities and isinstance(activities, (list, dict)):
-                        # Handle both list and single dict formats
-                        activities_list = activities if isinstance(activities, list) else [activities]
-
-                        for activity in activities_list:
-                            if isinstance(activity, dict) and activity.get("type") in ("break", "Break"):
-                                # Extract time slot components
-                                if '-' in time_slot:
-                                    start, end = time_slot.split('-')
-                                    break_intervals.add((start, end))
-
-            # Convert unique break intervals to proper format
-            for start, end in break_intervals:
-                breaks.append({
-                    "start_time": start,
-                    "end_time": end,
-                    "name": "Break"
-                })
-
-        # FIXED: Change slot_duration to minutes_per_lecture to match frontend expectation
-        slot_duration = layout.get("slot_duration", 55)
-        lab_minutes = layout.get("lab_minutes", 110)
-
-        config = {
-            "start_time": start_time or "07:30",
-            "end_time": end_time or "13:40",
-            "minutes_per_lecture": slot_duration,  # FIXED: Changed key name
-            "lab_minutes": lab_minutes,
-            "breaks": breaks
-        }
-
-    except (json.JSONDecodeError, KeyError, AttributeError) as e:
-        logger.error(f"Failed to extract layout information: {str(e)}")
-        # Provide default config if layout extraction fails
-        config = {
-            "start_time": "07:30",
-            "end_time": "13:40",
-            "minutes_per_lecture": 55,
-            "lab_minutes": 110,
-            "breaks": []
-        }
+    config = _layout_config(department_name, semester_number)
 
     # FIXED: Return proper structure with grid and config at top level
     # Extract grid from timetable_output and combine with config
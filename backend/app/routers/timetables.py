@@ -1,14 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Response
+from fastapi.responses import StreamingResponse
 #from redis.commands.search.query import Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional, Union
 from app.crud import timetables as crud_timetables
 from app.crud import users as crud_users
 from app.models.users import User
 from app.database import SessionLocal
-from app.schemas.timetables import TimetableBase, TimetableInput, TimetableResult
+from app.schemas.timetables import (
+    TimetableBase, TimetableInput, TimetableResult, JointTimetableInput, JointTimetableResult,
+    FacultyAvailability, JobSubmitted, JobStatus, TimetableRepairInput, TimetableRepairResult, PinInput, PinResult
+)
 from app.services.layout_service import generate_timetable_layout
-from app.services.timetable_service import generate_timetable
+from app.services.timetable_service import (
+    generate_timetable, generate_joint_timetables, repair_timetable, pin_activities, pinned_activities
+)
+from app.services.constraint_service import ConstraintValidationError
+from app.services.feasibility_service import InfeasibleScheduleError
+from app.services.solver_service import DEFAULT_NODE_BUDGET, DEFAULT_TIME_BUDGET_MS
+from app.services.optimizer_service import DEFAULT_OPTIMIZE_BUDGET_MS
+from app.services.multistart_service import DEFAULT_STARTS, DEFAULT_DEADLINE_MS
+from app.services.availability_service import clear_faculty_busy, faculty_bookings, parse_time_range
+from app.services.job_service import GENERATE_TIMETABLE, QUEUED, get_job, submit_job
+from app.services.event_service import sse_events
+from app.services.cache_service import cache_stats, invalidate_cache
+from app.utils.redis_client import get_redis
 from app.dependencies.auth import get_current_user, create_access_token
 import uuid
 import json
@@ -102,6 +118,108 @@ def get_timetables_by_user(
             detail=f"Internal server error: {str(e)}"
         )
 
+@router.get("/faculty-availability", response_model=FacultyAvailability)
+def get_faculty_availability(
+    faculty_name: str = Query(..., description="Faculty name"),
+    day: str = Query(..., description="Day name, e.g. Tuesday"),
+    time: str = Query(..., description="HH:MM or HH:MM-HH:MM"),
+):
+    """
+    Check a faculty member against every generated timetable.
+    """
+    try:
+        start, end = parse_time_range(time)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid time '{time}', expected HH:MM or HH:MM-HH:MM")
+    booked_by = faculty_bookings(get_redis(), faculty_name, day, start, end)
+    return FacultyAvailability(
+        faculty_name=faculty_name, day=day, time=time, free=not booked_by, booked_by=booked_by
+    )
+
+@router.get("/cache/stats", response_model=dict)
+def get_cache_stats():
+    """
+    Hit, miss, eviction and invalidation counters of the generation cache.
+    """
+    return cache_stats(get_redis())
+
+@router.delete("/cache", response_model=dict)
+def invalidate_timetable_cache(
+    department_name: str = Query(..., description="Department name"),
+    semester_number: int = Query(..., description="Semester number"),
+):
+    """
+    Drop the cached generation results of one department/semester.
+    """
+    removed = invalidate_cache(get_redis(), department_name, semester_number)
+    return {"message": "Cache invalidated", "removed": removed}
+
+@router.get("/pins", response_model=PinResult)
+def get_pinned_activities(
+    department_name: str = Query(..., description="Department name"),
+    semester_number: int = Query(..., description="Semester number"),
+):
+    """
+    Activities pinned in the stored timetable of one department/semester.
+    """
+    try:
+        activities = pinned_activities(department_name, semester_number)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return PinResult(message=f"{len(activities)} pinned activities", activities=activities)
+
+@router.post("/pins", response_model=PinResult)
+def pin_timetable_activities(
+    data: PinInput,
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Pin (or unpin) a course's activities at one day and time in the stored
+    timetable; the next generation keeps them in place and fills in the rest
+    """
+    try:
+        activities = pin_activities(
+            dept=data.department_name,
+            sem=data.semester_number,
+            day=data.day,
+            time_label=data.time,
+            course_name=data.course_name,
+            faculty_name=data.faculty_name,
+            division=data.division,
+            pinned=data.pinned
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return PinResult(message="Activities pinned" if data.pinned else "Activities unpinned", activities=activities)
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+def get_job_status(job_id: str):
+    """
+    Status, phase and placed/total task counts of a background generation job,
+    with its result once done.
+    """
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/events")
+def stream_job_events(job_id: str):
+    """
+    Live progress of a background generation job as server-sent events:
+    a status snapshot, batches of allocator events (placed, conflict, retry,
+    phase, saturday, score), then end.
+    """
+    if not get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        sse_events(get_redis(), job_id, lambda: get_job(job_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{timetable_id}", response_model=TimetableBase)
 def get_timetable(timetable_id: int, db: Session = Depends(get_db)):
     """
@@ -131,7 +249,9 @@ def delete_timetable(timetable_id: int, db: Session = Depends(get_db)):
     timetable = crud_timetables.get_timetable(db, timetable_id)
     if not timetable:
         raise HTTPException(status_code=404, detail="Timetable not found")
-    crud_timetables.delete_timetable(db, timetable)
+    dept, sem = timetable.department_name, timetable.semester_number
+    # Its bookings leave the faculty index with it, or the row stays
+    crud_timetables.delete_timetable(db, timetable, on_delete=lambda: clear_faculty_busy(get_redis(), dept, sem))
     return {"message": "Timetable deleted successfully"}
 
 @router.post("/generate-layout", response_model=dict)
@@ -152,27 +272,150 @@ def generate_layout(data: TimetableInput = Body(...)):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/generate", response_model=TimetableResult)
+@router.post("/generate", response_model=Union[TimetableResult, JobSubmitted])
 def generate_timetable_endpoint(
+    response: Response,
     department_name: str = Query(..., description="Department name"),
     semester_number: int = Query(..., description="Semester number"),
     persist_to_db: bool = Query(False, description="Persist into DB"),
+    solver: Literal["greedy", "backtracking"] = Query(
+        "greedy", description="greedy: allocate and retry; backtracking: search with forward checking"
+    ),
+    node_budget: int = Query(DEFAULT_NODE_BUDGET, ge=1, description="Search node budget (backtracking)"),
+    time_budget_ms: int = Query(DEFAULT_TIME_BUDGET_MS, ge=1, description="Search time budget (backtracking)"),
+    optimize_ms: int = Query(
+        0, ge=0, description=f"Local search time budget, 0 to skip (e.g. {DEFAULT_OPTIMIZE_BUDGET_MS})"
+    ),
+    starts: int = Query(DEFAULT_STARTS, ge=1, description="Randomized starts to run, the best one is kept"),
+    workers: Optional[int] = Query(None, ge=1, description="Worker processes for multi-start (default: CPUs - 1)"),
+    deadline_ms: int = Query(DEFAULT_DEADLINE_MS, ge=1, description="Wall-clock deadline for multi-start"),
+    respect_faculty_index: bool = Query(
+        False, description="Treat faculty time booked by other timetables as unavailable"
+    ),
+    use_cache: bool = Query(True, description="Reuse the result of an earlier run with identical inputs"),
+    seed: Optional[int] = Query(None, description="Make the run reproducible: same inputs and seed, same grid"),
+    debug_timings: bool = Query(False, description="Return and log the milliseconds spent in each phase"),
+    precheck: bool = Query(True, description="Reject provably infeasible inputs (422) before allocating"),
+    explain: bool = Query(False, description="Explain each unplaced task with the constraints and placements blocking it"),
+    warm_start: bool = Query(False, description="Keep the still-valid placements of the last saved timetable"),
+    background: bool = Query(False, description="Queue as a job and return its id, see GET /timetables/jobs/{id}"),
     db: Session = Depends(get_db),
     user_id: str = Depends(get_current_user)  # Add user dependency
 ):
+    params = {
+        "dept": department_name,
+        "sem": semester_number,
+        "user_id": user_id,  # Pass user_id to associate with timetable
+        "persist_to_db": persist_to_db,
+        "solver": solver,
+        "node_budget": node_budget,
+        "time_budget_ms": time_budget_ms,
+        "optimize_ms": optimize_ms,
+        "starts": starts,
+        "workers": workers,
+        "deadline_ms": deadline_ms,
+        "respect_faculty_index": respect_faculty_index,
+        "use_cache": use_cache,
+        "seed": seed,
+        "debug_timings": debug_timings,
+        "precheck": precheck,
+        "explain": explain,
+        "warm_start": warm_start,
+    }
     try:
-        out = generate_timetable(
+        if background:
+            response.status_code = 202
+            return JobSubmitted(job_id=submit_job(GENERATE_TIMETABLE, params), status=QUEUED)
+        out = generate_timetable(db=db, **params)
+        return TimetableResult(message="Timetable Generated", **out)
+    except HTTPException:
+        raise
+    except ConstraintValidationError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    except InfeasibleScheduleError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), **e.report.to_dict()})
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"{type(e).__name__}: {str(e)}"
+        )
+
+@router.post("/generate-joint", response_model=JointTimetableResult)
+def generate_joint_timetables_endpoint(
+    data: JointTimetableInput,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Generate timetables for several department/semester pairs at once,
+    sharing faculty availability between them
+    """
+    if not data.pairs:
+        raise HTTPException(status_code=400, detail="At least one department/semester pair is required")
+
+    options = {
+        key: value for key, value in {
+            "node_budget": data.node_budget,
+            "time_budget_ms": data.time_budget_ms,
+            "optimize_ms": data.optimize_ms,
+        }.items() if value is not None
+    }
+    try:
+        timetables = generate_joint_timetables(
             db=db,
-            dept=department_name,
-            sem=semester_number,
-            user_id=user_id,  # Pass user_id to associate with timetable
-            persist_to_db=persist_to_db
+            pairs=[(p.department_name, p.semester_number) for p in data.pairs],
+            user_id=user_id,
+            persist_to_db=data.persist_to_db,
+            solver=data.solver,
+            respect_faculty_index=data.respect_faculty_index,
+            precheck=data.precheck,
+            **options
         )
-        return TimetableResult(message="Timetable Generated", **out)
+        return JointTimetableResult(message="Timetables Generated", timetables=timetables)
     except HTTPException:
         raise
+    except ConstraintValidationError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    except InfeasibleScheduleError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), **e.report.to_dict()})
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"{type(e).__name__}: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/repair", response_model=TimetableRepairResult)
+def repair_timetable_endpoint(
+    data: TimetableRepairInput,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Apply one faculty assignment change (add, remove or update, constraints
+    included) and patch the stored timetable: only the changed assignment's
+    placements and the placements in their way move
+    """
+    try:
+        out = repair_timetable(
+            db=db,
+            dept=data.department_name,
+            sem=data.semester_number,
+            delta=data.delta.dict(),
+            user_id=user_id,
+            persist_to_db=data.persist_to_db,
+            respect_faculty_index=data.respect_faculty_index,
+            precheck=data.precheck,
+            debug_timings=data.debug_timings
+        )
+        return TimetableRepairResult(message="Timetable Repaired", **out)
+    except HTTPException:
+        raise
+    except ConstraintValidationError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"{type(e).__name__}: {str(e)}"
+        )
@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
-from typing import Any, Optional, List
+from typing import Any, Dict, Optional, List, Literal
 
 
 class TimetableBase(BaseModel):
@@ -30,8 +30,127 @@ class TimetableInput(BaseModel):
     lab_duration_minutes: int
     working_days: Optional[List[str]] = None
 
+class UnplacedTask(BaseModel):
+    course_name: str
+    faculty_name: str
+    type: str
+    division: str
+
+class TaskExplanation(BaseModel):
+    course_name: str
+    faculty_name: str
+    type: str
+    division: str
+    # Placements of this task still missing
+    missing: int
+    # Slots (lectures) or windows (labs) it could take, breaks excluded
+    candidates: int
+    # A slot is free in the final grid; the allocator's ordering left it out
+    placeable_now: bool
+    # Constraints, placements, bookings elsewhere and lab-spread rules that
+    # together block every candidate, see explain_unplaced()
+    blocking: List[Dict[str, Any]] = []
+
 class TimetableResult(BaseModel):
     message: str
     grid: Any
     conflicts: List[str]
     attempts: int
+    unplaced: List[UnplacedTask] = []
+    seed: Optional[int] = None
+    # Per-phase milliseconds and per-retry counts, only with debug_timings
+    timings: Optional[Dict[str, Any]] = None
+    explanations: Optional[List[TaskExplanation]] = None
+
+class JobSubmitted(BaseModel):
+    job_id: str
+    status: str
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str
+    phase: str
+    placed: int
+    total: int
+    attempts: int
+    created_at: float
+    updated_at: float
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    error_detail: Optional[Dict[str, Any]] = None
+
+class DepartmentSemester(BaseModel):
+    department_name: str
+    semester_number: int
+
+class FacultyAvailability(BaseModel):
+    faculty_name: str
+    day: str
+    time: str
+    free: bool
+    booked_by: List[str] = []
+
+class JointTimetableInput(BaseModel):
+    pairs: List[DepartmentSemester]
+    persist_to_db: bool = False
+    solver: Literal["greedy", "backtracking"] = "greedy"
+    node_budget: Optional[int] = None
+    time_budget_ms: Optional[int] = None
+    optimize_ms: Optional[int] = None
+    respect_faculty_index: bool = False
+    precheck: bool = True
+
+class JointTimetableEntry(BaseModel):
+    department_name: str
+    semester_number: int
+    grid: Any
+    conflicts: List[str]
+    attempts: int
+    unplaced: List[UnplacedTask] = []
+
+class JointTimetableResult(BaseModel):
+    message: str
+    timetables: List[JointTimetableEntry]
+
+class AssignmentDelta(BaseModel):
+    action: Literal["add", "remove", "update"]
+    course_name: str
+    faculty_name: str
+    # add/update; fields left out keep their stored values
+    new_faculty_name: Optional[str] = None
+    theory: Optional[bool] = None
+    practical: Optional[bool] = None
+    number_of_sublabs: Optional[int] = None
+    division_names: Optional[List[str]] = None
+    constraints: Optional[List[Dict[str, Any]]] = None
+
+class TimetableRepairInput(BaseModel):
+    department_name: str
+    semester_number: int
+    delta: AssignmentDelta
+    persist_to_db: bool = False
+    respect_faculty_index: bool = False
+    precheck: bool = True
+    debug_timings: bool = False
+
+class TimetableRepairResult(TimetableResult):
+    # Placements taken out and made; a moved placement is in both
+    removed: List[Dict[str, Any]] = []
+    placed: List[Dict[str, Any]] = []
+
+class PinInput(BaseModel):
+    department_name: str
+    semester_number: int
+    day: str
+    # Slot label, or lab window label as the simplified grid shows it
+    time: str
+    course_name: str
+    faculty_name: Optional[str] = None
+    division: Optional[str] = None
+    # False unpins
+    pinned: bool = True
+
+class PinResult(BaseModel):
+    message: str
+    activities: List[Dict[str, Any]] = []
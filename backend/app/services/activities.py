@@ -0,0 +1,148 @@
+import random
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+LECTURE = "lecture"
+LAB = "lab"
+
+
+class Task:
+    """
+        ``count`` identical placements of one course component.
+
+        A course's theory hours become one lecture task with ``count`` set to
+        the hours, and each division's lab sessions one lab task, instead of
+        one dict per placement. ``course`` is the shared CourseNeed, so course
+        and faculty names are referenced rather than copied.
+    """
+    __slots__ = ("course", "type", "block_len", "division", "count")
+
+    def __init__(self, course: Any, task_type: str, block_len: int = 1, division: str = "ALL", count: int = 1):
+        self.course = course
+        self.type = task_type
+        self.block_len = block_len
+        self.division = division
+        self.count = count
+
+    def __repr__(self) -> str:
+        return f"Task({self.course.course_name!r}, {self.type!r}, division={self.division!r}, count={self.count})"
+
+
+def expand_tasks(tasks: Iterable[Task]) -> List[Task]:
+    """One entry per placement; repeated placements share the Task object"""
+    return [task for task in tasks for _ in range(task.count)]
+
+
+class Activity:
+    """
+        A lecture or lab placed by the allocator.
+
+        Reads like the JSON activity dict (``get`` and ``[]`` with the same
+        keys) but only stores the task type, the shared CourseNeed and the
+        division; the display string is built on demand and the uuid is only
+        generated the first time the id is read. ``to_dict`` expands it to the
+        stored JSON shape.
+    """
+    __slots__ = ("type", "course", "division", "_id")
+
+    def __init__(self, activity_type: str, course: Any, division: Optional[str] = None):
+        self.type = activity_type
+        self.course = course
+        self.division = division
+        self._id: Optional[str] = None
+
+    @property
+    def id(self) -> str:
+        if self._id is None:
+            self._id = str(uuid.uuid4())
+        return self._id
+
+    @property
+    def display(self) -> str:
+        c = self.course
+        if self.type == LAB:
+            return f"{self.division} - {c.course_name} - {c.faculty_name}"
+        return f"{c.course_name} - {c.faculty_name}"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == "id":
+            return self.id
+        if key == "type":
+            return self.type
+        if key == "course_name":
+            return self.course.course_name
+        if key == "faculty_name":
+            return self.course.faculty_name
+        if key == "credits":
+            return self.course.credits
+        if key == "display":
+            return self.display
+        if key == "division" and self.type == LAB:
+            return self.division
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        c = self.course
+        if self.type == LAB:
+            return {
+                "id": self.id,
+                "type": LAB,
+                "course_name": c.course_name,
+                "faculty_name": c.faculty_name,
+                "division": self.division,
+                "credits": c.credits,
+                "display": self.display
+            }
+        return {
+            "id": self.id,
+            "type": LECTURE,
+            "course_name": c.course_name,
+            "faculty_name": c.faculty_name,
+            "credits": c.credits,
+            "display": self.display
+        }
+
+
+def is_activity(cell: Any) -> bool:
+    """True for activity entries, stored (dict) or placed in this run"""
+    return isinstance(cell, (dict, Activity))
+
+
+def assign_ids(grid: Dict[str, Dict[str, Any]], seed: int):
+    """
+        Give every Activity in ``grid`` that has no id yet a uuid drawn from a
+        generator seeded with ``seed``, in grid order, so a seeded run always
+        produces the same ids.
+    """
+    rng = random.Random(seed)
+    for day_slots in grid.values():
+        for cells in day_slots.values():
+            for activity in cells or ():
+                if isinstance(activity, Activity) and activity._id is None:
+                    activity._id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def serialize_grid(grid: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Copy of ``grid`` with every Activity expanded to its JSON dict"""
+    expanded: Dict[int, Dict[str, Any]] = {}
+
+    def _expand(cell: Any) -> Any:
+        if not isinstance(cell, Activity):
+            return cell
+        if id(cell) not in expanded:
+            expanded[id(cell)] = cell.to_dict()
+        return expanded[id(cell)]
+
+    return {
+        day: {
+            slot: [_expand(a) for a in cells] if isinstance(cells, list) else cells
+            for slot, cells in day_slots.items()
+        }
+        for day, day_slots in grid.items()
+    }
@@ -0,0 +1,211 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.layout_service import SlotModel
+from app.services.occupancy_service import FacultyCalendar
+
+logger = logging.getLogger(__name__)
+
+
+# Field of each faculty-day hash holding the OR of all its owners' masks
+ALL_OWNERS = "*"
+
+
+def faculty_day_key(faculty: str, day: str) -> str:
+    """Index hash for one faculty member on one day, keyed by owning timetable"""
+    return f"faculty_busy:{faculty}:{day}"
+
+
+def _owner(dept, sem) -> str:
+    return f"{dept}:{sem}"
+
+
+def _owner_keys_key(dept, sem) -> str:
+    return f"tt:{dept}:{sem}:faculty_index"
+
+
+def _minute_range(start: int, end: int) -> int:
+    return ((1 << (end - start)) - 1) << start if end > start else 0
+
+
+def _faculty_minute_masks(
+        busy_faculty: Dict[str, Dict[str, List[str]]], slot_model: SlotModel
+) -> Dict[Tuple[str, str], int]:
+    """Fold a ``{day: {slot_label: [names]}}`` busy map into minute masks per (faculty, day)"""
+    masks: Dict[Tuple[str, str], int] = {}
+    for day, slots in busy_faculty.items():
+        for label, names in slots.items():
+            idx = slot_model.index.get(label)
+            if idx is None:
+                continue
+            minutes = _minute_range(slot_model.start_minutes[idx], slot_model.end_minutes[idx])
+            for name in names:
+                masks[(name, day)] = masks.get((name, day), 0) | minutes
+    return masks
+
+
+def _replace_entries(r, dept, sem, new_keys: Dict[str, int]):
+    owner = _owner(dept, sem)
+    owner_key = _owner_keys_key(dept, sem)
+
+    def _replace(pipe):
+        old_keys = pipe.smembers(owner_key)
+        keys = sorted(set(old_keys) | set(new_keys))
+        # The aggregates depend on the other owners' fields too
+        if keys:
+            pipe.watch(*keys)
+        others = {
+            key: [int(mask, 16) for field, mask in (pipe.hgetall(key) or {}).items()
+                  if field not in (owner, ALL_OWNERS)]
+            for key in keys
+        }
+        pipe.multi()
+        for key in keys:
+            busy = new_keys.get(key, 0)
+            for mask in others[key]:
+                busy |= mask
+            if key in new_keys:
+                pipe.hset(key, owner, format(new_keys[key], "x"))
+            else:
+                pipe.hdel(key, owner)
+            if busy:
+                pipe.hset(key, ALL_OWNERS, format(busy, "x"))
+            else:
+                pipe.hdel(key, ALL_OWNERS)
+        pipe.delete(owner_key)
+        if new_keys:
+            pipe.sadd(owner_key, *new_keys)
+
+    r.transaction(_replace, owner_key)
+    logger.debug(f"Faculty index: {owner} now holds {len(new_keys)} faculty-days")
+
+
+def publish_faculty_busy(r, dept, sem, busy_faculty: Dict[str, Dict[str, List[str]]], slot_model: SlotModel):
+    """
+        Replace one timetable's entries in the global faculty availability index.
+
+        Each faculty member gets one hash per day; the field is the owning
+        "dept:sem" and the value the busy minutes of that day as a hex bitmask
+        (bit ``m`` set when busy during minute ``m``), so timetables with
+        different slot layouts can be compared. The ALL_OWNERS field holds the
+        OR of every owner's mask, so a read is one field whatever the number
+        of timetables. The hashes this timetable wrote are remembered under
+        ``tt:{dept}:{sem}:faculty_index``; stale entries are dropped, new ones
+        written and the aggregates recomputed in one MULTI/EXEC, retried if
+        another writer touches the same timetable or faculty-days meanwhile.
+        Writes read the other owners' fields of the hashes they change.
+    """
+    masks = _faculty_minute_masks(busy_faculty, slot_model)
+    _replace_entries(r, dept, sem, {
+        faculty_day_key(faculty, day): mask for (faculty, day), mask in masks.items() if mask
+    })
+
+
+def clear_faculty_busy(r, dept, sem):
+    """Remove one timetable's entries from the global faculty availability index"""
+    _replace_entries(r, dept, sem, {})
+
+
+def _owner_masks(owners: Dict[str, str], skip: Iterable[str] = ()) -> int:
+    """OR of the per-owner masks of one faculty-day hash, without the ``skip`` owners"""
+    busy = 0
+    for owner, mask in owners.items():
+        if owner != ALL_OWNERS and owner not in skip:
+            busy |= int(mask, 16)
+    return busy
+
+
+def _fast_busy(fields: List[Optional[str]]) -> Optional[int]:
+    """
+        Busy minutes from an HMGET of ALL_OWNERS followed by the excluded
+        owners, or None when the per-owner fields have to be read: an
+        excluded owner books the faculty-day (an OR cannot be undone) or
+        the hash predates the aggregate.
+    """
+    aggregate, *excluded = fields
+    if aggregate is None or any(mask is not None for mask in excluded):
+        return None
+    return int(aggregate, 16)
+
+
+def faculty_busy_minutes(r, faculty: str, day: str, exclude: Iterable[Tuple[str, int]] = ()) -> int:
+    """Minutes ``faculty`` is booked on ``day`` across all timetables, except the ``exclude`` (dept, sem) pairs"""
+    skip = [_owner(dept, sem) for dept, sem in exclude]
+    key = faculty_day_key(faculty, day)
+    if (busy := _fast_busy(r.hmget(key, ALL_OWNERS, *skip))) is not None:
+        return busy
+    return _owner_masks(r.hgetall(key) or {}, skip)
+
+
+def parse_time_range(text: str) -> Tuple[int, int]:
+    """Minutes covered by "HH:MM-HH:MM", or the single minute starting at "HH:MM" """
+    def _minute(value: str) -> int:
+        hours, minutes = value.strip().split(":")
+        return int(hours) * 60 + int(minutes)
+
+    start, _, end = text.partition("-")
+    start_minute = _minute(start)
+    end_minute = _minute(end) if end else start_minute + 1
+    if end_minute <= start_minute:
+        raise ValueError(f"Invalid time range '{text}'")
+    return start_minute, end_minute
+
+
+def faculty_bookings(r, faculty: str, day: str, start: int, end: int) -> List[str]:
+    """
+        The "dept:sem" timetables that book ``faculty`` on ``day`` between
+        minutes ``start`` and ``end``. A free faculty member costs one field
+        read; only a booked one has the owners read, to name them.
+    """
+    window = _minute_range(start, end)
+    key = faculty_day_key(faculty, day)
+    if (busy := _fast_busy([r.hget(key, ALL_OWNERS)])) is not None and not busy & window:
+        return []
+    return sorted(
+        owner for owner, mask in (r.hgetall(key) or {}).items()
+        if owner != ALL_OWNERS and int(mask, 16) & window
+    )
+
+
+def load_faculty_calendar(
+        r,
+        faculties: Iterable[str],
+        days: Iterable[str],
+        exclude: Iterable[Tuple[str, int]] = (),
+        calendar: Optional[FacultyCalendar] = None
+) -> FacultyCalendar:
+    """
+        Preload the faculty time booked by other timetables into a
+        FacultyCalendar, so the allocator treats it as taken. ``exclude``
+        lists the (dept, sem) pairs being rescheduled, whose own old
+        bookings must not block them. One pipelined HMGET per faculty-day
+        of the aggregate and the excluded owners' fields; the faculty-days
+        the excluded pairs book themselves are read in full in a second
+        round trip.
+    """
+    calendar = calendar if calendar is not None else FacultyCalendar()
+    skip = [_owner(dept, sem) for dept, sem in dict.fromkeys(exclude)]
+    pairs = [(faculty, day) for faculty in dict.fromkeys(faculties) for day in days]
+    if not pairs:
+        return calendar
+
+    pipe = r.pipeline(transaction=False)
+    for faculty, day in pairs:
+        pipe.hmget(faculty_day_key(faculty, day), ALL_OWNERS, *skip)
+    busy_by_pair = [_fast_busy(fields) for fields in pipe.execute()]
+
+    if slow := [i for i, busy in enumerate(busy_by_pair) if busy is None]:
+        pipe = r.pipeline(transaction=False)
+        for i in slow:
+            pipe.hgetall(faculty_day_key(*pairs[i]))
+        for i, owners in zip(slow, pipe.execute()):
+            busy_by_pair[i] = _owner_masks(owners or {}, skip)
+
+    booked = 0
+    for (faculty, day), busy in zip(pairs, busy_by_pair):
+        if busy:
+            calendar.occupy(faculty, day, busy)
+            booked += 1
+
+    logger.debug(f"Faculty index: preloaded {booked} busy faculty-days")
+    return calendar
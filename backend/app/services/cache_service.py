@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+import time
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = 24 * 60 * 60
+CACHE_MAX_ENTRIES = 256
+
+# Entry key -> last use, for LRU eviction
+LRU_KEY = "tt:cache:lru"
+STATS_KEY = "tt:cache:stats"
+
+
+def _entry_key(digest: str) -> str:
+    return f"tt:cache:{digest}"
+
+
+def _owner_key(dept, sem) -> str:
+    return f"tt:{dept}:{sem}:cache_keys"
+
+
+def _pinned_cells(grid: Dict) -> Dict[str, Dict[str, list]]:
+    """The pinned activities of ``grid`` by day and slot label"""
+    pinned = {}
+    for day, day_slots in grid.items():
+        for label, cells in day_slots.items():
+            kept = [a for a in (cells if isinstance(cells, list) else [cells])
+                    if isinstance(a, dict) and a.get("protected", False)]
+            if kept:
+                pinned.setdefault(day, {})[label] = kept
+    return pinned
+
+
+def input_digest(layout: Dict, grid: Dict, needs: Iterable[Any], options: Dict[str, Any],
+                 external_busy: Optional[Iterable] = None) -> str:
+    """
+        SHA-256 over a canonical JSON of everything a schedule depends on: the
+        stored layout, the grid's pinned activities, the course needs (course
+        rows merged with the faculty assignments), the solver options and,
+        when faculty time of other timetables is preloaded, those bookings.
+
+        The grid's breaks follow from the layout and its other placements
+        are the last run's output, so neither is hashed: a regeneration of
+        unchanged inputs finds the entry its previous run stored.
+    """
+    payload = {
+        "layout": layout,
+        "grid": _pinned_cells(grid),
+        "needs": [asdict(c) for c in needs],
+        "options": options,
+        "external_busy": sorted(external_busy) if external_busy is not None else None,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_cached(r, digest: str) -> Optional[Dict[str, Any]]:
+    """The stored outcome for ``digest``, counting the hit or miss and refreshing its LRU position"""
+    raw = r.get(_entry_key(digest))
+    if raw is None:
+        r.hincrby(STATS_KEY, "misses", 1)
+        return None
+
+    pipe = r.pipeline()
+    pipe.hincrby(STATS_KEY, "hits", 1)
+    pipe.zadd(LRU_KEY, {digest: time.time()})
+    pipe.expire(_entry_key(digest), CACHE_TTL_SECONDS)
+    pipe.execute()
+    return json.loads(raw)
+
+
+def put_cached(r, dept, sem, digest: str, value: Dict[str, Any]):
+    """Store an outcome, evicting the least recently used entries past CACHE_MAX_ENTRIES"""
+    pipe = r.pipeline()
+    pipe.set(_entry_key(digest), json.dumps(value, ensure_ascii=False), ex=CACHE_TTL_SECONDS)
+    pipe.zadd(LRU_KEY, {digest: time.time()})
+    pipe.sadd(_owner_key(dept, sem), digest)
+    pipe.expire(_owner_key(dept, sem), CACHE_TTL_SECONDS)
+    pipe.execute()
+
+    # Entries that expired on their own only leave a stale LRU member behind
+    overflow = r.zcard(LRU_KEY) - CACHE_MAX_ENTRIES
+    if overflow > 0:
+        evicted = r.zrange(LRU_KEY, 0, overflow - 1)
+        if evicted:
+            pipe = r.pipeline()
+            pipe.delete(*(_entry_key(d) for d in evicted))
+            pipe.zrem(LRU_KEY, *evicted)
+            pipe.hincrby(STATS_KEY, "evictions", len(evicted))
+            pipe.execute()
+
+
+def invalidate_cache(r, dept, sem) -> int:
+    """Drop every cached outcome of one department/semester; returns how many"""
+    digests = list(r.smembers(_owner_key(dept, sem)))
+    pipe = r.pipeline()
+    if digests:
+        pipe.delete(*(_entry_key(d) for d in digests))
+        pipe.zrem(LRU_KEY, *digests)
+        pipe.hincrby(STATS_KEY, "invalidations", len(digests))
+    pipe.delete(_owner_key(dept, sem))
+    pipe.execute()
+    if digests:
+        logger.info(f"Invalidated {len(digests)} cached timetables for dept={dept}, sem={sem}")
+    return len(digests)
+
+
+def cache_stats(r) -> Dict[str, int]:
+    stats = {k: int(v) for k, v in (r.hgetall(STATS_KEY) or {}).items()}
+    return {
+        "hits": stats.get("hits", 0),
+        "misses": stats.get("misses", 0),
+        "evictions": stats.get("evictions", 0),
+        "invalidations": stats.get("invalidations", 0),
+        "entries": r.zcard(LRU_KEY),
+    }
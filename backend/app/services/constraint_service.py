@@ -1,5 +1,14 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.activities import LAB, LECTURE
+from app.services.layout_service import SlotModel
 from app.utils.redis_client import get_assignment_constraints, generate_redis_key
-from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
 
 
 class ConstraintService:
@@ -18,4 +27,121 @@ class ConstraintService:
         # This would be used by your timetable generation service
         # Implementation would scan Redis keys with pattern "faculty_constraints:*"
         # For simplicity, we return an empty dict
-        return {}
\ No newline at end of file
+        return {}
+
+
+@dataclass
+class ConstraintEntry:
+    """One usable constraint, resolved against the slot model"""
+    day_index: int
+    day: str
+    # "lecture", "lab" or None for either
+    type: Optional[str]
+    # Lecture slot index, when the time names a slot
+    slot: Optional[int]
+    # Index into slot_model.windows(lab_slot_len), when the time names a lab window
+    window: Optional[int]
+
+
+@dataclass
+class CompiledConstraints:
+    """
+        A course's constraints resolved once against a layout: the usable
+        entries in their original order (the greedy allocator tries them in
+        that order), per-day masks of allowed lecture slots and lab window
+        ids, and what could not be resolved.
+    """
+    # (days, slot labels, lab block length) this was compiled against
+    key: Tuple[Tuple[str, ...], Tuple[str, ...], int]
+    entries: List[ConstraintEntry] = field(default_factory=list)
+    lecture_masks: List[int] = field(default_factory=list)
+    lab_masks: List[int] = field(default_factory=list)
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def masks(self, task_type: str) -> List[int]:
+        return self.lab_masks if task_type == LAB else self.lecture_masks
+
+
+class ConstraintValidationError(ValueError):
+    """Constraints naming days or times the layout does not have; ``errors`` lists them"""
+
+    def __init__(self, errors: List[Dict[str, Any]], where: str = ""):
+        self.errors = errors
+        first = errors[0]
+        more = f" and {len(errors) - 1} more" if len(errors) > 1 else ""
+        super().__init__(
+            f"Invalid constraints{' for ' + where if where else ''}: "
+            f"{first['course_name']} {first['day']} {first['time']} ({first['reason']}){more}"
+        )
+
+
+def compilation_key(days: Iterable[str], slot_model: SlotModel, lab_slot_len: int):
+    return tuple(days), tuple(slot_model.labels), lab_slot_len
+
+
+def compile_constraints(
+        raw: Optional[List[Dict[str, str]]], days: List[str], slot_model: SlotModel, lab_slot_len: int
+) -> CompiledConstraints:
+    """
+        Resolve a constraints list (``{"day", "time", "type"}`` dicts) against
+        the grid's days and the slot model. Lecture times must name a slot,
+        lab times a window of ``lab_slot_len`` slots, untyped times either.
+        Entries that resolve to nothing are left out and reported in
+        ``errors``.
+    """
+    day_index = {day: d for d, day in enumerate(days)}
+    window_ids = {window.label: k for k, window in enumerate(slot_model.windows(lab_slot_len))}
+    compiled = CompiledConstraints(
+        key=compilation_key(days, slot_model, lab_slot_len),
+        lecture_masks=[0] * len(days),
+        lab_masks=[0] * len(days),
+    )
+
+    for item in raw or []:
+        day = (item.get("day") or "").capitalize()
+        time = item.get("time") or ""
+        kind = item.get("type") or None
+
+        reason = None
+        if day not in day_index:
+            reason = "not a working day" if day in WEEKDAYS else "unknown day"
+        elif kind not in (None, LECTURE, LAB):
+            reason = f"unknown type '{kind}'"
+        slot = slot_model.index.get(time) if kind in (None, LECTURE) else None
+        if slot is not None and slot_model.is_break[slot]:
+            slot = None
+        window = window_ids.get(time) if kind in (None, LAB) else None
+        if reason is None and slot is None and window is None:
+            reason = {
+                LECTURE: "not a lecture slot",
+                LAB: f"not a {lab_slot_len}-slot lab window",
+            }.get(kind, "not a lecture slot or lab window")
+
+        if reason:
+            compiled.errors.append({"day": item.get("day"), "time": time, "type": kind, "reason": reason})
+            continue
+
+        d = day_index[day]
+        compiled.entries.append(ConstraintEntry(d, day, kind, slot, window))
+        if slot is not None:
+            compiled.lecture_masks[d] |= 1 << slot
+        if window is not None:
+            compiled.lab_masks[d] |= 1 << window
+
+    return compiled
+
+
+def compile_needs(needs: Iterable[Any], days: List[str], slot_model: SlotModel, lab_slot_len: int):
+    """Attach compiled constraints to every need (``need.compiled``) not compiled for this layout yet"""
+    key = compilation_key(days, slot_model, lab_slot_len)
+    for c in needs:
+        if c.compiled is None or c.compiled.key != key:
+            c.compiled = compile_constraints(c.constraints, days, slot_model, lab_slot_len)
+
+
+def constraint_errors(needs: Iterable[Any]) -> List[Dict[str, Any]]:
+    """Validation errors of compiled needs, each naming its course and faculty member"""
+    return [
+        {"course_name": c.course_name, "faculty_name": c.faculty_name, **e}
+        for c in needs if c.compiled is not None for e in c.compiled.errors
+    ]
@@ -0,0 +1,136 @@
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# At most one published batch per interval
+FLUSH_INTERVAL_MS = 250
+# How often an idle stream asks Redis whether anyone is listening
+SUBSCRIBER_CHECK_MS = 1000
+# Events past this many per batch are counted, not sent
+MAX_BATCH = 500
+KEEPALIVE_SECONDS = 15
+
+
+def events_channel(job_id: str) -> str:
+    return f"job:{job_id}:events"
+
+
+class EventStream:
+    """
+        Allocator events for one job, published in batches on a Redis channel.
+
+        ``emit`` buffers an event and publishes the buffer at most once per
+        FLUSH_INTERVAL_MS. While the channel has no subscribers (checked with
+        PUBSUB NUMSUB about once a second) events are dropped straight away,
+        so an unobserved run only pays for a clock read per event.
+    """
+
+    def __init__(self, r, channel: str):
+        self.r = r
+        self.channel = channel
+        self._buffer: List[Dict[str, Any]] = []
+        self._dropped = 0
+        self._subscribed = False
+        self._next_check = 0.0
+        self._next_flush = 0.0
+
+    @property
+    def active(self) -> bool:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + SUBSCRIBER_CHECK_MS / 1000.0
+            try:
+                self._subscribed = bool(self.r.pubsub_numsub(self.channel)[0][1])
+            except Exception as e:
+                logger.warning(f"Could not check subscribers of {self.channel}: {e}")
+                self._subscribed = False
+            if not self._subscribed:
+                self._buffer.clear()
+        return self._subscribed
+
+    def emit(self, event: str, **data):
+        if not self.active:
+            return
+        if len(self._buffer) < MAX_BATCH:
+            self._buffer.append({"event": event, **data})
+        else:
+            self._dropped += 1
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        batch = {"events": self._buffer}
+        if self._dropped:
+            batch["dropped"] = self._dropped
+        self._buffer, self._dropped = [], 0
+        self._next_flush = time.monotonic() + FLUSH_INTERVAL_MS / 1000.0
+        try:
+            self.r.publish(self.channel, json.dumps(batch))
+        except Exception as e:
+            logger.warning(f"Could not publish events on {self.channel}: {e}")
+
+    def close(self, **final):
+        """Flush what is buffered and tell subscribers the stream is over"""
+        self.flush()
+        try:
+            self.r.publish(self.channel, json.dumps({"events": [{"event": "end", **final}]}))
+        except Exception as e:
+            logger.warning(f"Could not publish events on {self.channel}: {e}")
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_events(r, job_id: str, load_job: Callable[[], Optional[Dict[str, Any]]]) -> Iterator[str]:
+    """
+        Server-sent events for a job: a "status" snapshot, then one "batch"
+        message per published batch, then "end". The snapshot is read with
+        ``load_job`` after subscribing, so the end of the job cannot fall in
+        between; a finished job only gets the snapshot and "end".
+
+        The job is read again whenever the channel stays quiet for a poll,
+        so the stream also ends when the "end" message never comes: the
+        worker died, or the job was failed or expired without one.
+    """
+    def _finished(job: Optional[Dict[str, Any]]) -> bool:
+        return job is None or job["status"] in ("done", "failed")
+
+    pubsub = r.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(events_channel(job_id))
+    try:
+        job = load_job()
+        yield _sse("status", job)
+        if _finished(job):
+            yield _sse("end", {"status": job["status"] if job else None})
+            return
+
+        last_sent = time.monotonic()
+        while True:
+            message = pubsub.get_message(timeout=1.0)
+            if message is None:
+                job = load_job()
+                if _finished(job):
+                    yield _sse("end", {"status": job["status"] if job else None})
+                    return
+                if time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+                    last_sent = time.monotonic()
+                    yield ": keep-alive\n\n"
+                continue
+
+            batch = json.loads(message["data"])
+            last_sent = time.monotonic()
+            events = batch["events"]
+            if events and events[-1]["event"] == "end":
+                if len(events) > 1:
+                    yield _sse("batch", {**batch, "events": events[:-1]})
+                yield _sse("end", {k: v for k, v in events[-1].items() if k != "event"})
+                return
+            yield _sse("batch", batch)
+    finally:
+        pubsub.close()
@@ -3,8 +3,11 @@ import re
 import io
 from typing import List, Dict
 
+from app.utils.metrics import UPLOAD_PARSE_SECONDS
+
 pd.set_option('display.max_colwidth', None)
 
+@UPLOAD_PARSE_SECONDS.time()
 def extract_courses_from_excel(file_bytes: bytes) -> List[Dict]:
     """
     Reads Excel file bytes and extracts course details as list of dicts.
@@ -0,0 +1,253 @@
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from app.services.activities import LAB, Task, is_activity
+from app.services.feasibility_service import constraint_masks
+from app.services.occupancy_service import OccupancyEngine
+
+logger = logging.getLogger(__name__)
+
+# Blockers are tried for deletion in this order, so the ones users act on
+# (their own constraints) are the likeliest to stay in a blocking set
+_DELETION_ORDER = {"placement": 0, "faculty_booking": 1, "lab_spread": 2, "constraints": 3}
+
+
+class _GridIndex:
+    """Where the activities of a finished grid sit, for blocker lookups"""
+
+    def __init__(self, grid: Dict, occupancy: OccupancyEngine):
+        slot_index = occupancy.slot_model.index
+        # (day, slot) -> activities in the cell; breaks make a cell unusable
+        self.cells: Dict[Tuple[str, int], List[Any]] = defaultdict(list)
+        self.breaks: Set[Tuple[str, int]] = set()
+        # id(activity) -> (activity, day, slots)
+        self.placements: Dict[int, Tuple[Any, str, List[int]]] = {}
+        # (faculty, day) -> slot mask of the faculty member's activities in this grid
+        self.faculty_slots: Dict[Tuple[str, str], int] = defaultdict(int)
+        # (division, day) -> that division's labs
+        self.division_labs: Dict[Tuple[str, str], List[Any]] = defaultdict(list)
+
+        for day, day_slots in grid.items():
+            for label, cell in day_slots.items():
+                slot = slot_index.get(label)
+                if slot is None:
+                    continue
+                for activity in cell or ():
+                    if not is_activity(activity) or activity.get("type") in ("break", "Break"):
+                        self.breaks.add((day, slot))
+                        continue
+                    self.cells[(day, slot)].append(activity)
+                    if id(activity) not in self.placements:
+                        self.placements[id(activity)] = (activity, day, [])
+                        if activity.get("type") == LAB and activity.get("division"):
+                            self.division_labs[(activity.get("division"), day)].append(activity)
+                    self.placements[id(activity)][2].append(slot)
+                    if faculty := activity.get("faculty_name"):
+                        self.faculty_slots[(faculty, day)] |= 1 << slot
+
+
+def _candidate_blockers(
+        task: Task, occupancy: OccupancyEngine, index: _GridIndex, lab_slot_len: int,
+        allowed: Optional[List[int]], reasons: Dict[int, Set[str]]
+) -> List[Set[Hashable]]:
+    """
+        One blocker set per value the task could take (lecture slot or lab
+        window on a day); a value is free when its set is empty. Values that
+        cover a break are left out, nothing the user changes opens them.
+        ``reasons`` collects why each blocking placement is in the way.
+    """
+    slot_model = occupancy.slot_model
+    c = task.course
+    is_lab = task.type == LAB
+    if is_lab:
+        values = [(k, window.mask) for k, window in enumerate(slot_model.windows(lab_slot_len))]
+    else:
+        values = [(s, 1 << s) for s in range(slot_model.size) if not slot_model.is_break[s]]
+
+    candidates = []
+    for d, day in enumerate(occupancy.days):
+        # Bookings in other timetables: the faculty's busy slots not explained by this grid
+        external = occupancy.busy_mask(day, c.faculty_name) & ~index.faculty_slots.get((c.faculty_name, day), 0)
+        spread = (is_lab and not c.constraints and
+                  occupancy.division_lab_cells(task.division, day) >= 2)
+        # The course's own lectures that day, no two may be back to back
+        own_lectures = [] if is_lab else [
+            (activity, slots) for activity, a_day, slots in index.placements.values()
+            if a_day == day and activity.get("type") != LAB and activity.get("course_name") == c.course_name
+        ]
+
+        for bit, mask in values:
+            if any((day, s) in index.breaks for s in _slots(mask)):
+                continue
+            blockers: Set[Hashable] = set()
+            if allowed is not None and not allowed[d] & (1 << bit):
+                blockers.add(("constraints",))
+            for s in _slots(mask):
+                for activity in index.cells.get((day, s), ()):
+                    blockers.add(("placement", id(activity)))
+                    why = reasons[id(activity)]
+                    why.add("cell")
+                    if activity.get("faculty_name") == c.faculty_name:
+                        why.add("faculty")
+                    if is_lab and activity.get("division") == task.division:
+                        why.add("division")
+            if external & mask:
+                blockers.add(("faculty_booking", c.faculty_name, day))
+            if spread:
+                blockers.add(("lab_spread", task.division, day))
+            if not is_lab:
+                # Lectures stay out of any lab-sized window holding a lab
+                for s in _slots(slot_model.cover_mask(lab_slot_len, bit) & occupancy.lab_mask(day)):
+                    for activity in index.cells.get((day, s), ()):
+                        if activity.get("type") == LAB:
+                            blockers.add(("placement", id(activity)))
+                            reasons[id(activity)].add("lab_window")
+                for activity, slots in own_lectures:
+                    if any(slot_model.neighbor_masks[bit] & (1 << s) for s in slots):
+                        blockers.add(("placement", id(activity)))
+                        reasons[id(activity)].add("back_to_back")
+            candidates.append(blockers)
+    return candidates
+
+
+def _slots(mask: int) -> List[int]:
+    slots = []
+    while mask:
+        low = mask & -mask
+        slots.append(low.bit_length() - 1)
+        mask ^= low
+    return slots
+
+
+def blocking_core(candidates: List[Set[Hashable]]) -> List[Hashable]:
+    """
+        Deletion-based core extraction: starting from every blocker, drop each
+        one whose removal still leaves every candidate blocked. What remains
+        blocks all candidates, and removing any single member unblocks one.
+
+        Per-candidate hit counts are kept, so each deletion test only visits
+        the candidates that blocker touches. Blockers touching few candidates
+        are tried first (they rarely matter), which keeps the core small.
+    """
+    touching: Dict[Hashable, List[int]] = defaultdict(list)
+    hits = []
+    for i, blockers in enumerate(candidates):
+        hits.append(len(blockers))
+        for blocker in blockers:
+            touching[blocker].append(i)
+
+    order = sorted(touching, key=lambda b: (_DELETION_ORDER.get(b[0], 0), len(touching[b])))
+    core = []
+    for blocker in order:
+        if all(hits[i] > 1 for i in touching[blocker]):
+            for i in touching[blocker]:
+                hits[i] -= 1
+        else:
+            core.append(blocker)
+    return core
+
+
+def _describe_blocker(blocker: Tuple, task: Task, index: _GridIndex, occupancy: OccupancyEngine,
+                      allowed: Optional[List[int]], lab_slot_len: int,
+                      reasons: Dict[int, Set[str]]) -> Dict[str, Any]:
+    slot_model = occupancy.slot_model
+    kind = blocker[0]
+    if kind == "constraints":
+        windows = slot_model.windows(lab_slot_len)
+        labels = [
+            f"{day} {windows[b].label if task.type == LAB else slot_model.labels[b]}"
+            for d, day in enumerate(occupancy.days) for b in _slots(allowed[d])
+        ]
+        return {"kind": "constraints", "course_name": task.course.course_name,
+                "faculty_name": task.course.faculty_name, "allowed": labels}
+    if kind == "placement":
+        activity, day, slots = index.placements[blocker[1]]
+        described = {
+            "kind": "placement",
+            "course_name": activity.get("course_name"),
+            "faculty_name": activity.get("faculty_name"),
+            "type": activity.get("type"),
+            "day": day,
+            "slots": [slot_model.labels[s] for s in sorted(slots)],
+            "reasons": sorted(reasons[blocker[1]]),
+        }
+        if activity.get("type") == LAB:
+            described["division"] = activity.get("division")
+        return described
+    if kind == "faculty_booking":
+        _, faculty, day = blocker
+        busy = occupancy.busy_mask(day, faculty) & ~index.faculty_slots.get((faculty, day), 0)
+        return {"kind": "faculty_booking", "faculty_name": faculty, "day": day,
+                "slots": [slot_model.labels[s] for s in _slots(busy)]}
+    _, division, day = blocker
+    return {"kind": "lab_spread", "division": division, "day": day,
+            "labs": [a.get("course_name") for a in index.division_labs.get((division, day), ())]}
+
+
+def explain_unplaced(
+        tasks: List[Task], grid: Dict, occupancy: OccupancyEngine, lab_slot_len: int
+) -> List[Dict[str, Any]]:
+    """
+        A blocking set for each distinct unplaced task, against the finished
+        ``grid``: the course's constraints, competing placements (cell,
+        faculty, division, lab window or back-to-back use), faculty time
+        booked in other timetables and the one-lab-a-day rule that together
+        rule out every slot it could take. Relaxing any one of them opens a
+        slot, unless other blockers of that slot were left out of the set.
+
+        ``placeable_now`` marks tasks with a free slot in the final grid; the
+        allocator gave up on them for ordering reasons, not for lack of room.
+    """
+    index = _GridIndex(grid, occupancy)
+    explanations = []
+    seen: Dict[Tuple, Dict[str, Any]] = {}
+
+    for task in tasks:
+        c = task.course
+        key = (c.course_name, c.faculty_name, task.type, task.division)
+        if key in seen:
+            seen[key]["missing"] += 1
+            continue
+
+        allowed = constraint_masks(task)
+        reasons: Dict[int, Set[str]] = defaultdict(set)
+        candidates = _candidate_blockers(task, occupancy, index, lab_slot_len, allowed, reasons)
+        free = sum(not blockers for blockers in candidates)
+        core = [] if free or not candidates else blocking_core(candidates)
+        explanation = {
+            "course_name": c.course_name,
+            "faculty_name": c.faculty_name,
+            "type": task.type,
+            "division": task.division,
+            "missing": 1,
+            "candidates": len(candidates),
+            "placeable_now": bool(free),
+            "blocking": [_describe_blocker(b, task, index, occupancy, allowed, lab_slot_len, reasons) for b in core],
+        }
+        seen[key] = explanation
+        explanations.append(explanation)
+
+    logger.debug(f"Explained {len(explanations)} unplaced tasks")
+    return explanations
+
+
+def displacements(task: Task, grid: Dict, occupancy: OccupancyEngine, lab_slot_len: int) -> List[List[Any]]:
+    """
+        For each value ``task`` could take that only other placements in
+        ``grid`` block, the activities in the way; moving all of them out
+        opens that value. Values also blocked by the task's constraints, by
+        bookings in other timetables or by the one-lab-a-day rule are left
+        out, as are those blocked by the course's own lectures.
+    """
+    index = _GridIndex(grid, occupancy)
+    reasons: Dict[int, Set[str]] = defaultdict(set)
+    options = []
+    for blockers in _candidate_blockers(task, occupancy, index, lab_slot_len, constraint_masks(task), reasons):
+        if not blockers or any(b[0] != "placement" for b in blockers):
+            continue
+        activities = [index.placements[b[1]][0] for b in blockers]
+        if any(a.get("course_name") == task.course.course_name for a in activities):
+            continue
+        options.append(activities)
+    return options
@@ -0,0 +1,352 @@
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.activities import LAB, Task
+from app.services.occupancy_service import OccupancyEngine
+from app.services.solver_service import effective_tasks
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Overload:
+    """One over-subscribed entity: what it needs against what the grid can give it"""
+    # "faculty", "assignment", "division", "grid" or "slot"
+    kind: str
+    name: str
+    demand: int
+    supply: int
+    # "slots" (grid cells), "lab blocks" or "minutes" (across timetables)
+    unit: str
+    # Courses behind the demand
+    courses: List[str] = field(default_factory=list)
+
+    @property
+    def excess(self) -> int:
+        return self.demand - self.supply
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "demand": self.demand,
+            "supply": self.supply,
+            "excess": self.excess,
+            "unit": self.unit,
+            "courses": self.courses,
+        }
+
+
+@dataclass
+class FeasibilityReport:
+    overloads: List[Overload]
+    elapsed_ms: float = 0.0
+
+    @property
+    def feasible(self) -> bool:
+        return not self.overloads
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "feasible": self.feasible,
+            "overloads": [o.to_dict() for o in self.overloads],
+            "elapsed_ms": round(self.elapsed_ms, 3),
+        }
+
+
+class InfeasibleScheduleError(ValueError):
+    """The inputs cannot be scheduled whatever the solver does; ``report`` says why"""
+
+    def __init__(self, report: FeasibilityReport, where: str = ""):
+        self.report = report
+        self.where = where
+        worst = ", ".join(
+            f"{o.kind} {o.name} needs {o.demand} {o.unit} but has {o.supply}" for o in report.overloads[:3]
+        )
+        more = f" and {len(report.overloads) - 3} more" if len(report.overloads) > 3 else ""
+        super().__init__(f"Timetable{' for ' + where if where else ''} is infeasible: {worst}{more}")
+
+
+def _popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+def _disjoint_windows(bits: int, windows) -> int:
+    """Most windows among ``bits`` that can be used at once (no shared slot)"""
+    count, taken = 0, 0
+    # Windows are in time order and equally long, so earliest-first is optimal
+    while bits:
+        low = bits & -bits
+        window = windows[low.bit_length() - 1]
+        if not window.mask & taken:
+            taken |= window.mask
+            count += 1
+        bits ^= low
+    return count
+
+
+class _Assignment:
+    """One course component (lectures, or the labs of one faculty member) with its constraints"""
+    __slots__ = ("course", "faculty", "is_lab", "demand", "allowed")
+
+    def __init__(self, course: str, faculty: str, is_lab: bool):
+        self.course = course
+        self.faculty = faculty
+        self.is_lab = is_lab
+        # Lectures, or lab blocks
+        self.demand = 0
+        # Per-day allowed slot bits (lectures) or window bits (labs); None when unconstrained
+        self.allowed: Optional[List[int]] = None
+
+
+def constraint_masks(task: Task) -> Optional[List[int]]:
+    """
+        Per-day values a constrained task may take, from its course's compiled
+        constraints: slot bits for lectures, bits of
+        ``slot_model.windows(block_len)`` for labs. None when the course has
+        no constraints.
+    """
+    c = task.course
+    if not c.constraints:
+        return None
+    return list(c.compiled.masks(task.type))
+
+
+def _assignments(tasks: List[Task]) -> List[_Assignment]:
+    by_key: Dict[Tuple[str, str, bool], _Assignment] = {}
+
+    for task in effective_tasks(tasks):
+        c = task.course
+        is_lab = task.type == LAB
+        key = (c.course_name, c.faculty_name, is_lab)
+        if (assignment := by_key.get(key)) is None:
+            assignment = by_key[key] = _Assignment(c.course_name, c.faculty_name, is_lab)
+            # Constrained tasks only ever go where a constraint puts them
+            assignment.allowed = constraint_masks(task)
+        assignment.demand += 1
+    return list(by_key.values())
+
+
+def check_feasibility(tasks: List[Task], occupancy: OccupancyEngine, lab_slot_len: int) -> FeasibilityReport:
+    """
+        Capacity analysis of ``tasks`` against the grid held by ``occupancy``,
+        before any allocation.
+
+        Each check compares a demand with a supply that no placement can
+        exceed, so a reported overload means the input cannot be scheduled in
+        full by either solver:
+
+        - assignment: a constrained course component needs more lectures or
+          lab blocks than its constraints leave usable slots or windows for
+        - faculty: a faculty member's lectures and lab blocks need more slots
+          than they have free, in total or within their constraints
+        - division / grid: more lab blocks than non-overlapping free windows,
+          or more lecture and lab slots than free cells (every cell holds one
+          activity)
+        - slot: a constrained day/slot that several assignments must all use
+
+        A clean report does not promise a conflict-free timetable.
+    """
+    started = time.perf_counter()
+    slot_model = occupancy.slot_model
+    windows = slot_model.windows(lab_slot_len)
+    days = occupancy.days
+    assignments = _assignments(tasks)
+    overloads: List[Overload] = []
+
+    free = [occupancy.free_mask(day) for day in days]
+    free_windows = [occupancy.free_window_bits(day, lab_slot_len) if windows else 0 for day in days]
+    window_supply = sum(_disjoint_windows(bits, windows) for bits in free_windows)
+    # Free cells where each faculty member is not busy here or in another grid
+    available = {
+        a.faculty: [free[d] & ~occupancy.busy_mask(day, a.faculty) for d, day in enumerate(days)]
+        for a in assignments
+    }
+
+    def _windows_within(bits: int, mask: int) -> int:
+        """The windows among ``bits`` that lie entirely inside ``mask``"""
+        m = bits
+        while m:
+            low = m & -m
+            if windows[low.bit_length() - 1].mask & ~mask:
+                bits &= ~low
+            m ^= low
+        return bits
+
+    def _cells(a: _Assignment) -> int:
+        return a.demand * (lab_slot_len if a.is_lab else 1)
+
+    def _window_cells(bits: int) -> int:
+        mask = 0
+        while bits:
+            low = bits & -bits
+            mask |= windows[low.bit_length() - 1].mask
+            bits ^= low
+        return mask
+
+    def _allowed_cells(a: _Assignment, d: int) -> int:
+        return _window_cells(a.allowed[d]) if a.is_lab else a.allowed[d]
+
+    # Constrained assignments; the ones with no slack pin every slot they may use
+    pinned: Dict[Tuple[int, int], List[str]] = defaultdict(list)
+    for a in assignments:
+        if a.allowed is None:
+            continue
+        own = available[a.faculty]
+        if a.is_lab:
+            usable = [_windows_within(free_windows[d] & a.allowed[d], own[d]) for d in range(len(days))]
+            supply = sum(_disjoint_windows(bits, windows) for bits in usable)
+            unit = "lab blocks"
+        else:
+            usable = [own[d] & a.allowed[d] for d in range(len(days))]
+            supply = sum(_popcount(bits) for bits in usable)
+            unit = "slots"
+        if a.demand > supply:
+            overloads.append(Overload("assignment", f"{a.course} ({'lab' if a.is_lab else 'lecture'})",
+                                      a.demand, supply, unit, [a.course]))
+        elif a.demand == sum(_popcount(bits) for bits in usable):
+            # Every usable slot or window has to be taken
+            for d in range(len(days)):
+                mask = _window_cells(usable[d]) if a.is_lab else usable[d]
+                while mask:
+                    low = mask & -mask
+                    pinned[(d, low.bit_length() - 1)].append(a.course)
+                    mask ^= low
+
+    for (d, slot), courses in sorted(pinned.items()):
+        if len(courses) > 1:
+            overloads.append(Overload("slot", f"{days[d]} {slot_model.labels[slot]}", len(courses), 1, "slots",
+                                      courses))
+
+    # Faculty: all their slots, and their constrained slots
+    by_faculty: Dict[str, List[_Assignment]] = defaultdict(list)
+    for a in assignments:
+        by_faculty[a.faculty].append(a)
+    for faculty, own in by_faculty.items():
+        demand = sum(_cells(a) for a in own)
+        supply = sum(_popcount(m) for m in available[faculty])
+        courses = list(dict.fromkeys(a.course for a in own))
+        if demand > supply:
+            overloads.append(Overload("faculty", faculty, demand, supply, "slots", courses))
+            continue
+
+        constrained = [a for a in own if a.allowed is not None]
+        if len(constrained) > 1:
+            union = [0] * len(days)
+            for a in constrained:
+                for d in range(len(days)):
+                    union[d] |= _allowed_cells(a, d)
+            demand = sum(_cells(a) for a in constrained)
+            supply = sum(_popcount(union[d] & available[faculty][d]) for d in range(len(days)))
+            if demand > supply:
+                overloads.append(Overload("faculty", f"{faculty} (constrained)", demand, supply, "slots",
+                                          list(dict.fromkeys(a.course for a in constrained))))
+
+    # Divisions' lab blocks, then the whole grid
+    lab_blocks: Dict[str, int] = defaultdict(int)
+    lab_courses: Dict[str, List[str]] = defaultdict(list)
+    for task in effective_tasks(tasks):
+        if task.type == LAB:
+            lab_blocks[task.division] += 1
+            lab_courses[task.division].append(task.course.course_name)
+    for division, blocks in lab_blocks.items():
+        if blocks > window_supply:
+            overloads.append(Overload("division", division, blocks, window_supply, "lab blocks",
+                                      list(dict.fromkeys(lab_courses[division]))))
+
+    total_blocks = sum(lab_blocks.values())
+    if total_blocks > window_supply:
+        overloads.append(Overload("grid", "lab blocks", total_blocks, window_supply, "lab blocks"))
+    total_cells = sum(_cells(a) for a in assignments)
+    cell_supply = sum(_popcount(m) for m in free)
+    if total_cells > cell_supply:
+        overloads.append(Overload("grid", "slots", total_cells, cell_supply, "slots"))
+
+    report = FeasibilityReport(overloads, (time.perf_counter() - started) * 1000)
+    if overloads:
+        logger.warning(f"Feasibility check found {len(overloads)} over-subscribed entities "
+                       f"in {report.elapsed_ms:.1f}ms")
+    return report
+
+
+@dataclass
+class FacultyLoad:
+    """
+        A faculty member's share of one timetable, in minutes so that loads of
+        timetables with different slot layouts add up.
+    """
+    # Minutes their lectures and lab blocks take at the least
+    demand: int
+    # Day -> bitmask of the minutes covered by free cells they are not busy in
+    available: Dict[str, int]
+    courses: List[str]
+
+
+def faculty_loads(tasks: List[Task], occupancy: OccupancyEngine, lab_slot_len: int) -> Dict[str, FacultyLoad]:
+    """
+        Each faculty member's load in the grid held by ``occupancy``. Every
+        cell they need is counted at the length of the shortest free cell
+        they could use, so ``demand`` never exceeds what a placement takes.
+    """
+    slot_model = occupancy.slot_model
+    cell_minutes = [
+        ((1 << (end - start)) - 1) << start
+        for start, end in zip(slot_model.start_minutes, slot_model.end_minutes)
+    ]
+    by_faculty: Dict[str, List[_Assignment]] = defaultdict(list)
+    for a in _assignments(tasks):
+        by_faculty[a.faculty].append(a)
+
+    loads = {}
+    for faculty, own in by_faculty.items():
+        available, shortest = {}, None
+        for day in occupancy.days:
+            cells, minutes = occupancy.free_mask(day) & ~occupancy.busy_mask(day, faculty), 0
+            while cells:
+                low = cells & -cells
+                slot = low.bit_length() - 1
+                minutes |= cell_minutes[slot]
+                length = slot_model.end_minutes[slot] - slot_model.start_minutes[slot]
+                shortest = length if shortest is None else min(shortest, length)
+                cells ^= low
+            available[day] = minutes
+        cells = sum(a.demand * (lab_slot_len if a.is_lab else 1) for a in own)
+        loads[faculty] = FacultyLoad(cells * (shortest or 0), available, list(dict.fromkeys(a.course for a in own)))
+    return loads
+
+
+def check_joint_faculty(loads: List[Dict[str, FacultyLoad]]) -> FeasibilityReport:
+    """
+        Faculty overloads across timetables scheduled together, from each
+        timetable's faculty_loads(): a faculty member teaching in several of
+        them needs more minutes in total than the free time of all their
+        grids covers. check_feasibility() sees one timetable at a time and
+        misses these.
+    """
+    started = time.perf_counter()
+    shares: Dict[str, List[FacultyLoad]] = defaultdict(list)
+    for timetable in loads:
+        for faculty, load in timetable.items():
+            shares[faculty].append(load)
+
+    overloads = []
+    for faculty, own in shares.items():
+        if len(own) < 2:
+            continue
+        union: Dict[str, int] = defaultdict(int)
+        for load in own:
+            for day, minutes in load.available.items():
+                union[day] |= minutes
+        demand = sum(load.demand for load in own)
+        supply = sum(_popcount(minutes) for minutes in union.values())
+        if demand > supply:
+            courses = list(dict.fromkeys(course for load in own for course in load.courses))
+            overloads.append(Overload("faculty", faculty, demand, supply, "minutes", courses))
+
+    report = FeasibilityReport(overloads, (time.perf_counter() - started) * 1000)
+    if overloads:
+        logger.warning(f"Joint feasibility check found {len(overloads)} over-booked faculty members")
+    return report
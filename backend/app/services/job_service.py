@@ -0,0 +1,288 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.config import JOB_WORKERS
+from app.database import SessionLocal
+from app.services.constraint_service import ConstraintValidationError
+from app.services.event_service import EventStream, events_channel
+from app.services.feasibility_service import InfeasibleScheduleError
+from app.services.timetable_service import ProgressCallback, generate_timetable
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+QUEUE_KEY = "jobs:queue"
+# Claimed jobs; an entry whose lease runs out is put back on the queue
+PROCESSING_KEY = "jobs:processing"
+
+LEASE_SECONDS = 60
+HEARTBEAT_SECONDS = 10
+# Finished jobs stay readable this long
+RESULT_TTL_SECONDS = 24 * 60 * 60
+CLAIM_TIMEOUT_SECONDS = 1
+# A job that keeps taking its worker down is failed after this many claims
+MAX_ATTEMPTS = 3
+
+GENERATE_TIMETABLE = "generate_timetable"
+
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def _generate_timetable_job(
+        params: Dict[str, Any], progress: ProgressCallback, events: EventStream
+) -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        return generate_timetable(db=db, **params, progress=progress, events=events)
+    finally:
+        db.close()
+
+
+# kind -> handler(params, progress, events) returning a JSON-serializable result
+_handlers: Dict[str, Callable[[Dict[str, Any], ProgressCallback, EventStream], Any]] = {
+    GENERATE_TIMETABLE: _generate_timetable_job,
+}
+
+
+def submit_job(kind: str, params: Dict[str, Any]) -> str:
+    """Queue a job and return its id; the state lives in Redis, not in this process"""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind '{kind}'")
+
+    r = get_redis()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    pipe = r.pipeline()
+    pipe.hset(job_key(job_id), mapping={
+        "id": job_id,
+        "kind": kind,
+        "status": QUEUED,
+        "phase": QUEUED,
+        "placed": 0,
+        "total": 0,
+        "params": json.dumps(params),
+        "created_at": now,
+        "updated_at": now,
+    })
+    pipe.rpush(QUEUE_KEY, job_id)
+    pipe.execute()
+    logger.info(f"Queued {kind} job {job_id}")
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+        Job state as stored in Redis: id, kind, status, phase, placed, total,
+        attempts, timestamps, and the result or error once finished. A job
+        rejected by the precheck also has ``error_detail``, the detail the
+        synchronous endpoint answers 422 with.
+    """
+    raw = get_redis().hgetall(job_key(job_id))
+    if not raw:
+        return None
+
+    return {
+        "id": raw["id"],
+        "kind": raw.get("kind"),
+        "status": raw.get("status"),
+        "phase": raw.get("phase"),
+        "placed": int(raw.get("placed", 0)),
+        "total": int(raw.get("total", 0)),
+        "attempts": int(raw.get("attempts", 0)),
+        "created_at": float(raw["created_at"]),
+        "updated_at": float(raw["updated_at"]),
+        "result": json.loads(raw["result"]) if raw.get("result") else None,
+        "error": raw.get("error"),
+        "error_detail": json.loads(raw["error_detail"]) if raw.get("error_detail") else None,
+    }
+
+
+def _error_detail(e: Exception) -> Optional[Dict[str, Any]]:
+    """What a precheck rejection reports beyond its message: the invalid constraints or the overloads"""
+    if isinstance(e, ConstraintValidationError):
+        return {"message": str(e), "errors": e.errors}
+    if isinstance(e, InfeasibleScheduleError):
+        return {"message": str(e), **e.report.to_dict()}
+    return None
+
+
+def _claim(r) -> Optional[str]:
+    job_id = r.blmove(QUEUE_KEY, PROCESSING_KEY, CLAIM_TIMEOUT_SECONDS, "LEFT", "RIGHT")
+    if job_id is None:
+        return None
+
+    now = time.time()
+    pipe = r.pipeline()
+    pipe.hset(job_key(job_id), mapping={
+        "status": RUNNING,
+        "phase": "starting",
+        "lease_until": now + LEASE_SECONDS,
+        "updated_at": now,
+    })
+    pipe.hincrby(job_key(job_id), "attempts", 1)
+    pipe.execute()
+    return job_id
+
+
+def _finish(r, job_id: str, status: str, **fields):
+    pipe = r.pipeline()
+    pipe.hset(job_key(job_id), mapping={"status": status, "phase": status, "updated_at": time.time(), **fields})
+    pipe.hdel(job_key(job_id), "lease_until")
+    pipe.expire(job_key(job_id), RESULT_TTL_SECONDS)
+    pipe.lrem(PROCESSING_KEY, 0, job_id)
+    pipe.execute()
+
+
+def requeue_expired(r) -> int:
+    """
+        Put claimed jobs whose lease ran out back at the front of the queue.
+
+        A lease runs out when the process running the job died or was
+        restarted. Entries claimed without a lease yet get one now, so a job
+        is only requeued after a full lease without a heartbeat. Each job is
+        checked in a transaction watching the processing list and the job's
+        hash, so a heartbeat renewing the lease meanwhile stops the requeue.
+    """
+    requeued = 0
+    now = time.time()
+    for job_id in r.lrange(PROCESSING_KEY, 0, -1):
+        key = job_key(job_id)
+
+        def _requeue(pipe) -> bool:
+            if job_id not in pipe.lrange(PROCESSING_KEY, 0, -1):
+                return False  # Finished, or another process got to it first
+            lease = pipe.hget(key, "lease_until")
+            if lease is None:
+                exists = pipe.exists(key)
+                pipe.multi()
+                if exists:
+                    pipe.hset(key, "lease_until", now + LEASE_SECONDS)
+                else:
+                    pipe.lrem(PROCESSING_KEY, 0, job_id)
+                return False
+            if float(lease) > now:
+                return False
+            pipe.multi()
+            pipe.lrem(PROCESSING_KEY, 0, job_id)
+            pipe.hset(key, mapping={"status": QUEUED, "phase": "requeued", "updated_at": now})
+            pipe.hdel(key, "lease_until")
+            pipe.lpush(QUEUE_KEY, job_id)
+            return True
+
+        if r.transaction(_requeue, PROCESSING_KEY, key, value_from_callable=True):
+            logger.warning(f"Requeued job {job_id} after its lease ran out")
+            requeued += 1
+    return requeued
+
+
+class JobWorkerPool:
+    """
+        A fixed number of worker threads taking jobs from the Redis queue.
+
+        Jobs are claimed with BLMOVE onto a processing list and hold a lease
+        that a heartbeat thread renews while they run. Nothing about a job is
+        kept only in memory, so after a restart queued jobs are simply picked
+        up again and jobs that were running are requeued once their lease
+        runs out (by this pool or any other one sharing the Redis).
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._active: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        requeue_expired(get_redis())
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        self._threads.append(threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Started {self.workers} job workers")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop taking jobs; a job still running keeps its lease until it expires and is then requeued"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _heartbeat(self):
+        r = get_redis()
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            try:
+                with self._lock:
+                    active = list(self._active)
+                lease_until = time.time() + LEASE_SECONDS
+                for job_id in active:
+                    r.hset(job_key(job_id), "lease_until", lease_until)
+                requeue_expired(r)
+            except Exception as e:
+                logger.error(f"Job heartbeat failed: {e}")
+
+    def _work(self):
+        r = get_redis()
+        while not self._stop.is_set():
+            try:
+                job_id = _claim(r)
+            except Exception as e:
+                logger.error(f"Could not claim a job: {e}")
+                self._stop.wait(CLAIM_TIMEOUT_SECONDS)
+                continue
+            if job_id is not None:
+                self._run(r, job_id)
+
+    def _run(self, r, job_id: str):
+        with self._lock:
+            self._active.add(job_id)
+        events = EventStream(r, events_channel(job_id))
+        status = FAILED
+        try:
+            raw = r.hgetall(job_key(job_id))
+            if int(raw.get("attempts", 1)) > MAX_ATTEMPTS:
+                raise RuntimeError(f"Gave up after {MAX_ATTEMPTS} attempts")
+            handler = _handlers.get(raw.get("kind"))
+            if handler is None:
+                raise ValueError(f"Unknown job kind '{raw.get('kind')}'")
+
+            def progress(phase: str, placed: int, total: int):
+                r.hset(job_key(job_id), mapping={
+                    "phase": phase, "placed": placed, "total": total, "updated_at": time.time()
+                })
+                events.emit("phase", phase=phase, placed=placed, total=total)
+
+            result = handler(json.loads(raw.get("params") or "{}"), progress, events)
+            _finish(r, job_id, DONE, result=json.dumps(result))
+            status = DONE
+            logger.info(f"Job {job_id} done")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            fields = {"error": f"{type(e).__name__}: {str(e)}"}
+            if (detail := _error_detail(e)) is not None:
+                fields["error_detail"] = json.dumps(detail)
+            _finish(r, job_id, FAILED, **fields)
+        finally:
+            events.close(status=status)
+            with self._lock:
+                self._active.discard(job_id)
+
+
+job_pool = JobWorkerPool(JOB_WORKERS)
@@ -1,4 +1,5 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
 def generate_timetable_layout(
@@ -170,4 +171,130 @@ def _parse_time(time_str: str) -> datetime:
 
 def _format_time(dt: datetime) -> str:
     """Format datetime object into HH:MM format"""
-    return dt.strftime("%H:%M")
\ No newline at end of file
+    return dt.strftime("%H:%M")
+
+@dataclass(frozen=True)
+class SlotWindow:
+    """A run of contiguous slots, e.g. the two slots of a lab block"""
+    start: int
+    length: int
+    mask: int
+    label: str
+
+    @property
+    def slots(self) -> range:
+        return range(self.start, self.start + self.length)
+
+
+@dataclass
+class SlotModel:
+    """
+        Integer view of ``layout["time_slots"]``, compiled once per layout.
+
+        Slots are addressed by their index in the layout. Contiguity, neighbours
+        and block windows are precomputed so the allocator never has to parse
+        slot labels; labels are only needed when the grid is serialized.
+    """
+    labels: List[str]
+    index: Dict[str, int]
+    start_minutes: List[int]
+    end_minutes: List[int]
+    is_break: List[bool]
+    prev_slot: List[int]
+    next_slot: List[int]
+    neighbor_masks: List[int]
+    windows_by_len: Dict[int, List[SlotWindow]] = field(default_factory=dict)
+    window_index: Dict[Tuple[int, str], SlotWindow] = field(default_factory=dict)
+    cover_masks: Dict[int, List[int]] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.labels)
+
+    @property
+    def full_mask(self) -> int:
+        return (1 << len(self.labels)) - 1
+
+    def windows(self, block_len: int) -> List[SlotWindow]:
+        """Contiguous windows of ``block_len`` slots, in time order"""
+        return self.windows_by_len.get(block_len, [])
+
+    def window(self, block_len: int, label: str) -> Optional[SlotWindow]:
+        return self.window_index.get((block_len, label))
+
+    def cover_mask(self, block_len: int, slot: int) -> int:
+        """Union of every ``block_len`` window that contains ``slot``"""
+        covers = self.cover_masks.get(block_len)
+        return covers[slot] if covers else 0
+
+    def start_of(self, label: str) -> int:
+        """Start minute of a slot or window label, for ordering"""
+        if (idx := self.index.get(label)) is not None:
+            return self.start_minutes[idx]
+        return _minutes(label.split('-')[0])
+
+
+def compile_slot_model(layout: Dict[str, Any]) -> SlotModel:
+    """
+        Compile ``layout["time_slots"]`` into a SlotModel.
+
+        Args:
+            layout: The "layout" part of generate_timetable_layout's output
+
+        Returns:
+            SlotModel with index, minute, break, neighbour and window tables
+    """
+    time_slots = layout["time_slots"]
+    labels = [f"{ts['start']}-{ts['end']}" for ts in time_slots]
+    n = len(labels)
+
+    start_minutes = [_minutes(ts["start"]) for ts in time_slots]
+    end_minutes = [_minutes(ts["end"]) for ts in time_slots]
+    prev_slot = [i - 1 for i in range(n)]
+    next_slot = [i + 1 if i < n - 1 else -1 for i in range(n)]
+    neighbor_masks = [
+        (1 << (i - 1) if i > 0 else 0) | (1 << (i + 1) if i < n - 1 else 0)
+        for i in range(n)
+    ]
+
+    model = SlotModel(
+        labels=labels,
+        index={label: i for i, label in enumerate(labels)},
+        start_minutes=start_minutes,
+        end_minutes=end_minutes,
+        is_break=[bool(ts.get("is_break")) for ts in time_slots],
+        prev_slot=prev_slot,
+        next_slot=next_slot,
+        neighbor_masks=neighbor_masks,
+    )
+
+    for block_len in range(1, n + 1):
+        windows = []
+        covers = [0] * n
+        for start in range(n - block_len + 1):
+            end = start + block_len - 1
+            if any(end_minutes[j] != start_minutes[j + 1] for j in range(start, end)):
+                continue
+
+            mask = ((1 << block_len) - 1) << start
+            window = SlotWindow(
+                start=start,
+                length=block_len,
+                mask=mask,
+                label=f"{time_slots[start]['start']}-{time_slots[end]['end']}",
+            )
+            windows.append(window)
+            model.window_index.setdefault((block_len, window.label), window)
+            for j in range(start, end + 1):
+                covers[j] |= mask
+
+        model.windows_by_len[block_len] = windows
+        model.cover_masks[block_len] = covers
+
+    return model
+
+
+def _minutes(time_str: str) -> int:
+    """Convert "HH:MM" into minutes since midnight"""
+    parsed = _parse_time(time_str)
+    return parsed.hour * 60 + parsed.minute
@@ -0,0 +1,125 @@
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.pool import Pool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STARTS = 1
+DEFAULT_DEADLINE_MS = 10000
+
+
+# One pool of spawned workers for the whole process. Forking from the job
+# worker threads would copy locks held by other threads; spawned workers
+# import the app afresh, which costs their start-up once, not per run.
+_pool: Optional[Pool] = None
+_pool_size = 0
+# Runs share the pool one at a time; a run past its deadline terminates it
+_pool_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def _keep_best(best: Optional[Tuple[Any, Any]], outcome: Any, key: Callable[[Any], Any]) -> Tuple[Any, Any]:
+    rank = key(outcome)
+    if best is None or rank < best[0]:
+        return rank, outcome
+    return best
+
+
+def _get_pool(workers: int) -> Pool:
+    global _pool, _pool_size
+    if _pool is None or _pool_size != workers:
+        _terminate_pool()
+        _pool = multiprocessing.get_context("spawn").Pool(workers)
+        _pool_size = workers
+    return _pool
+
+
+def _terminate_pool():
+    """Kill the workers, whatever they are running; the next run starts a new pool"""
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+
+
+def shutdown_pool():
+    """Stop the multi-start workers, e.g. when the application shuts down"""
+    with _pool_lock:
+        _terminate_pool()
+
+
+def run_multistart(
+        run: Callable[..., Any],
+        payload: Dict[str, Any],
+        seeds: List[Optional[int]],
+        key: Callable[[Any], Any],
+        workers: Optional[int] = None,
+        deadline_ms: Optional[int] = DEFAULT_DEADLINE_MS
+) -> Tuple[Any, int]:
+    """
+        Run ``run(**payload, seed=seed)`` for every seed and keep the outcome
+        with the smallest ``key``. Returns (best outcome, number of finished
+        starts).
+
+        With more than one worker the first start runs in the calling thread
+        and the others on a process pool of spawned workers, so ``run`` must
+        be a module-level function and ``payload`` must be picklable; the
+        workers get their own copy of the inputs and share nothing. The first
+        start always finishes, so there is a result to return. Starts still
+        running at the deadline (or once the first start finishes, if that
+        is later) are stopped by terminating the pool's workers, so they use
+        no CPU past it. Ties go to the earlier seed. With ``deadline_ms=None``
+        every start is waited for, so the pick only depends on the seeds.
+    """
+    deadline = time.perf_counter() + deadline_ms / 1000.0 if deadline_ms is not None else math.inf
+    workers = workers or default_workers()
+    best = None
+    finished = 0
+
+    if workers <= 1 or len(seeds) == 1:
+        for i, seed in enumerate(seeds):
+            if i and time.perf_counter() >= deadline:
+                break
+            best = _keep_best(best, run(**payload, seed=seed), key)
+            finished += 1
+        return best[1], finished
+
+    first_error = None
+    with _pool_lock:
+        pool = _get_pool(workers)
+        pending = [pool.apply_async(run, kwds={**payload, "seed": seed}) for seed in seeds[1:]]
+        try:
+            try:
+                best = _keep_best(best, run(**payload, seed=seeds[0]), key)
+                finished += 1
+            except Exception as e:
+                logger.error(f"Multi-start run failed: {e}")
+                first_error = e
+
+            for result in pending:
+                result.wait(max(0.0, deadline - time.perf_counter()) if deadline_ms is not None else None)
+                if not result.ready():
+                    continue
+                try:
+                    best = _keep_best(best, result.get(), key)
+                    finished += 1
+                except Exception as e:
+                    logger.error(f"Multi-start run failed: {e}")
+        finally:
+            if stopped := sum(not result.ready() for result in pending):
+                _terminate_pool()
+                logger.info(f"Multi-start: stopped {stopped} runs still going at the deadline")
+
+    if best is None:
+        # Every start failed; surface the first start's error
+        raise first_error
+    return best[1], finished
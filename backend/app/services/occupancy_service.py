@@ -0,0 +1,379 @@
+from typing import Dict, List, Optional, Iterable, Iterator, Tuple
+
+from app.services.layout_service import SlotModel, SlotWindow
+
+
+class FacultyCalendar:
+    """
+        Faculty busy times shared by several occupancy engines.
+
+        Grids of different departments and semesters can have different slot
+        layouts, so busy times are kept per faculty member per day name as a
+        bitmask over the minutes of the day (bit ``m`` set when busy during
+        minute ``m``). Engines attached to the same calendar never place a
+        faculty member in overlapping slots.
+    """
+
+    def __init__(self):
+        self._busy: Dict[str, Dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._busy)
+
+    def busy(self, faculty: str, day: str) -> int:
+        return self._busy.get(faculty, {}).get(day, 0)
+
+    def occupy(self, faculty: str, day: str, minutes: int):
+        days = self._busy.setdefault(faculty, {})
+        days[day] = days.get(day, 0) | minutes
+
+    def release(self, faculty: str, day: str, minutes: int):
+        if (days := self._busy.get(faculty)) and day in days:
+            days[day] &= ~minutes
+
+    def entries(self) -> List[Tuple[str, str, int]]:
+        """(faculty, day, minutes) for every busy faculty-day"""
+        return [(faculty, day, minutes) for faculty, days in self._busy.items()
+                for day, minutes in days.items() if minutes]
+
+
+class OccupancyEngine:
+    """
+        Tracks which faculty members and divisions are busy in which slots.
+
+        Every faculty member and division is interned to an integer id and gets
+        one integer bitmask per day, where bit ``i`` is set when the entity is
+        busy in the i-th time slot of the layout. Availability checks become bit
+        tests, and a whole lab window is checked with a single mask AND.
+
+        The engine also counts grid cell contents per day (any activity or
+        break, and labs specifically) so cell emptiness and lab adjacency are
+        bit tests as well. For tracked block lengths it keeps an incremental
+        index of free windows per day, and it counts lab cells per division
+        per day.
+
+        With a ``faculty_calendar`` the faculty checks also see time taken in
+        other grids attached to the same calendar, and faculty placements are
+        recorded there too. The busy maps still only list this grid.
+    """
+
+    def __init__(self, days: Iterable[str], slot_model: SlotModel,
+                 faculty_calendar: Optional[FacultyCalendar] = None):
+        self.days = list(days)
+        self.slot_model = slot_model
+        self.time_labels = slot_model.labels
+        self._day_index = {day: i for i, day in enumerate(self.days)}
+        self._slot_index = slot_model.index
+
+        self.faculty_calendar = faculty_calendar
+        # Minutes of the day covered by each slot, for the shared calendar
+        self._slot_minutes = [
+            ((1 << max(0, end - start)) - 1) << start
+            for start, end in zip(slot_model.start_minutes, slot_model.end_minutes)
+        ]
+
+        self._faculty_ids: Dict[str, int] = {}
+        self._division_ids: Dict[str, int] = {}
+        self._faculty_masks: List[List[int]] = []
+        self._division_masks: List[List[int]] = []
+        # Union of all division masks per day, used for "is any division busy"
+        self._division_union: List[int] = [0] * len(self.days)
+
+        # Number of activities (breaks included) and labs per (day, slot)
+        self._cell_counts: List[List[int]] = [[0] * slot_model.size for _ in self.days]
+        self._lab_counts: List[List[int]] = [[0] * slot_model.size for _ in self.days]
+        self._filled: List[int] = [0] * len(self.days)
+        self._labs: List[int] = [0] * len(self.days)
+
+        # Lab cells per division per day ([division_id][day_idx])
+        self._division_lab_cells: List[List[int]] = []
+
+        # block_len -> (windows, windows touching each slot, free-window bits per day)
+        self._window_index: Dict[int, Tuple[List[SlotWindow], List[int], List[int]]] = {}
+
+    # ------------------------------------------------------------------ ids
+
+    def _intern(self, name: str, ids: Dict[str, int], masks: List[List[int]]) -> int:
+        entity_id = ids.get(name)
+        if entity_id is None:
+            entity_id = len(masks)
+            ids[name] = entity_id
+            masks.append([0] * len(self.days))
+        return entity_id
+
+    def faculty_id(self, faculty: str) -> int:
+        return self._intern(faculty, self._faculty_ids, self._faculty_masks)
+
+    def division_id(self, division: str) -> int:
+        entity_id = self._intern(division, self._division_ids, self._division_masks)
+        if entity_id == len(self._division_lab_cells):
+            self._division_lab_cells.append([0] * len(self.days))
+        return entity_id
+
+    def slot_mask(self, labels: Iterable[str]) -> int:
+        """Build a bitmask covering the given slot labels"""
+        mask = 0
+        for label in labels:
+            mask |= 1 << self._slot_index[label]
+        return mask
+
+    def has_day(self, day: str) -> bool:
+        return day in self._day_index
+
+    def day_index(self, day: str) -> int:
+        return self._day_index[day]
+
+    def _minutes(self, mask: int) -> int:
+        minutes = 0
+        while mask:
+            low = mask & -mask
+            minutes |= self._slot_minutes[low.bit_length() - 1]
+            mask ^= low
+        return minutes
+
+    def _calendar_mask(self, faculty: Optional[str], day: str) -> int:
+        """Slots overlapping the faculty member's time in the shared calendar"""
+        if self.faculty_calendar is None or faculty is None:
+            return 0
+        if not (busy := self.faculty_calendar.busy(faculty, day)):
+            return 0
+        mask = 0
+        for slot, minutes in enumerate(self._slot_minutes):
+            if busy & minutes:
+                mask |= 1 << slot
+        return mask
+
+    # --------------------------------------------------------------- checks
+
+    def faculty_busy(self, faculty: Optional[str], day: str, mask: int) -> bool:
+        if day not in self._day_index:
+            return False
+        if self.faculty_calendar is not None and faculty is not None:
+            return bool(self.faculty_calendar.busy(faculty, day) & self._minutes(mask))
+        entity_id = self._faculty_ids.get(faculty)
+        if entity_id is None:
+            return False
+        return bool(self._faculty_masks[entity_id][self._day_index[day]] & mask)
+
+    def division_busy(self, division: Optional[str], day: str, mask: int) -> bool:
+        entity_id = self._division_ids.get(division)
+        if entity_id is None or day not in self._day_index:
+            return False
+        return bool(self._division_masks[entity_id][self._day_index[day]] & mask)
+
+    def any_division_busy(self, day: str, mask: int) -> bool:
+        if day not in self._day_index:
+            return False
+        return bool(self._division_union[self._day_index[day]] & mask)
+
+    def busy_mask(self, day: str, faculty: Optional[str] = None, division: Optional[str] = None) -> int:
+        """Slots on ``day`` where the faculty member or the division is busy"""
+        d = self._day_index[day]
+        mask = self._calendar_mask(faculty, day)
+        if faculty in self._faculty_ids:
+            mask |= self._faculty_masks[self._faculty_ids[faculty]][d]
+        if division in self._division_ids:
+            mask |= self._division_masks[self._division_ids[division]][d]
+        return mask
+
+    def cells_free(self, day: str, mask: int) -> bool:
+        """True when no slot in ``mask`` holds an activity or a break"""
+        return not self._filled[self._day_index[day]] & mask
+
+    def free_mask(self, day: str) -> int:
+        """Slots on ``day`` whose cells hold no activity or break"""
+        return self.slot_model.full_mask & ~self._filled[self._day_index[day]]
+
+    def has_lab(self, day: str, mask: int) -> bool:
+        return bool(self._labs[self._day_index[day]] & mask)
+
+    def lab_mask(self, day: str) -> int:
+        """Slots on ``day`` holding at least one lab"""
+        return self._labs[self._day_index[day]]
+
+    def division_lab_cells(self, division: str, day: str) -> int:
+        """Number of (slot, lab) cells the division has on ``day``"""
+        entity_id = self._division_ids.get(division)
+        if entity_id is None or day not in self._day_index:
+            return 0
+        return self._division_lab_cells[entity_id][self._day_index[day]]
+
+    def lab_zone(self, day: str, block_len: int) -> int:
+        """Slots that share a ``block_len`` window with a lab on ``day``"""
+        labs = self._labs[self._day_index[day]]
+        if not labs or not block_len:
+            return 0
+
+        zone = 0
+        for window in self.slot_model.windows(block_len):
+            if window.mask & labs:
+                zone |= window.mask
+        return zone
+
+    def lecture_free_masks(self, faculty: str, lab_block_len: int) -> List[int]:
+        """
+            Per-day bitmask of slots where ``faculty`` could hold a lecture:
+            empty cells, faculty and every division free, and no lab window
+            touching the slot.
+        """
+        return [self.lecture_free_mask(faculty, day, lab_block_len) for day in self.days]
+
+    def lecture_free_mask(self, faculty: str, day: str, lab_block_len: int) -> int:
+        """``lecture_free_masks`` for a single day"""
+        d = self._day_index[day]
+        blocked = (self._filled[d] | self._division_union[d] | self.lab_zone(day, lab_block_len) |
+                   self._calendar_mask(faculty, day))
+        if faculty in self._faculty_ids:
+            blocked |= self._faculty_masks[self._faculty_ids[faculty]][d]
+        return self.slot_model.full_mask & ~blocked
+
+    # --------------------------------------------------------- window index
+
+    def track_windows(self, block_len: int):
+        """Start maintaining the free-window index for ``block_len`` blocks"""
+        if block_len in self._window_index:
+            return
+
+        windows = self.slot_model.windows(block_len)
+        touching = [0] * self.slot_model.size
+        for k, window in enumerate(windows):
+            for slot in window.slots:
+                touching[slot] |= 1 << k
+
+        free = []
+        for d in range(len(self.days)):
+            bits = 0
+            for k, window in enumerate(windows):
+                if not self._filled[d] & window.mask:
+                    bits |= 1 << k
+            free.append(bits)
+
+        self._window_index[block_len] = (windows, touching, free)
+
+    def free_window_bits(self, day: str, block_len: int) -> int:
+        """Bit k is set when ``slot_model.windows(block_len)[k]`` has all cells empty"""
+        self.track_windows(block_len)
+        return self._window_index[block_len][2][self._day_index[day]]
+
+    def free_windows(self, day: str, block_len: int) -> Iterator[SlotWindow]:
+        """Windows of ``block_len`` slots with all cells empty, in time order"""
+        self.track_windows(block_len)
+        windows, _, free = self._window_index[block_len]
+        bits = free[self._day_index[day]]
+        while bits:
+            low = bits & -bits
+            yield windows[low.bit_length() - 1]
+            bits ^= low
+
+    def _cells_filled(self, d: int, mask: int):
+        for windows, touching, free in self._window_index.values():
+            stale = 0
+            while mask:
+                low = mask & -mask
+                stale |= touching[low.bit_length() - 1]
+                mask ^= low
+            free[d] &= ~stale
+
+    def _cells_emptied(self, d: int, mask: int):
+        for windows, touching, free in self._window_index.values():
+            candidates = 0
+            m = mask
+            while m:
+                low = m & -m
+                candidates |= touching[low.bit_length() - 1]
+                m ^= low
+            while candidates:
+                low = candidates & -candidates
+                if not self._filled[d] & windows[low.bit_length() - 1].mask:
+                    free[d] |= low
+                candidates ^= low
+
+    # -------------------------------------------------------------- updates
+
+    def occupy(self, day: str, mask: int, faculty: Optional[str] = None, division: Optional[str] = None):
+        d = self._day_index[day]
+        if faculty is not None:
+            self._faculty_masks[self.faculty_id(faculty)][d] |= mask
+            if self.faculty_calendar is not None:
+                self.faculty_calendar.occupy(faculty, day, self._minutes(mask))
+        if division is not None:
+            self._division_masks[self.division_id(division)][d] |= mask
+            self._division_union[d] |= mask
+
+    def release(self, day: str, mask: int, faculty: Optional[str] = None, division: Optional[str] = None):
+        d = self._day_index[day]
+        if faculty is not None and faculty in self._faculty_ids:
+            self._faculty_masks[self._faculty_ids[faculty]][d] &= ~mask
+            if self.faculty_calendar is not None:
+                self.faculty_calendar.release(faculty, day, self._minutes(mask))
+        if division is not None and division in self._division_ids:
+            self._division_masks[self._division_ids[division]][d] &= ~mask
+            union = 0
+            for masks in self._division_masks:
+                union |= masks[d]
+            self._division_union[d] = union
+
+    def add_cell_activity(self, day: str, mask: int, lab: bool = False,
+                          division: Optional[str] = None, count: int = 1):
+        """Record ``count`` activities placed in every grid cell of ``mask``"""
+        d = self._day_index[day]
+        newly_filled = mask & ~self._filled[d]
+        if lab and division is not None:
+            self._division_lab_cells[self.division_id(division)][d] += bin(mask).count("1") * count
+
+        while mask:
+            low = mask & -mask
+            slot = low.bit_length() - 1
+            self._cell_counts[d][slot] += count
+            self._filled[d] |= low
+            if lab:
+                self._lab_counts[d][slot] += count
+                self._labs[d] |= low
+            mask ^= low
+
+        if newly_filled:
+            self._cells_filled(d, newly_filled)
+
+    def remove_cell_activity(self, day: str, mask: int, lab: bool = False,
+                             division: Optional[str] = None, count: int = 1):
+        d = self._day_index[day]
+        was_filled = self._filled[d] & mask
+        if lab and division is not None and division in self._division_ids:
+            cells = self._division_lab_cells[self._division_ids[division]]
+            cells[d] = max(0, cells[d] - bin(mask).count("1") * count)
+
+        while mask:
+            low = mask & -mask
+            slot = low.bit_length() - 1
+            self._cell_counts[d][slot] = max(0, self._cell_counts[d][slot] - count)
+            if not self._cell_counts[d][slot]:
+                self._filled[d] &= ~low
+            if lab:
+                self._lab_counts[d][slot] = max(0, self._lab_counts[d][slot] - count)
+                if not self._lab_counts[d][slot]:
+                    self._labs[d] &= ~low
+            mask ^= low
+
+        if newly_empty := was_filled & ~self._filled[d]:
+            self._cells_emptied(d, newly_empty)
+
+    # -------------------------------------------------------- serialization
+
+    def _to_busy_map(self, ids: Dict[str, int], masks: List[List[int]]) -> Dict[str, Dict[str, List[str]]]:
+        busy: Dict[str, Dict[str, List[str]]] = {}
+        for name, entity_id in ids.items():
+            for d, day in enumerate(self.days):
+                mask = masks[entity_id][d]
+                while mask:
+                    low = mask & -mask
+                    label = self.time_labels[low.bit_length() - 1]
+                    busy.setdefault(day, {}).setdefault(label, []).append(name)
+                    mask ^= low
+        return busy
+
+    def to_busy_maps(self) -> Tuple[Dict[str, Dict[str, List[str]]], Dict[str, Dict[str, List[str]]]]:
+        """Serialize to the ``{day: {slot_label: [names]}}`` shape stored in Redis"""
+        return (
+            self._to_busy_map(self._faculty_ids, self._faculty_masks),
+            self._to_busy_map(self._division_ids, self._division_masks),
+        )
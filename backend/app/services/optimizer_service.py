@@ -0,0 +1,365 @@
+import logging
+import math
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.services.activities import is_activity
+from app.services.layout_service import SlotModel
+from app.services.occupancy_service import OccupancyEngine
+from app.services.scoring_service import LectureScoreTable
+
+logger = logging.getLogger(__name__)
+
+# Budget of optimize_schedule() itself; generation skips the pass unless asked for one
+DEFAULT_OPTIMIZE_BUDGET_MS = 300
+
+# Penalty per extra lecture of a course on the same day (matches the
+# same-course penalty in the greedy soft score) and per extra lab block of a
+# division on the same day
+REPEAT_LECTURE_PENALTY = 10
+LAB_SPREAD_PENALTY = 10
+
+# Iteration budget per millisecond of optimize budget for reproducible runs,
+# which count iterations instead of time
+OPTIMIZE_ITERATIONS_PER_MS = 200
+
+START_TEMPERATURE = 3.0
+END_TEMPERATURE = 0.05
+
+# Iterations without a new best score after which the search stops early
+STALL_ITERATIONS = 2000
+
+# How often (in iterations) the deadline is checked
+_CLOCK_INTERVAL = 32
+
+
+@dataclass
+class OptimizeResult:
+    iterations: int = 0
+    accepted: int = 0
+    initial_score: int = 0
+    final_score: int = 0
+    elapsed_ms: float = 0.0
+    # Stopped after stall_iterations without improvement, before the budget ran out
+    stalled: bool = False
+
+
+class _Item:
+    """A movable activity and where it currently sits"""
+    __slots__ = ("activity", "is_lab", "course", "faculty", "division", "rows", "day", "pos")
+
+    def __init__(self, activity: Dict[str, Any], day: int, pos: int, rows: Optional[List[List[int]]]):
+        self.activity = activity
+        self.is_lab = activity.get("type") == "lab"
+        self.course = activity.get("course_name")
+        self.faculty = activity.get("faculty_name")
+        self.division = activity.get("division") if self.is_lab else "ALL"
+        self.rows = rows
+        self.day = day
+        # Slot index for lectures, index into slot_model.windows(lab_len) for labs
+        self.pos = pos
+
+
+def _pairs(n: int) -> int:
+    return n * (n - 1) // 2
+
+
+def score_schedule(grid: Dict, slot_model: SlotModel, score_table: LectureScoreTable) -> int:
+    """Soft score of a whole grid, on the scale optimize_schedule() maximizes"""
+    score_rows = {True: score_table.score_rows(True), False: score_table.score_rows(False)}
+    course_day_count: Dict[Tuple[str, int], int] = defaultdict(int)
+    division_day_labs: Dict[Tuple[str, int], Set[int]] = defaultdict(set)
+
+    total = 0
+    for d, day in enumerate(score_table.days):
+        for label, activities in grid.get(day, {}).items():
+            slot = slot_model.index.get(label)
+            if slot is None or not activities:
+                continue
+            for activity in activities:
+                if not is_activity(activity):
+                    continue
+                if activity.get("type") == "lecture":
+                    total += score_rows[activity.get("credits", 0) >= 3][d][slot]
+                    course_day_count[(activity.get("course_name"), d)] += 1
+                elif activity.get("type") == "lab":
+                    division_day_labs[(activity.get("division"), d)].add(id(activity))
+
+    total -= REPEAT_LECTURE_PENALTY * sum(_pairs(n) for n in course_day_count.values())
+    total -= LAB_SPREAD_PENALTY * sum(_pairs(len(labs)) for labs in division_day_labs.values())
+    return total
+
+
+def optimize_schedule(
+        grid: Dict,
+        occupancy: OccupancyEngine,
+        lab_slot_len: int,
+        score_table: LectureScoreTable,
+        movable: Set[int],
+        time_budget_ms: Optional[int] = DEFAULT_OPTIMIZE_BUDGET_MS,
+        max_iterations: Optional[int] = None,
+        seed: int = 0,
+        stall_iterations: Optional[int] = STALL_ITERATIONS
+) -> OptimizeResult:
+    """
+        Improve a complete placement with simulated annealing.
+
+        Only activities whose ``id()`` is in ``movable`` and that sit alone in
+        their cells are moved. Neighbourhoods are: move a lecture to another
+        slot, swap two lectures of different courses, and move a lab to another
+        free window. Every move keeps the hard rules of the greedy allocator
+        (empty cells, faculty and divisions free, no lecture beside a lab, no
+        back-to-back lectures of a course, lab blocks per division per day).
+
+        The objective is the lecture soft score minus penalties for repeated
+        lectures of a course on a day and for several lab blocks of a division
+        on a day. Each move is scored from running counters, so a move costs
+        the same however large the grid is. The best placement seen is written
+        back into ``grid`` and ``occupancy`` when the budget runs out, or
+        once ``stall_iterations`` iterations in a row found no better score
+        (None to always use the whole budget).
+
+        With ``time_budget_ms=None`` the run is exactly ``max_iterations``
+        long and cools by iteration count instead of elapsed time, so the
+        same seed always gives the same placement.
+    """
+    if time_budget_ms is None and max_iterations is None:
+        raise ValueError("optimize_schedule needs a time budget or an iteration budget")
+    started = time.perf_counter()
+    deadline = started + time_budget_ms / 1000.0 if time_budget_ms is not None else math.inf
+    rng = random.Random(seed)
+
+    slot_model = occupancy.slot_model
+    labels = slot_model.labels
+    days = occupancy.days
+    windows = slot_model.windows(lab_slot_len)
+    window_by_mask = {w.mask: k for k, w in enumerate(windows)}
+    occupancy.track_windows(lab_slot_len)
+
+    # Slots that share a lab window with window k (a lab there keeps lectures out)
+    lab_zones = [0] * len(windows)
+    for k, window in enumerate(windows):
+        for other in windows:
+            if other.mask & window.mask:
+                lab_zones[k] |= other.mask
+
+    score_rows = {True: score_table.score_rows(True), False: score_table.score_rows(False)}
+
+    lecture_cells = [0] * len(days)
+    course_slots: Dict[str, List[int]] = defaultdict(lambda: [0] * len(days))
+    course_day_count: Dict[Tuple[str, int], int] = defaultdict(int)
+    division_day_labs: Dict[Tuple[str, int], int] = defaultdict(int)
+
+    items: List[_Item] = []
+    lab_cells: Dict[int, Tuple[Dict[str, Any], int, int, bool]] = {}
+
+    for d, day in enumerate(days):
+        for label, activities in grid.get(day, {}).items():
+            slot = slot_model.index.get(label)
+            if slot is None or not activities:
+                continue
+            alone = len(activities) == 1
+            for activity in activities:
+                if not is_activity(activity):
+                    continue
+                if activity.get("type") == "lecture":
+                    lecture_cells[d] |= 1 << slot
+                    course_slots[activity.get("course_name")][d] |= 1 << slot
+                    course_day_count[(activity.get("course_name"), d)] += 1
+                    if alone and id(activity) in movable:
+                        items.append(_Item(activity, d, slot, score_rows[activity.get("credits", 0) >= 3]))
+                elif activity.get("type") == "lab":
+                    key = id(activity)
+                    _, _, mask, all_alone = lab_cells.get(key, (activity, d, 0, True))
+                    lab_cells[key] = (activity, d, mask | 1 << slot, all_alone and alone)
+
+    for activity, d, mask, alone in lab_cells.values():
+        division_day_labs[(activity.get("division"), d)] += 1
+        if alone and id(activity) in movable and mask in window_by_mask:
+            items.append(_Item(activity, d, window_by_mask[mask], None))
+
+    lectures = [item for item in items if not item.is_lab]
+    result = OptimizeResult()
+    if not items:
+        return result
+
+    def _objective() -> int:
+        total = sum(item.rows[item.day][item.pos] for item in lectures)
+        total -= REPEAT_LECTURE_PENALTY * sum(_pairs(n) for n in course_day_count.values())
+        total -= LAB_SPREAD_PENALTY * sum(_pairs(n) for n in division_day_labs.values())
+        return total
+
+    def _lift(item: _Item):
+        d, day = item.day, days[item.day]
+        if item.is_lab:
+            window = windows[item.pos]
+            for s in window.slots:
+                grid[day][labels[s]] = [a for a in grid[day][labels[s]] if a is not item.activity]
+            occupancy.release(day, window.mask, faculty=item.faculty, division=item.division)
+            occupancy.remove_cell_activity(day, window.mask, lab=True, division=item.division)
+            division_day_labs[(item.division, d)] -= 1
+        else:
+            bit = 1 << item.pos
+            grid[day][labels[item.pos]] = [a for a in grid[day][labels[item.pos]] if a is not item.activity]
+            occupancy.release(day, bit, faculty=item.faculty, division="ALL")
+            occupancy.remove_cell_activity(day, bit)
+            lecture_cells[d] &= ~bit
+            course_slots[item.course][d] &= ~bit
+            course_day_count[(item.course, d)] -= 1
+
+    def _drop(item: _Item, d: int, pos: int):
+        day = days[d]
+        item.day, item.pos = d, pos
+        if item.is_lab:
+            window = windows[pos]
+            for s in window.slots:
+                grid[day].setdefault(labels[s], []).append(item.activity)
+            occupancy.occupy(day, window.mask, faculty=item.faculty, division=item.division)
+            occupancy.add_cell_activity(day, window.mask, lab=True, division=item.division)
+            division_day_labs[(item.division, d)] += 1
+        else:
+            bit = 1 << pos
+            grid[day].setdefault(labels[pos], []).append(item.activity)
+            occupancy.occupy(day, bit, faculty=item.faculty, division="ALL")
+            occupancy.add_cell_activity(day, bit)
+            lecture_cells[d] |= bit
+            course_slots[item.course][d] |= bit
+            course_day_count[(item.course, d)] += 1
+
+    def _random_bit(mask: int) -> int:
+        bits = []
+        while mask:
+            low = mask & -mask
+            bits.append(low.bit_length() - 1)
+            mask ^= low
+        return rng.choice(bits)
+
+    def _lecture_targets(item: _Item, d: int) -> int:
+        own = course_slots[item.course][d]
+        if d == item.day:
+            own &= ~(1 << item.pos)
+        free = occupancy.lecture_free_mask(item.faculty, days[d], lab_slot_len)
+        return free & ~((own << 1) | (own >> 1))
+
+    def _lab_targets(item: _Item, d: int) -> int:
+        day = days[d]
+        if d != item.day and occupancy.division_lab_cells(item.division, day) >= 2:
+            return 0
+        targets = 0
+        bits = occupancy.free_window_bits(day, lab_slot_len)
+        busy = occupancy.busy_mask(day, faculty=item.faculty, division=item.division)
+        while bits:
+            low = bits & -bits
+            k = low.bit_length() - 1
+            if not windows[k].mask & busy and not lecture_cells[d] & lab_zones[k]:
+                targets |= low
+            bits ^= low
+        return targets
+
+    def _move_delta(item: _Item, d: int, pos: int) -> int:
+        delta = 0
+        if item.is_lab:
+            if d != item.day:
+                delta += LAB_SPREAD_PENALTY * (division_day_labs[(item.division, item.day)] - 1)
+                delta -= LAB_SPREAD_PENALTY * division_day_labs[(item.division, d)]
+            return delta
+
+        delta += item.rows[d][pos] - item.rows[item.day][item.pos]
+        if d != item.day:
+            delta += REPEAT_LECTURE_PENALTY * (course_day_count[(item.course, item.day)] - 1)
+            delta -= REPEAT_LECTURE_PENALTY * course_day_count[(item.course, d)]
+        return delta
+
+    def _swap_ok(a: _Item, b: _Item) -> bool:
+        for x, y in ((a, b), (b, a)):
+            day, bit = days[y.day], 1 << y.pos
+            if x.faculty != y.faculty and occupancy.faculty_busy(x.faculty, day, bit):
+                return False
+            own = course_slots[x.course][y.day]
+            if x.day == y.day:
+                own &= ~(1 << x.pos)
+            if slot_model.neighbor_masks[y.pos] & own:
+                return False
+        return True
+
+    def _swap_delta(a: _Item, b: _Item) -> int:
+        delta = (a.rows[b.day][b.pos] + b.rows[a.day][a.pos] -
+                 a.rows[a.day][a.pos] - b.rows[b.day][b.pos])
+        if a.day != b.day:
+            for x, y in ((a, b), (b, a)):
+                delta += REPEAT_LECTURE_PENALTY * (course_day_count[(x.course, x.day)] - 1)
+                delta -= REPEAT_LECTURE_PENALTY * course_day_count[(x.course, y.day)]
+        return delta
+
+    current = best = result.initial_score = _objective()
+    best_positions = [(item.day, item.pos) for item in items]
+    temperature = START_TEMPERATURE
+    last_gain = 0
+
+    while max_iterations is None or result.iterations < max_iterations:
+        if stall_iterations is not None and result.iterations - last_gain >= stall_iterations:
+            result.stalled = True
+            break
+        if result.iterations % _CLOCK_INTERVAL == 0:
+            if time_budget_ms is None:
+                progress = result.iterations / max_iterations if max_iterations > 0 else 1.0
+            else:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                budget = time_budget_ms / 1000.0
+                progress = (now - started) / budget if budget > 0 else 1.0
+            temperature = START_TEMPERATURE * (END_TEMPERATURE / START_TEMPERATURE) ** min(1.0, progress)
+        result.iterations += 1
+
+        item = rng.choice(items)
+        if not item.is_lab and len(lectures) > 1 and rng.random() < 0.5:
+            other = rng.choice(lectures)
+            if other is item or other.course == item.course or not _swap_ok(item, other):
+                continue
+            delta = _swap_delta(item, other)
+            if delta < 0 and rng.random() >= math.exp(delta / temperature):
+                continue
+            a_pos, b_pos = (item.day, item.pos), (other.day, other.pos)
+            _lift(item)
+            _lift(other)
+            _drop(item, *b_pos)
+            _drop(other, *a_pos)
+        else:
+            d = rng.randrange(len(days))
+            targets = _lab_targets(item, d) if item.is_lab else _lecture_targets(item, d)
+            if not targets:
+                continue
+            pos = _random_bit(targets)
+            delta = _move_delta(item, d, pos)
+            if delta < 0 and rng.random() >= math.exp(delta / temperature):
+                continue
+            _lift(item)
+            _drop(item, d, pos)
+
+        result.accepted += 1
+        current += delta
+        if current > best:
+            best = current
+            last_gain = result.iterations
+            best_positions = [(item.day, item.pos) for item in items]
+
+    # Roll back to the best placement seen
+    stale = [(item, position) for item, position in zip(items, best_positions)
+             if (item.day, item.pos) != position]
+    for item, _ in stale:
+        _lift(item)
+    for item, (d, pos) in stale:
+        _drop(item, d, pos)
+
+    result.final_score = best
+    result.elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(
+        f"Local search: score {result.initial_score} -> {result.final_score} "
+        f"({result.accepted}/{result.iterations} moves accepted, {result.elapsed_ms:.0f} ms"
+        f"{', stalled' if result.stalled else ''})"
+    )
+    return result
@@ -0,0 +1,103 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.layout_service import SlotModel
+
+
+class LectureScoreTable:
+    """
+        Precomputed soft scores for placing a lecture on the day×slot grid.
+
+        One score table is built per credit class (``credits >= 3`` and the
+        rest) from the day and time rankings, so picking the best lecture slot
+        is a masked argmax instead of scoring and sorting every candidate.
+        Ties are broken the way ``sorted((score, day, slot), reverse=True)``
+        breaks them: higher score, then the larger day name, then the later slot,
+        or in a seeded random order when ``tiebreak_seed`` is given.
+    """
+
+    def __init__(
+            self,
+            days: List[str],
+            slot_model: SlotModel,
+            high_credit_day_rank: Dict[str, int],
+            low_credit_day_rank: Dict[str, int],
+            time_rank: Dict[str, int],
+            tiebreak_seed: Optional[int] = None
+    ):
+        self.days = list(days)
+        self.n_days = len(self.days)
+        self.n_slots = slot_model.size
+
+        time_scores = np.array([time_rank.get(label, 0) for label in slot_model.labels], dtype=np.int64)
+        self._scores = {
+            high_credit: np.array(
+                [day_rank.get(day, 0) for day in self.days], dtype=np.int64
+            )[:, None] + time_scores[None, :]
+            for high_credit, day_rank in ((True, high_credit_day_rank), (False, low_credit_day_rank))
+        }
+
+        # Rank of each day name in lexicographic order, for tie-breaking
+        day_lex_rank = np.argsort(np.argsort(np.array(self.days, dtype=object)))
+        self._tiebreak = (day_lex_rank.astype(np.int64)[:, None] * self.n_slots +
+                          np.arange(self.n_slots, dtype=np.int64)[None, :])
+        if tiebreak_seed is not None:
+            # Randomized starts break ties in a seeded random order instead
+            order = np.random.default_rng(tiebreak_seed).permutation(self.n_days * self.n_slots)
+            self._tiebreak = order.astype(np.int64).reshape(self.n_days, self.n_slots)
+        self._scale = max(1, self.n_days * self.n_slots)
+        self._mask_bytes = (self.n_slots + 7) // 8
+
+    def tiebreak(self, day: int, slot: int) -> int:
+        """Tie-break rank of (day index, slot index) among equal scores; the larger wins"""
+        return int(self._tiebreak[day, slot])
+
+    def feasibility(self, free_masks: List[int]) -> np.ndarray:
+        """Expand per-day slot bitmasks into a boolean day×slot array"""
+        raw = b"".join(mask.to_bytes(self._mask_bytes, "little") for mask in free_masks)
+        bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8), bitorder="little")
+        return bits.reshape(self.n_days, self._mask_bytes * 8)[:, :self.n_slots].astype(bool)
+
+    def best_slot(
+            self,
+            free_masks: List[int],
+            high_credit: bool,
+            penalized_days: Optional[List[bool]] = None,
+            penalty: int = 10
+    ) -> Optional[Tuple[int, int]]:
+        """
+            Pick the best feasible (day index, slot index), or None.
+
+            Args:
+                free_masks: Per-day bitmask of slots where the lecture may go
+                high_credit: Whether the course is in the ``credits >= 3`` class
+                penalized_days: Days where the course was the last one placed
+                penalty: Score deducted on penalized days
+        """
+        if not any(free_masks):
+            return None
+
+        feasible = self.feasibility(free_masks)
+        scores = self._scores[high_credit]
+        if penalized_days is not None and any(penalized_days):
+            scores = scores - penalty * np.array(penalized_days, dtype=np.int64)[:, None]
+
+        keys = np.where(feasible, scores * self._scale + self._tiebreak, np.iinfo(np.int64).min)
+        day, slot = divmod(int(keys.argmax()), self.n_slots)
+        return day, slot
+
+    def ranked_slots(self, free_masks: List[int], high_credit: bool) -> List[Tuple[int, int]]:
+        """All feasible (day index, slot index) pairs, best first"""
+        if not any(free_masks):
+            return []
+
+        feasible = self.feasibility(free_masks)
+        keys = (self._scores[high_credit] * self._scale + self._tiebreak)[feasible]
+        days, slots = np.nonzero(feasible)
+        order = np.argsort(-keys, kind="stable")
+        return [(int(days[i]), int(slots[i])) for i in order]
+
+    def score_rows(self, high_credit: bool) -> List[List[int]]:
+        """Day×slot soft scores as plain lists, for scoring one cell at a time"""
+        return self._scores[high_credit].tolist()
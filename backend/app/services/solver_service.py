@@ -0,0 +1,386 @@
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.services.activities import LAB, Task
+from app.services.occupancy_service import OccupancyEngine
+from app.services.scoring_service import LectureScoreTable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NODE_BUDGET = 20000
+DEFAULT_TIME_BUDGET_MS = 5000
+
+
+@dataclass
+class SearchResult:
+    # (task, day, slot index for lectures / SlotWindow for labs)
+    placements: List[Tuple[Task, str, Any]]
+    unplaced: List[Task]
+    nodes: int = 0
+    backjumps: int = 0
+    complete: bool = False
+    budget_exhausted: bool = False
+
+
+class _Variable:
+    """One schedulable task with its current domain, one bitmask per day"""
+    __slots__ = ("task", "index", "is_lab", "course", "faculty", "division", "high_credit",
+                 "allowed", "spread_labs", "domain", "size", "past_fc", "pending")
+
+    def __init__(self, task: Task, index: int, n_days: int):
+        c = task.course
+        self.task = task
+        self.index = index
+        self.is_lab = task.type == LAB
+        self.course = c.course_name
+        self.faculty = c.faculty_name
+        self.division = task.division
+        self.high_credit = c.credits >= 3
+        # Per-day allowed values (slot bits for lectures, window bits for labs),
+        # None when the task has no constraints
+        self.allowed: Optional[List[int]] = None
+        # Unconstrained labs keep at most one lab block per division per day
+        self.spread_labs = self.is_lab and not c.constraints
+        self.domain: List[int] = [0] * n_days
+        self.size = 0
+        # Search depths whose assignment pruned this variable's domain
+        self.past_fc: List[int] = []
+        # Not yet picked by the search (neither labelled nor dropped)
+        self.pending = False
+
+
+@dataclass
+class _Frame:
+    var: _Variable
+    values: List[Tuple[int, int]]
+    conf: Set[int] = field(default_factory=set)
+    assigned: Optional[Tuple[int, int, int]] = None  # (day index, value, cell mask)
+
+
+def _popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+def effective_tasks(tasks: List[Task]) -> List[Task]:
+    """
+        Drop tasks the allocator would skip anyway: lectures beyond a course's
+        ``t_hours`` and repeated lab sessions for the same (course, division).
+    """
+    lectures: Dict[str, int] = {}
+    labs: Set[Tuple[str, str]] = set()
+    result = []
+    for task in tasks:
+        c = task.course
+        if task.type == LAB:
+            key = (c.course_name, task.division)
+            if key in labs:
+                continue
+            labs.add(key)
+        else:
+            if lectures.get(c.course_name, 0) >= c.t_hours:
+                continue
+            lectures[c.course_name] = lectures.get(c.course_name, 0) + 1
+        result.append(task)
+    return result
+
+
+def solve_backtracking(
+        tasks: List[Task],
+        occupancy: OccupancyEngine,
+        lab_slot_len: int,
+        score_table: LectureScoreTable,
+        day_rank: Callable[[str], int],
+        node_budget: int = DEFAULT_NODE_BUDGET,
+        time_budget_ms: Optional[int] = DEFAULT_TIME_BUDGET_MS
+) -> SearchResult:
+    """
+        Depth-first search with forward checking and conflict-directed
+        backjumping (FC-CBJ) over task domains.
+
+        Domains are per-day bitmasks derived from ``occupancy``, variables are
+        picked most-constrained first, and lecture values are tried in soft-score
+        order. A task that cannot be placed whatever the earlier choices are is
+        dropped and reported as unplaced, so the search always moves towards a
+        full labelling. When the node or time budget runs out, the deepest
+        assignment seen is returned. Without a time budget only nodes count,
+        so the search is reproducible.
+
+        The engine is left as it was on entry; callers apply ``placements``.
+    """
+    slot_model = occupancy.slot_model
+    days = occupancy.days
+    windows = slot_model.windows(lab_slot_len)
+    # Window bits touching each slot, and the lab "zone" each slot pulls in
+    touching = [0] * slot_model.size
+    for k, window in enumerate(windows):
+        for s in window.slots:
+            touching[s] |= 1 << k
+    zones = [slot_model.cover_mask(lab_slot_len, s) for s in range(slot_model.size)]
+    all_windows = (1 << len(windows)) - 1
+    deadline = time.perf_counter() + time_budget_ms / 1000.0 if time_budget_ms is not None else math.inf
+
+    variables = [_Variable(task, i, len(days)) for i, task in enumerate(effective_tasks(tasks))]
+    course_day_lectures: Dict[Tuple[str, int], int] = {}
+
+    def _bits_of(mask: int, table: List[int]) -> int:
+        out = 0
+        while mask:
+            low = mask & -mask
+            out |= table[low.bit_length() - 1]
+            mask ^= low
+        return out
+
+    # ---------------------------------------------------------- domains
+
+    def _fresh_domain(var: _Variable) -> List[int]:
+        """Domain of ``var`` computed from scratch against the current engine state"""
+        if not var.is_lab:
+            domain = occupancy.lecture_free_masks(var.faculty, lab_slot_len)
+            for d in range(len(days)):
+                if own := course_day_lectures.get((var.course, d)):
+                    domain[d] &= ~((own << 1) | (own >> 1))
+                if var.allowed is not None:
+                    domain[d] &= var.allowed[d]
+            return domain
+
+        domain = [0] * len(days)
+        for d, day in enumerate(days):
+            if var.spread_labs and occupancy.division_lab_cells(var.division, day) >= 2:
+                continue
+            busy = occupancy.busy_mask(day, var.faculty, var.division)
+            bits = occupancy.free_window_bits(day, lab_slot_len)
+            if var.allowed is not None:
+                bits &= var.allowed[d]
+            m = bits
+            while m:
+                low = m & -m
+                if windows[low.bit_length() - 1].mask & busy:
+                    bits &= ~low
+                m ^= low
+            domain[d] = bits
+        return domain
+
+    for var in variables:
+        c = var.task.course
+        if c.constraints:
+            var.allowed = list(c.compiled.masks(var.task.type))
+
+        var.domain = _fresh_domain(var)
+        var.size = sum(_popcount(m) for m in var.domain)
+
+    unplaced = [var for var in variables if not var.size]
+    for var in variables:
+        var.pending = bool(var.size)
+    pending_count = sum(var.pending for var in variables)
+
+    # ------------------------------------------------------------ search
+
+    def _cells(var: _Variable, value: int) -> int:
+        return windows[value].mask if var.is_lab else 1 << value
+
+    def _values(var: _Variable) -> List[Tuple[int, int]]:
+        """Candidate (day index, value) pairs, worst first so pop() gives the best"""
+        if var.is_lab:
+            order = sorted(range(len(days)), key=lambda d: (
+                occupancy.division_lab_cells(var.division, days[d]), day_rank(days[d])))
+            ranked = []
+            for d in order:
+                bits = var.domain[d]
+                while bits:
+                    low = bits & -bits
+                    ranked.append((d, low.bit_length() - 1))
+                    bits ^= low
+        else:
+            ranked = score_table.ranked_slots(var.domain, var.high_credit)
+        ranked.reverse()
+        return ranked
+
+    def _new_frame() -> _Frame:
+        nonlocal pending_count
+        var = min((v for v in variables if v.pending), key=lambda v: (v.size, not v.is_lab, v.index))
+        var.pending = False
+        pending_count -= 1
+        return _Frame(var=var, values=_values(var))
+
+    def _release_frame(frame: _Frame):
+        nonlocal pending_count
+        frame.var.pending = True
+        pending_count += 1
+
+    def _assign(frame: _Frame, d: int, value: int):
+        var, day = frame.var, days[d]
+        cells = _cells(var, value)
+        occupancy.occupy(day, cells, faculty=var.faculty, division=var.division)
+        occupancy.add_cell_activity(day, cells, lab=var.is_lab, division=var.division)
+        if not var.is_lab:
+            course_day_lectures[(var.course, d)] = course_day_lectures.get((var.course, d), 0) | cells
+        frame.assigned = (d, value, cells)
+
+    def _unassign(frame: _Frame):
+        var = frame.var
+        d, _, cells = frame.assigned
+        day = days[d]
+        occupancy.release(day, cells, faculty=var.faculty, division=var.division)
+        occupancy.remove_cell_activity(day, cells, lab=var.is_lab, division=var.division)
+        if not var.is_lab:
+            course_day_lectures[(var.course, d)] &= ~cells
+        frame.assigned = None
+
+    trail: List[Tuple[int, _Variable, int, int]] = []
+
+    def _forward_check(depth: int, var: _Variable, d: int, cells: int) -> Optional[_Variable]:
+        lab_zone = _bits_of(cells, zones) if var.is_lab else 0
+        lecture_neighbours = ((cells << 1) | (cells >> 1)) if not var.is_lab else 0
+        division_full = (var.is_lab and
+                         occupancy.division_lab_cells(var.division, days[d]) >= 2)
+        hit_windows = _bits_of(cells, touching)
+
+        for other in variables:
+            current = other.domain[d]
+            if not current or not other.pending:
+                continue
+
+            if other.is_lab:
+                removed = current & hit_windows
+                if division_full and other.spread_labs and other.division == var.division:
+                    removed = current & all_windows
+            else:
+                removed = current & (cells | lab_zone)
+                if lecture_neighbours and other.course == var.course:
+                    removed |= current & lecture_neighbours
+
+            if removed:
+                other.domain[d] = current & ~removed
+                other.size -= _popcount(removed)
+                trail.append((depth, other, d, removed))
+                if not other.past_fc or other.past_fc[-1] != depth:
+                    other.past_fc.append(depth)
+                if not other.size:
+                    return other
+        return None
+
+    def _undo_reductions(depth: int):
+        while trail and trail[-1][0] == depth:
+            _, other, d, removed = trail.pop()
+            other.domain[d] |= removed
+            other.size += _popcount(removed)
+            if other.past_fc and other.past_fc[-1] == depth:
+                other.past_fc.pop()
+
+    frames: List[_Frame] = []
+    best: List[Tuple[_Variable, int, int]] = []
+    nodes = backjumps = 0
+    complete = not pending_count
+    exhausted = False
+
+    if pending_count:
+        frames.append(_new_frame())
+
+    while frames:
+        if nodes >= node_budget or time.perf_counter() > deadline:
+            exhausted = True
+            break
+
+        frame = frames[-1]
+        depth = len(frames) - 1
+
+        if frame.values:
+            d, value = frame.values.pop()
+            nodes += 1
+            _assign(frame, d, value)
+            wiped = _forward_check(depth, frame.var, d, frame.assigned[2])
+            if wiped is not None:
+                _undo_reductions(depth)
+                frame.conf.update(wiped.past_fc)
+                _unassign(frame)
+                continue
+
+            if len(frames) > len(best):
+                best = [(f.var, f.assigned[0], f.assigned[1]) for f in frames]
+            if not pending_count:
+                complete = True
+                break
+            frames.append(_new_frame())
+            continue
+
+        # Dead end: every value of this variable failed
+        conf = frame.conf | set(frame.var.past_fc)
+        if not conf:
+            # No earlier choice is to blame, so the task cannot be placed at all
+            frames.pop()
+            unplaced.append(frame.var)
+            if not pending_count:
+                complete = True
+                break
+            frames.append(_new_frame())
+            continue
+
+        target = max(conf)
+        backjumps += 1
+        while len(frames) - 1 > target:
+            popped = frames.pop()
+            if popped.assigned is not None:
+                _undo_reductions(len(frames))
+                _unassign(popped)
+            _release_frame(popped)
+
+        frames[target].conf |= conf - {target}
+        _undo_reductions(target)
+        _unassign(frames[target])
+
+    if complete:
+        labelled = [(f.var, f.assigned[0], f.assigned[1]) for f in frames if f.assigned is not None]
+        if len(labelled) >= len(best):
+            best = labelled
+
+    # Leave the engine as we found it
+    while frames:
+        popped = frames.pop()
+        if popped.assigned is not None:
+            _undo_reductions(len(frames))
+            _unassign(popped)
+
+    if not complete:
+        # Complete the best partial labelling greedily: every task it left out
+        # gets its best value that is still feasible, if there is one
+        labelled = []
+        for var, d, value in best:
+            frame = _Frame(var=var, values=[])
+            _assign(frame, d, value)
+            labelled.append(frame)
+
+        placed_vars = {var for var, _, _ in best}
+        for var in sorted(variables, key=lambda v: (v.size, not v.is_lab, v.index)):
+            if var in placed_vars:
+                continue
+            var.domain = _fresh_domain(var)
+            if values := _values(var):
+                frame = _Frame(var=var, values=[])
+                _assign(frame, *values[-1])
+                labelled.append(frame)
+                best.append((var, frame.assigned[0], frame.assigned[1]))
+
+        for frame in reversed(labelled):
+            _unassign(frame)
+
+    placed = {var for var, _, _ in best}
+    placements = [
+        (var.task, days[d], windows[value] if var.is_lab else value)
+        for var, d, value in best
+    ]
+    result = SearchResult(
+        placements=placements,
+        unplaced=[var.task for var in variables if var not in placed],
+        nodes=nodes,
+        backjumps=backjumps,
+        complete=complete and len(placed) + len(unplaced) == len(variables),
+        budget_exhausted=exhausted,
+    )
+    logger.info(
+        f"Backtracking search: {len(placements)}/{len(variables)} tasks placed, "
+        f"{nodes} nodes, {backjumps} backjumps, budget exhausted={exhausted}"
+    )
+    return result
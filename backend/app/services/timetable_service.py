@@ -1,15 +1,38 @@
 from __future__ import annotations
+import copy
 import json
 import logging
 import math
-import uuid
+import random
+import time
 from uuid import UUID
-from dataclasses import dataclass
-from typing import Optional, Dict, Any, List, Tuple, Set
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Iterable, List, Tuple, Set, Callable
 from collections import defaultdict
 from sqlalchemy.orm import Session
 
-from app.utils.redis_client import get_redis
+from app.utils.redis_client import generate_redis_key, get_redis, store_assignment_constraints
+from app.utils.metrics import observe_generation
+from app.services.activities import assign_ids, Activity, Task, LAB, LECTURE, expand_tasks, is_activity, serialize_grid
+from app.services.layout_service import SlotModel, SlotWindow, compile_slot_model
+from app.services.occupancy_service import FacultyCalendar, OccupancyEngine
+from app.services.availability_service import load_faculty_calendar, publish_faculty_busy
+from app.services.event_service import EventStream
+from app.services.cache_service import get_cached, input_digest, invalidate_cache, put_cached
+from app.services.feasibility_service import (
+    FeasibilityReport, InfeasibleScheduleError, check_feasibility, check_joint_faculty, faculty_loads
+)
+from app.services.explanation_service import displacements, explain_unplaced
+from app.services.constraint_service import (
+    CompiledConstraints, ConstraintValidationError, compile_needs, constraint_errors
+)
+from app.services.timing_service import PhaseTimer, NULL_TIMER, phase_timer
+from app.services.scoring_service import LectureScoreTable
+from app.services.solver_service import solve_backtracking, DEFAULT_NODE_BUDGET, DEFAULT_TIME_BUDGET_MS
+from app.services.optimizer_service import (
+    optimize_schedule, score_schedule, OPTIMIZE_ITERATIONS_PER_MS
+)
+from app.services.multistart_service import run_multistart, DEFAULT_STARTS, DEFAULT_DEADLINE_MS
 from app.crud import courses as crud_courses
 from app.crud import timetables as crud_timetables
 
@@ -18,6 +41,12 @@ logger = logging.getLogger(__name__)
 
 MAX_RETRIES = 10
 
+# "greedy" runs the allocate/free/retry loop, "backtracking" the FC-CBJ search
+SOLVER_MODES = ("greedy", "backtracking")
+
+# progress(phase, placed_tasks, total_tasks)
+ProgressCallback = Callable[[str, int, int], None]
+
 DAY_RANK = {
     "Tuesday": 1, "Wednesday": 2, "Thursday": 3,
     "Monday": 4, "Friday": 5, "Saturday": 6
@@ -28,6 +57,21 @@ LECTURE_TIME_RANK = {
     "11:50-12:45": 3, "07:30-08:25": 2, "12:45-13:40": 1
 }
 
+# Soft-score day preference for lectures, by credit class
+HIGH_CREDIT_DAY_RANK = {
+    "Tuesday": 6, "Wednesday": 5, "Thursday": 4,
+    "Monday": 3, "Friday": 2, "Saturday": 1
+}
+
+LOW_CREDIT_DAY_RANK = {
+    "Friday": 6, "Saturday": 5, "Monday": 4,
+    "Thursday": 3, "Wednesday": 2, "Tuesday": 1
+}
+
+# Pick lecture slots with the NumPy masked-argmax path; set to False to use
+# the reference candidate loop (both give the same placements)
+VECTORIZED_LECTURE_SCORING = True
+
 
 @dataclass
 class CourseNeed:
@@ -43,19 +87,66 @@ class CourseNeed:
     num_sublabs: int
     division_names: List[str]
     constraints: List[Dict[str, str]]
+    # ``constraints`` resolved against the layout, see compile_needs()
+    compiled: Optional[CompiledConstraints] = field(default=None, repr=False, compare=False)
 
 
-def _to_slot_label(start: str, end: str) -> str:
-    return f"{start}-{end}"
-
+@dataclass
+class AllocationState:
+    """
+        Greedy allocation bookkeeping that persists across retries.
+
+        ``pending`` holds the tasks still to place, constrained ones first;
+        placed tasks leave it and evicted ones come back, so a retry only
+        revisits what is left.
+    """
+    pending: List[Task]
+    last_course_per_day: Dict[str, Dict[str, str]] = field(default_factory=lambda: defaultdict(dict))
+    lab_allocations: Dict[str, Dict[str, int]] = field(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+    subject_division_allocated: Set[Tuple[str, str]] = field(default_factory=set)
+    lecture_allocations: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    # Bitmask of lecture slots per course per day, for adjacency checks
+    course_day_slots: Dict[str, Dict[str, int]] = field(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+    # id() of each placed Activity -> the task it was placed for
+    placed: Dict[int, Task] = field(default_factory=dict)
+
+    @classmethod
+    def for_tasks(cls, tasks: List[Task]) -> "AllocationState":
+        constrained = [t for t in tasks if t.course.constraints]
+        unconstrained = [t for t in tasks if not t.course.constraints]
+        return cls(pending=constrained + unconstrained)
+
+    def record(self, activity: Any, task: Task, day: str, slot_mask: int):
+        """Count an activity that is already in the grid as a placement of ``task``"""
+        self.placed[id(activity)] = task
+        c = task.course
+        if task.type == LAB:
+            self.lab_allocations[c.course_name][task.division] += 1
+            self.subject_division_allocated.add((c.course_name, task.division))
+        else:
+            self.lecture_allocations[c.course_name] += 1
+            self.course_day_slots[c.course_name][day] |= slot_mask
+
+    def evict(self, activity: Any, day: str, slot_mask: int):
+        """Forget a placed activity and queue its task again"""
+        if (task := self.placed.pop(id(activity), None)) is None:
+            return
+
+        c = task.course
+        if task.type == LAB:
+            division = task.division
+            self.lab_allocations[c.course_name][division] -= 1
+            self.subject_division_allocated.discard((c.course_name, division))
+        else:
+            self.lecture_allocations[c.course_name] -= 1
+            self.course_day_slots[c.course_name][day] &= ~slot_mask
 
-def _parse_faculty_constraints(raw: List[Dict[str, str]]) -> Dict[str, Set[str]]:
-    allowed = defaultdict(set)
-    for item in raw or []:
-        if day := item.get("day"):
-            if time := item.get("time"):
-                allowed[day.capitalize()].add(time)
-    return allowed
+        # Keep constrained tasks ahead of unconstrained ones
+        if c.constraints:
+            at = next((i for i, t in enumerate(self.pending) if not t.course.constraints), len(self.pending))
+            self.pending.insert(at, task)
+        else:
+            self.pending.append(task)
 
 
 def _is_break(cell: Any) -> bool:
@@ -63,64 +154,37 @@ def _is_break(cell: Any) -> bool:
 
 
 def _slots_ok_for_lab(
-        grid_day: Dict[str, List],
-        slots: List[str],
+        window: SlotWindow,
         faculty: str,
         division: str,
-        busy_faculty_day: Dict[str, set],
-        busy_divisions_day: Dict[str, set]
+        occupancy: OccupancyEngine,
+        day: str
 ) -> bool:
-    for i, slot in enumerate(slots):
-        if slot not in grid_day:
-            return False
-
-        if (faculty in busy_faculty_day.get(slot, set()) or
-                division in busy_divisions_day.get(slot, set())):
-            return False
-
-        if grid_day.get(slot):
-            for activity in grid_day[slot]:
-                if _is_break(activity) or activity.get("type") in ("lecture", "lab"):
-                    return False
-
-        if i > 0:
-            prev_slot_end = slots[i - 1].split('-')[1]
-            current_slot_start = slot.split('-')[0]
-            if prev_slot_end != current_slot_start:
-                return False
-
-    return True
+    mask = window.mask
+    return (occupancy.cells_free(day, mask) and
+            not occupancy.faculty_busy(faculty, day, mask) and
+            not occupancy.division_busy(division, day, mask))
 
 
 def _slot_ok_for_lecture(
-        grid_day: Dict[str, List],
-        slot: str,
+        slot: int,
         faculty: str,
-        busy_faculty_day: Dict[str, set],
-        busy_divisions_day: Dict[str, set],
-        lab_slots: Optional[List[Dict]] = None
+        occupancy: OccupancyEngine,
+        day: str,
+        lab_slot_len: int = 0
 ) -> bool:
-    if (grid_day.get(slot) or faculty in busy_faculty_day.get(slot, set()) or
-            busy_divisions_day.get(slot)):
+    slot_mask = 1 << slot
+    if (not occupancy.cells_free(day, slot_mask) or
+            occupancy.faculty_busy(faculty, day, slot_mask) or
+            occupancy.any_division_busy(day, slot_mask)):
         return False
 
-    if lab_slots:
-        for slot_info in lab_slots:
-            if slot in slot_info["slots"]:
-                for lab_slot in slot_info["slots"]:
-                    if grid_day.get(lab_slot):
-                        for activity in grid_day[lab_slot]:
-                            if isinstance(activity, dict) and activity.get("type") == "lab":
-                                return False
+    # Lectures may not sit inside a lab-sized window that already holds a lab
+    if lab_slot_len and occupancy.has_lab(day, occupancy.slot_model.cover_mask(lab_slot_len, slot)):
+        return False
     return True
 
 
-def _within_faculty_allowed(day: str, slot: str, allowed: Dict[str, set]) -> bool:
-    if not allowed or not (allowed_set := allowed.get(day)):
-        return True
-    return slot in allowed_set
-
-
 def _soft_score(
         day: str,
         slot: str,
@@ -128,13 +192,7 @@ def _soft_score(
         course_credits: int,
         last_assigned_day: Dict[str, str]
 ) -> int:
-    day_rank_map = {
-        "Tuesday": 6, "Wednesday": 5, "Thursday": 4,
-        "Monday": 3, "Friday": 2, "Saturday": 1
-    } if course_credits >= 3 else {
-        "Friday": 6, "Saturday": 5, "Monday": 4,
-        "Thursday": 3, "Wednesday": 2, "Tuesday": 1
-    }
+    day_rank_map = HIGH_CREDIT_DAY_RANK if course_credits >= 3 else LOW_CREDIT_DAY_RANK
 
     base = day_rank_map.get(day, 0) + LECTURE_TIME_RANK.get(slot, 0)
 
@@ -144,26 +202,29 @@ def _soft_score(
     return base
 
 
-def _collect_time_labels(layout: Dict[str, Any]) -> List[str]:
-    return [_to_slot_label(ts["start"], ts["end"]) for ts in layout["time_slots"]]
+def _faculty_rows(r, dept, sem) -> List[Dict[str, Any]]:
+    """The stored faculty assignments of one department/semester"""
+    rkey_fac = f"tt:{dept}:{sem}:faculty"
+    try:
+        return json.loads(r.get(rkey_fac) or "[]")
+    except json.JSONDecodeError:
+        logger.error(f"Invalid JSON in faculty assignments")
+        return []
 
 
 def _course_needs_from_db_and_redis(
         db: Session,
         dept: str,
         sem: int,
-        r
+        r,
+        fac_rows: Optional[List[Dict[str, Any]]] = None
 ) -> List[CourseNeed]:
     logger.debug(f"Retrieving courses for dept='{dept}', sem={sem}")
     courses = crud_courses.get_courses_for_department_semester(db, dept, sem)
     logger.debug(f"Found {len(courses)} courses in database")
 
-    rkey_fac = f"tt:{dept}:{sem}:faculty"
-    try:
-        fac_rows = json.loads(r.get(rkey_fac) or "[]")
-    except json.JSONDecodeError:
-        logger.error(f"Invalid JSON in faculty assignments")
-        fac_rows = []
+    if fac_rows is None:
+        fac_rows = _faculty_rows(r, dept, sem)
 
     logger.debug(f"Loaded {len(fac_rows)} faculty assignments from Redis")
 
@@ -217,10 +278,12 @@ def _expand_lab_requirements(c: CourseNeed, lab_minutes: int, slot_duration: int
 
 def _free_low_priority_slots(
         grid: Dict,
-        busy_faculty: Dict,
-        busy_divisions: Dict,
-        max_free: int = 10
+        occupancy: OccupancyEngine,
+        max_free: int = 10,
+        state: Optional[AllocationState] = None,
+        fixed: Optional[Set[int]] = None
 ) -> int:
+    """Evict up to ``max_free`` low-credit activities, never breaks, protected ones or those whose id() is in ``fixed``"""
     freed = 0
     for day, day_schedule in grid.items():
         for slot, activities in day_schedule.items():
@@ -232,182 +295,223 @@ def _free_low_priority_slots(
 
             for activity in activities:
                 if (_is_break(activity) or activity.get("protected", False) or
-                        activity.get("credits", 0) >= 2):
+                        activity.get("credits", 0) >= 2 or fixed and id(activity) in fixed):
                     continue
 
-                if faculty := activity.get("faculty_name"):
-                    busy_faculty[day][slot].discard(faculty)
-
-                if division := activity.get("division"):
-                    busy_divisions[day][slot].discard(division)
-
-                grid[day][slot] = [a for a in activities if a != activity]
+                is_lab = activity.get("type") == "lab"
+                # A lab is evicted from every cell of its block, not just this one
+                cells = [s for s, acts in day_schedule.items() if acts and any(a is activity for a in acts)] \
+                    if is_lab else [slot]
+                slot_mask = _unplace_activity(grid, occupancy, day, activity, cells)
+                if state is not None:
+                    state.evict(activity, day, slot_mask)
                 freed += 1
                 break
 
     return freed
 
 
-def _generate_lab_slots(time_labels: List[str], lab_slot_len: int) -> List[Dict]:
-    lab_slots = []
-    for i in range(len(time_labels) - lab_slot_len + 1):
-        slots_group = time_labels[i:i + lab_slot_len]
-
-        is_consecutive = all(
-            slots_group[j].split('-')[1] == slots_group[j + 1].split('-')[0]
-            for j in range(len(slots_group) - 1)
-        )
-
-        if is_consecutive:
-            start = slots_group[0].split('-')[0]
-            end = slots_group[-1].split('-')[1]
-            lab_slots.append({
-                "slots": slots_group,
-                "label": f"{start}-{end}"
-            })
-
-    return lab_slots
+def _unplace_activity(grid: Dict, occupancy: OccupancyEngine, day: str, activity: Any, cells: List[str]) -> int:
+    """Take ``activity`` out of ``cells`` on ``day`` and release what it held; returns the cells' slot mask"""
+    is_lab = activity.get("type") == "lab"
+    slot_mask = occupancy.slot_mask(cells)
+    if faculty := activity.get("faculty_name"):
+        occupancy.release(day, slot_mask, faculty=faculty)
+
+    if division := activity.get("division", None if is_lab else "ALL"):
+        occupancy.release(day, slot_mask, division=division)
+
+    day_schedule = grid[day]
+    for cell in cells:
+        remaining = [a for a in day_schedule[cell] if a != activity]
+        occupancy.remove_cell_activity(day, occupancy.slot_mask((cell,)), lab=is_lab,
+                                       division=activity.get("division"),
+                                       count=len(day_schedule[cell]) - len(remaining))
+        grid[day][cell] = remaining
+    return slot_mask
+
+
+def _restore_activity(grid: Dict, occupancy: OccupancyEngine, day: str, activity: Any, cells: List[str]) -> int:
+    """Put an activity taken out by _unplace_activity() back into ``cells``; returns their slot mask"""
+    is_lab = activity.get("type") == "lab"
+    slot_mask = occupancy.slot_mask(cells)
+    for cell in cells:
+        grid[day][cell] = (grid[day].get(cell) or []) + [activity]
+    occupancy.occupy(day, slot_mask, faculty=activity.get("faculty_name"),
+                     division=activity.get("division", None if is_lab else "ALL"))
+    occupancy.add_cell_activity(day, slot_mask, lab=is_lab, division=activity.get("division") if is_lab else None)
+    return slot_mask
+
+
+def _make_activity(c: CourseNeed, task_type: str, division: Optional[str] = None) -> Activity:
+    return Activity(task_type, c, division if task_type == LAB else None)
+
+
+def _place_lab_activity(
+        grid: Dict, occupancy: OccupancyEngine, day: str, window: SlotWindow, c: CourseNeed, division: str
+) -> Activity:
+    activity = _make_activity(c, LAB, division)
+    for s in window.slots:
+        grid[day].setdefault(occupancy.time_labels[s], []).append(activity)
+    occupancy.occupy(day, window.mask, faculty=c.faculty_name, division=division)
+    occupancy.add_cell_activity(day, window.mask, lab=True, division=division)
+    return activity
+
+
+def _place_lecture_activity(
+        grid: Dict, occupancy: OccupancyEngine, day: str, slot: int, c: CourseNeed
+) -> Activity:
+    activity = _make_activity(c, LECTURE)
+    grid[day].setdefault(occupancy.time_labels[slot], []).append(activity)
+    occupancy.occupy(day, 1 << slot, faculty=c.faculty_name, division="ALL")
+    occupancy.add_cell_activity(day, 1 << slot)
+    return activity
+
+
+def _describe_task(task: Task) -> Dict[str, Any]:
+    c = task.course
+    return {
+        "course_name": c.course_name,
+        "faculty_name": c.faculty_name,
+        "type": task.type,
+        "division": task.division,
+    }
 
 
 def _allocate_tasks(
-        tasks: List[Dict],
+        state: AllocationState,
         grid: Dict,
-        busy_faculty: Dict,
-        busy_divisions: Dict,
-        time_labels: List[str],
+        occupancy: OccupancyEngine,
         lab_slot_len: int,
-        lecture_slot_len: int
+        lecture_slot_len: int,
+        score_table: Optional[LectureScoreTable] = None,
+        events: Optional[EventStream] = None
 ) -> List[str]:
+    """Try to place every pending task; returns this attempt's conflicts, each once"""
     conflicts = []
-    last_course_per_day = defaultdict(dict)
-    lab_allocations = defaultdict(lambda: defaultdict(int))
-    subject_division_allocated = set()
-    lecture_allocations = defaultdict(int)
-    course_day_slots = defaultdict(set)
-
-    lab_slots = _generate_lab_slots(time_labels, lab_slot_len)
-
-    time_slot_adjacency = {
-        slot: {time_labels[i - 1] if i > 0 else None,
-               time_labels[i + 1] if i < len(time_labels) - 1 else None}
-        for i, slot in enumerate(time_labels)
-    }
-
-    def _can_allocate_lab(day: str, slot_info: Dict, faculty: str, division: str) -> bool:
-        return _slots_ok_for_lab(
-            grid[day], slot_info["slots"], faculty, division,
-            busy_faculty.get(day, {}), busy_divisions.get(day, {})
-        )
-
-    def is_consecutive_slot(course_name: str, day: str, slot: str) -> bool:
-        return any(
-            existing_day == day and slot in time_slot_adjacency.get(existing_slot, set())
-            for existing_day, existing_slot in course_day_slots[course_name]
-        )
-
-    def can_place_lecture(course_name: str, day: str, slot: str, course: CourseNeed) -> bool:
+    last_course_per_day = state.last_course_per_day
+    lab_allocations = state.lab_allocations
+    subject_division_allocated = state.subject_division_allocated
+    lecture_allocations = state.lecture_allocations
+    course_day_slots = state.course_day_slots
+
+    slot_model = occupancy.slot_model
+    labels = slot_model.labels
+    lab_windows = slot_model.windows(lab_slot_len)
+    occupancy.track_windows(lab_slot_len)
+    score_table = score_table or LectureScoreTable(
+        occupancy.days, slot_model, HIGH_CREDIT_DAY_RANK, LOW_CREDIT_DAY_RANK, LECTURE_TIME_RANK
+    )
+
+    def _can_allocate_lab(day: str, window: SlotWindow, faculty: str, division: str) -> bool:
+        return _slots_ok_for_lab(window, faculty, division, occupancy, day)
+
+    def _place_lab(day: str, window: SlotWindow, c: CourseNeed, division: str):
+        activity = _place_lab_activity(grid, occupancy, day, window, c, division)
+        state.placed[id(activity)] = task
+        last_course_per_day[day][division] = c.course_name
+        lab_allocations[c.course_name][division] += 1
+        subject_division_allocated.add((c.course_name, division))
+        if events is not None:
+            events.emit("placed", course=c.course_name, type=LAB, division=division, day=day, slot=window.label)
+
+    def _place_lecture(day: str, slot: int, c: CourseNeed):
+        activity = _place_lecture_activity(grid, occupancy, day, slot, c)
+        state.placed[id(activity)] = task
+        last_course_per_day[day]["ALL"] = c.course_name
+        lecture_allocations[c.course_name] += 1
+        course_day_slots[c.course_name][day] |= 1 << slot
+        if events is not None:
+            events.emit("placed", course=c.course_name, type=LECTURE, day=day, slot=labels[slot])
+
+    def is_consecutive_slot(course_name: str, day: str, slot: int) -> bool:
+        return bool(course_day_slots[course_name][day] & slot_model.neighbor_masks[slot])
+
+    def can_place_lecture(course_name: str, day: str, slot: int, course: CourseNeed) -> bool:
         return (lecture_allocations[course_name] < course.t_hours and
                 not is_consecutive_slot(course_name, day, slot) and
                 last_course_per_day.get(day, {}).get("ALL") != course_name)
 
-    def _get_available_lab_slots(day: str, division: str, faculty: str) -> List[Dict]:
+    def _best_lecture_slot(c: CourseNeed) -> Optional[Tuple[str, int]]:
+        candidates = []
+        for day in sorted(grid.keys(), key=lambda d: DAY_RANK.get(d, 7)):
+            for slot in range(slot_model.size):
+                if not (_slot_ok_for_lecture(
+                        slot, c.faculty_name, occupancy, day, lab_slot_len
+                ) and can_place_lecture(c.course_name, day, slot, c)):
+                    continue
+
+                score = _soft_score(day, labels[slot], c.course_name, c.credits,
+                                    last_course_per_day.get(day, {}))
+                candidates.append((score, score_table.tiebreak(occupancy.day_index(day), slot), day, slot))
+
+        if not candidates:
+            return None
+        candidates.sort(reverse=True)
+        _, _, best_day, best_slot = candidates[0]
+        return best_day, best_slot
+
+    def _best_lecture_slot_vectorized(c: CourseNeed) -> Optional[Tuple[str, int]]:
+        if lecture_allocations[c.course_name] >= c.t_hours:
+            return None
+
+        free_masks = occupancy.lecture_free_masks(c.faculty_name, lab_slot_len)
+        last_course = [last_course_per_day.get(day, {}).get("ALL") == c.course_name for day in occupancy.days]
+        for d, day in enumerate(occupancy.days):
+            if last_course[d]:
+                free_masks[d] = 0
+            elif own := course_day_slots[c.course_name][day]:
+                # No two lectures of a course back to back
+                free_masks[d] &= ~((own << 1) | (own >> 1))
+
+        best = score_table.best_slot(free_masks, c.credits >= 3, last_course)
+        if best is None:
+            return None
+        return occupancy.days[best[0]], best[1]
+
+    def _get_available_lab_slots(day: str, division: str, faculty: str) -> List[SlotWindow]:
         return [
-            slot_info for slot_info in lab_slots
-            if _can_allocate_lab(day, slot_info, faculty, division)
+            window for window in occupancy.free_windows(day, lab_slot_len)
+            if _can_allocate_lab(day, window, faculty, division)
         ]
 
     def _prioritize_lab_days(division: str) -> List[str]:
-        day_counts = defaultdict(int)
-        for day, day_schedule in grid.items():
-            for activities in day_schedule.values():
-                for activity in activities:
-                    if (isinstance(activity, dict) and activity.get("type") == "lab" and
-                            activity.get("division") == division):
-                        day_counts[day] += 1
-
-        return sorted(grid.keys(), key=lambda d: (day_counts[d], DAY_RANK.get(d, 7)))
-
-    # Process constrained tasks first
-    constrained_tasks = [t for t in tasks if t["course"].constraints]
-    unconstrained_tasks = [t for t in tasks if not t["course"].constraints]
-
-    for task in constrained_tasks + unconstrained_tasks:
-        c = task["course"]
-        fac_allowed = _parse_faculty_constraints(c.constraints)
-        division = task.get("division", "ALL")
-        task_type = task["type"]
+        return sorted(grid.keys(), key=lambda d: (occupancy.division_lab_cells(division, d), DAY_RANK.get(d, 7)))
+
+    # Constrained tasks come first in the pending list
+    tasks, state.pending = state.pending, []
+    for task in tasks:
+        c = task.course
+        division = task.division
+        task_type = task.type
         placed = False
 
+        # Already covered by another task; the task is done
         if (task_type == "lab" and (c.course_name, division) in subject_division_allocated) or \
                 (task_type == "lecture" and lecture_allocations[c.course_name] >= c.t_hours):
             continue
 
-        # Handle constraints
+        # Handle constraints, in the order they were given
         if c.constraints:
-            for constraint in c.constraints:
-                constraint_day = constraint["day"].capitalize()
-                constraint_time = constraint["time"]
-                constraint_type = constraint.get("type")
-
-                if constraint_day not in grid:
-                    continue
-
+            for entry in c.compiled.entries:
+                constraint_day = entry.day
                 if last_course_per_day.get(constraint_day, {}).get(division) == c.course_name:
                     continue
 
                 # Lab constraints
-                if task_type == "lab" and (not constraint_type or constraint_type == "lab"):
-                    for slot_info in lab_slots:
-                        if (slot_info["label"] == constraint_time and
-                                _can_allocate_lab(constraint_day, slot_info, c.faculty_name, division) and
-                                _within_faculty_allowed(constraint_day, constraint_time, fac_allowed)):
-
-                            activity = {
-                                "id": str(uuid.uuid4()),
-                                "type": "lab",
-                                "course_name": c.course_name,
-                                "faculty_name": c.faculty_name,
-                                "division": division,
-                                "credits": c.credits,
-                                "display": f"{division} - {c.course_name} - {c.faculty_name}"
-                            }
-
-                            for s in slot_info["slots"]:
-                                grid[constraint_day].setdefault(s, []).append(activity)
-                                busy_faculty[constraint_day][s].add(c.faculty_name)
-                                busy_divisions[constraint_day][s].add(division)
-
-                            last_course_per_day[constraint_day][division] = c.course_name
-                            lab_allocations[c.course_name][division] += 1
-                            subject_division_allocated.add((c.course_name, division))
-                            placed = True
-                            break
-                    if placed:
+                if task_type == "lab" and entry.type != "lecture":
+                    if (entry.window is not None and
+                            _can_allocate_lab(constraint_day, lab_windows[entry.window], c.faculty_name, division)):
+                        _place_lab(constraint_day, lab_windows[entry.window], c, division)
+                        placed = True
                         break
 
                 # Lecture constraints
-                elif task_type == "lecture" and (not constraint_type or constraint_type == "lecture"):
-                    if (_slot_ok_for_lecture(
-                            grid[constraint_day], constraint_time, c.faculty_name,
-                            busy_faculty.get(constraint_day, {}), busy_divisions.get(constraint_day, {}),
-                            lab_slots
-                    ) and _within_faculty_allowed(constraint_day, constraint_time, fac_allowed) and
-                            can_place_lecture(c.course_name, constraint_day, constraint_time, c)):
-                        activity = {
-                            "id": str(uuid.uuid4()),
-                            "type": "lecture",
-                            "course_name": c.course_name,
-                            "faculty_name": c.faculty_name,
-                            "credits": c.credits,
-                            "display": f"{c.course_name} - {c.faculty_name}"
-                        }
-
-                        grid[constraint_day].setdefault(constraint_time, []).append(activity)
-                        busy_faculty[constraint_day][constraint_time].add(c.faculty_name)
-                        busy_divisions[constraint_day][constraint_time].add("ALL")
-                        last_course_per_day[constraint_day]["ALL"] = c.course_name
-                        lecture_allocations[c.course_name] += 1
-                        course_day_slots[c.course_name].add((constraint_day, constraint_time))
+                elif task_type == "lecture" and entry.type != "lab":
+                    if (entry.slot is not None and _slot_ok_for_lecture(
+                            entry.slot, c.faculty_name, occupancy, constraint_day, lab_slot_len
+                    ) and can_place_lecture(c.course_name, constraint_day, entry.slot, c)):
+                        _place_lecture(constraint_day, entry.slot, c)
                         placed = True
                         break
 
@@ -416,74 +520,37 @@ def _allocate_tasks(
             if task_type == "lab":
                 for day in _prioritize_lab_days(division):
                     if (last_course_per_day.get(day, {}).get(division) == c.course_name or
-                            _day_has_too_many_labs(day, division, grid)):
+                            _day_has_too_many_labs(day, division, occupancy)):
                         continue
 
                     if available_slots := _get_available_lab_slots(day, division, c.faculty_name):
-                        slot_info = available_slots[0]
-                        activity = {
-                            "id": str(uuid.uuid4()),
-                            "type": "lab",
-                            "course_name": c.course_name,
-                            "faculty_name": c.faculty_name,
-                            "division": division,
-                            "credits": c.credits,
-                            "display": f"{division} - {c.course_name} - {c.faculty_name}"
-                        }
-
-                        for s in slot_info["slots"]:
-                            grid[day].setdefault(s, []).append(activity)
-                            busy_faculty[day][s].add(c.faculty_name)
-                            busy_divisions[day][s].add(division)
-
-                        last_course_per_day[day][division] = c.course_name
-                        lab_allocations[c.course_name][division] += 1
-                        subject_division_allocated.add((c.course_name, division))
+                        _place_lab(day, available_slots[0], c, division)
                         placed = True
                         break
 
             # Lectures without constraints
             else:
-                candidates = []
-                for day in sorted(grid.keys(), key=lambda d: DAY_RANK.get(d, 7)):
-                    for slot in time_labels:
-                        if not (_slot_ok_for_lecture(
-                                grid[day], slot, c.faculty_name,
-                                busy_faculty.get(day, {}), busy_divisions.get(day, {}), lab_slots
-                        ) and can_place_lecture(c.course_name, day, slot, c)):
-                            continue
-
-                        score = _soft_score(day, slot, c.course_name, c.credits, last_course_per_day.get(day, {}))
-                        candidates.append((score, day, slot))
-
-                if candidates:
-                    candidates.sort(reverse=True)
-                    _, best_day, best_slot = candidates[0]
-                    activity = {
-                        "id": str(uuid.uuid4()),
-                        "type": "lecture",
-                        "course_name": c.course_name,
-                        "faculty_name": c.faculty_name,
-                        "credits": c.credits,
-                        "display": f"{c.course_name} - {c.faculty_name}"
-                    }
-
-                    grid[best_day].setdefault(best_slot, []).append(activity)
-                    busy_faculty[best_day][best_slot].add(c.faculty_name)
-                    busy_divisions[best_day][best_slot].add("ALL")
-                    last_course_per_day[best_day]["ALL"] = c.course_name
-                    lecture_allocations[c.course_name] += 1
-                    course_day_slots[c.course_name].add((best_day, best_slot))
+                if VECTORIZED_LECTURE_SCORING:
+                    best = _best_lecture_slot_vectorized(c)
+                else:
+                    best = _best_lecture_slot(c)
+
+                if best:
+                    _place_lecture(best[0], best[1], c)
                     placed = True
 
         if not placed:
+            state.pending.append(task)
             msg = f"Could not place {c.course_name} ({task_type}) for {c.faculty_name}"
-            conflicts.append(msg)
-            logger.error(msg)
+            if msg not in conflicts:
+                conflicts.append(msg)
+                logger.error(msg)
+                if events is not None:
+                    events.emit("conflict", message=msg)
 
     # Validate lecture allocations
-    lecture_courses = {task["course"].course_name: task["course"]
-                       for task in tasks if task["type"] == "lecture"}
+    lecture_courses = {task.course.course_name: task.course
+                       for task in state.pending if task.type == LECTURE}
 
     for course_name, c in lecture_courses.items():
         required, actual = c.t_hours, lecture_allocations[course_name]
@@ -497,19 +564,43 @@ def _allocate_tasks(
     return conflicts
 
 
-def _day_has_too_many_labs(day: str, division: str, grid: Dict) -> bool:
-    lab_count = 0
-    for activities in grid.get(day, {}).values():
-        for activity in activities:
-            if (isinstance(activity, dict) and activity.get("division") == division and
-                    activity.get("type") == "lab"):
-                lab_count += 1
-                if lab_count >= 2:
-                    return True
-    return False
+def _day_has_too_many_labs(day: str, division: str, occupancy: OccupancyEngine) -> bool:
+    return occupancy.division_lab_cells(division, day) >= 2
+
+
+def _move_cell_counts(occupancy: OccupancyEngine, acts: List, sat_slot: str, fri_slot: str):
+    sat_mask, fri_mask = occupancy.slot_mask((sat_slot,)), occupancy.slot_mask((fri_slot,))
+    for act in acts:
+        is_lab = is_activity(act) and act.get("type") == "lab"
+        division = act.get("division") if is_activity(act) else None
+        occupancy.remove_cell_activity("Saturday", sat_mask, lab=is_lab, division=division)
+        occupancy.add_cell_activity("Friday", fri_mask, lab=is_lab, division=division)
+
+
+def _cell_holders(acts: List) -> Tuple[Set[str], Set[str]]:
+    """The faculty and divisions the activities of one cell hold; lectures hold every division ("ALL")"""
+    faculties = {act.get("faculty_name") for act in acts if is_activity(act)}
+    divisions = {act.get("division") if act.get("type") == "lab" else "ALL" for act in acts if is_activity(act)}
+    return faculties, divisions
+
 
+def _move_cell_holders(occupancy: OccupancyEngine, faculties: Set[str], divisions: Set[str],
+                       sat_slot: str, fri_slot: str):
+    """Move what a Saturday cell's activities hold to a Friday cell, in the grid's bitmasks and the faculty calendar"""
+    sat_mask, fri_mask = occupancy.slot_mask((sat_slot,)), occupancy.slot_mask((fri_slot,))
+    for faculty in faculties:
+        occupancy.release("Saturday", sat_mask, faculty=faculty)
+        occupancy.occupy("Friday", fri_mask, faculty=faculty)
+    for division in divisions:
+        occupancy.release("Saturday", sat_mask, division=division)
+        occupancy.occupy("Friday", fri_mask, division=division)
 
-def _optimize_saturday_schedule(grid: Dict, busy_faculty: Dict, busy_divisions: Dict) -> int:
+
+def _optimize_saturday_schedule(grid: Dict, occupancy: OccupancyEngine, fixed: Optional[Set[int]] = None) -> int:
+    """
+        Move Saturday cells to Friday where faculty and divisions allow;
+        breaks and cells holding an id() in ``fixed`` stay
+    """
     moved_count = 0
 
     if "Saturday" not in grid or "Friday" not in grid:
@@ -517,11 +608,11 @@ def _optimize_saturday_schedule(grid: Dict, busy_faculty: Dict, busy_divisions:
 
     saturday_activities = {
         slot: acts for slot, acts in grid["Saturday"].items()
-        if acts and not _is_break(acts)
+        if acts and not any(_is_break(act) for act in acts)
     }
 
     for sat_slot, sat_acts in saturday_activities.items():
-        if not sat_acts or _is_break(sat_acts):
+        if fixed and any(id(act) in fixed for act in sat_acts):
             continue
 
         # Try to combine with existing Friday labs
@@ -529,23 +620,20 @@ def _optimize_saturday_schedule(grid: Dict, busy_faculty: Dict, busy_divisions:
             if not fri_acts or _is_break(fri_acts):
                 continue
 
-            if (len(sat_slot.split('-')) == len(fri_slot.split('-')) and
-                    any(act.get("type") == "lab" for act in sat_acts) and
+            if (any(act.get("type") == "lab" for act in sat_acts) and
                     any(act.get("type") == "lab" for act in fri_acts)):
 
-                fri_faculties = {act.get("faculty_name") for act in fri_acts if isinstance(act, dict)}
-                fri_divisions = {act.get("division") for act in fri_acts if isinstance(act, dict)}
-                sat_faculties = {act.get("faculty_name") for act in sat_acts if isinstance(act, dict)}
-                sat_divisions = {act.get("division") for act in sat_acts if isinstance(act, dict)}
+                fri_faculties, fri_divisions = _cell_holders(fri_acts)
+                sat_faculties, sat_divisions = _cell_holders(sat_acts)
 
-                if not (fri_faculties & sat_faculties) and not (fri_divisions & sat_divisions):
+                fri_mask = occupancy.slot_mask((fri_slot,))
+                if (not (fri_faculties & sat_faculties) and not (fri_divisions & sat_divisions) and
+                        not any(occupancy.faculty_busy(f, "Friday", fri_mask) for f in sat_faculties)):
                     grid["Friday"][fri_slot].extend(sat_acts)
                     grid["Saturday"][sat_slot] = None
 
-                    for faculty in sat_faculties:
-                        busy_faculty["Friday"].setdefault(fri_slot, set()).add(faculty)
-                    for division in sat_divisions:
-                        busy_divisions["Friday"].setdefault(fri_slot, set()).add(division)
+                    _move_cell_counts(occupancy, sat_acts, sat_slot, fri_slot)
+                    _move_cell_holders(occupancy, sat_faculties, sat_divisions, sat_slot, fri_slot)
 
                     moved_count += 1
                     break
@@ -557,27 +645,24 @@ def _optimize_saturday_schedule(grid: Dict, busy_faculty: Dict, busy_divisions:
                 if fri_acts is not None and not _is_break(fri_acts) and fri_acts:
                     continue
 
-                sat_faculties = {act.get("faculty_name") for act in sat_acts if isinstance(act, dict)}
-                sat_divisions = {act.get("division") for act in sat_acts if isinstance(act, dict)}
+                sat_faculties, sat_divisions = _cell_holders(sat_acts)
 
-                faculty_available = all(
-                    faculty not in busy_faculty.get("Friday", {}).get(fri_slot, set())
+                fri_mask = occupancy.slot_mask((fri_slot,))
+                faculty_available = not any(
+                    occupancy.faculty_busy(faculty, "Friday", fri_mask)
                     for faculty in sat_faculties
                 )
 
-                division_available = all(
-                    division not in busy_divisions.get("Friday", {}).get(fri_slot, set())
+                division_available = not any(
+                    occupancy.division_busy(division, "Friday", fri_mask)
                     for division in sat_divisions
                 )
 
                 if faculty_available and division_available:
                     grid["Friday"][fri_slot] = sat_acts
                     grid["Saturday"][sat_slot] = None
-
-                    for faculty in sat_faculties:
-                        busy_faculty["Friday"].setdefault(fri_slot, set()).add(faculty)
-                    for division in sat_divisions:
-                        busy_divisions["Friday"].setdefault(fri_slot, set()).add(division)
+                    _move_cell_counts(occupancy, sat_acts, sat_slot, fri_slot)
+                    _move_cell_holders(occupancy, sat_faculties, sat_divisions, sat_slot, fri_slot)
 
                     moved_count += 1
                     break
@@ -585,109 +670,145 @@ def _optimize_saturday_schedule(grid: Dict, busy_faculty: Dict, busy_divisions:
     return moved_count
 
 
-def simplify_grid(grid: Dict, time_labels: List[str], lab_slot_len: int) -> Dict:
+def _simplify_cell(activities: List[Any]) -> Any:
+    if any(_is_break(a) for a in activities):
+        return activities[0].get('name', 'Break')
+    if lecture_activities := [a for a in activities if a.get('type') == 'lecture']:
+        return lecture_activities[0].get('display', '')
+    return [a.get('display', '') for a in activities]
+
+
+def simplify_grid(
+        grid: Dict,
+        slot_model: SlotModel,
+        lab_slot_len: int,
+        lab_masks: Optional[Dict[str, int]] = None
+) -> Dict:
+    """
+        Collapse the raw grid into display strings per day.
+
+        Lab windows are taken greedily in time order wherever every cell of
+        the window still holds a lab; each becomes one entry listing the
+        divisions per (course, faculty). ``lab_masks`` gives the cells holding
+        labs per day (from the occupancy engine) so they are not rediscovered
+        from the cells. Days come out in time order without re-sorting unless
+        the grid has labels outside the layout. ``grid`` is not modified.
+    """
     simplified = {}
-    time_slot_order = {slot: idx for idx, slot in enumerate(time_labels)}
 
-    # Generate lab slot candidates
-    lab_slots = _generate_lab_slots(time_labels, lab_slot_len)
+    # Lab slot candidates
+    lab_slots = slot_model.windows(lab_slot_len)
+    labels = slot_model.labels
+    starts = slot_model.start_minutes
+    in_time_order = all(a < b for a, b in zip(starts, starts[1:]))
 
     for day, slots in grid.items():
-        day_schedule = {}
+        cells: List[Optional[List[Any]]] = [None] * slot_model.size
+        foreign = []
+        for label, activities in slots.items():
+            if (idx := slot_model.index.get(label)) is None:
+                foreign.append(label)
+            else:
+                cells[idx] = activities
 
-        # Process lab slots
-        for slot_info in lab_slots:
-            combined_label = slot_info["label"]
-            slot_group = slot_info["slots"]
-
-            if all(
-                    any(act.get("type") == "lab" for act in (slots.get(slot) or []))
-                    for slot in slot_group
-            ):
-                all_lab_activities = []
-                for slot in slot_group:
-                    for activity in slots.get(slot) or []:
-                        if (activity.get("type") == "lab" and not any(
-                                a.get("course_name") == activity.get("course_name") and
-                                a.get("faculty_name") == activity.get("faculty_name") and
-                                a.get("division") == activity.get("division")
-                                for a in all_lab_activities
-                        )):
-                            all_lab_activities.append(activity)
-
-                if all_lab_activities:
-                    grouped_activities = defaultdict(list)
-                    for act in all_lab_activities:
-                        key = f"{act.get('course_name')}-{act.get('faculty_name')}"
-                        grouped_activities[key].append(act)
-
-                    lab_entries = []
-                    for activities in grouped_activities.values():
-                        divisions = sorted(list({act.get("division") for act in activities}))
-                        course_name = activities[0].get("course_name")
-                        faculty_name = activities[0].get("faculty_name")
-                        lab_entries.append(f"{', '.join(divisions)} - {course_name} - {faculty_name}")
-
-                    day_schedule[combined_label] = lab_entries
-
-                    for slot in slot_group:
-                        if slot in slots and slots[slot] is not None:
-                            slots[slot] = []
-
-        # Process remaining slots
-        all_slots = sorted(slots.keys(), key=lambda x: time_slot_order.get(x, float('inf')))
-
-        for slot in all_slots:
-            if slot in day_schedule:
-                continue
+        if lab_masks is not None and day in lab_masks:
+            free_labs = lab_masks[day]
+        else:
+            free_labs = 0
+            for idx, activities in enumerate(cells):
+                if any(act.get("type") == "lab" for act in activities or []):
+                    free_labs |= 1 << idx
 
-            activities = slots[slot]
-            if not activities:
+        # Process lab slots
+        consumed = 0
+        lab_entries_at: Dict[int, Tuple[str, List[str]]] = {}
+        for window in lab_slots:
+            if window.mask & free_labs != window.mask:
                 continue
 
-            if any(_is_break(a) for a in activities):
-                day_schedule[slot] = activities[0].get('name', 'Break')
-            elif lecture_activities := [a for a in activities if a.get('type') == 'lecture']:
-                day_schedule[slot] = lecture_activities[0].get('display', '')
-            elif activities:
-                day_schedule[slot] = [a.get('display', '') for a in activities]
-
-        # Sort by start time
-        simplified[day] = dict(sorted(
-            day_schedule.items(),
-            key=lambda x: x[0].split('-')[0] if '-' in x[0] else x[0]
-        ))
+            divisions_by_lab: Dict[Tuple[Any, Any], Set[Any]] = {}
+            for idx in window.slots:
+                for act in cells[idx]:
+                    if act.get("type") == "lab":
+                        key = (act.get("course_name"), act.get("faculty_name"))
+                        divisions_by_lab.setdefault(key, set()).add(act.get("division"))
+
+            lab_entries_at[window.start] = (window.label, [
+                f"{', '.join(sorted(divisions))} - {course_name} - {faculty_name}"
+                for (course_name, faculty_name), divisions in divisions_by_lab.items()
+            ])
+            free_labs &= ~window.mask
+            consumed |= window.mask
+
+        # Walk the slots in order, emitting lab windows where they start
+        day_schedule = {}
+        for idx, activities in enumerate(cells):
+            if idx in lab_entries_at:
+                label, entries = lab_entries_at[idx]
+                day_schedule[label] = entries
+            elif activities and not consumed >> idx & 1 and labels[idx] not in day_schedule:
+                day_schedule[labels[idx]] = _simplify_cell(activities)
+
+        for label in foreign:
+            if slots[label] and label not in day_schedule:
+                day_schedule[label] = _simplify_cell(slots[label])
+
+        if foreign or not in_time_order:
+            # Sort by start time
+            day_schedule = dict(sorted(day_schedule.items(), key=lambda x: slot_model.start_of(x[0])))
+        simplified[day] = day_schedule
 
     return simplified
 
 
-def generate_timetable(db, dept, sem, user_id=None, persist_to_db=False) -> Dict[str, Any]:
-    r = get_redis()
-    rkey_layout = f"tt:{dept}:{sem}:layout"
+@dataclass
+class ScheduleOutcome:
+    grid: Dict
+    simplified_grid: Dict
+    conflicts: List[str]
+    attempts: int
+    unplaced: List[Dict[str, Any]]
+    busy_faculty: Dict[str, Dict[str, List[str]]]
+    busy_divisions: Dict[str, Dict[str, List[str]]]
+    # Soft score of the grid, see score_schedule()
+    score: int
+    seed: Optional[int] = None
+    # Tasks (single placements) scheduled, out of placed + len(unplaced)
+    placed: int = 0
+    # Built with reproducible=True: the same inputs and seed give this grid again
+    reproducible: bool = False
+    # PhaseTimer.to_dict() of the run, with debug_timings
+    timings: Optional[Dict[str, Any]] = None
+    # Blocking sets of the unplaced tasks, with explain
+    explanations: Optional[List[Dict[str, Any]]] = None
+
+
+def _build_tasks(needs: List[CourseNeed], lab_minutes: int, slot_duration: int) -> List[Task]:
+    tasks = []
+    for c in needs:
+        # Lectures
+        if c.t_hours > 0:
+            tasks.append(Task(c, LECTURE, count=c.t_hours))
 
-    try:
-        state = json.loads(r.get(rkey_layout) or "{}")
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {str(e)}")
-        raise ValueError("Invalid JSON in timetable layout")
+        # Labs, one task per division with its session count
+        if c.practical:
+            sessions = defaultdict(int)
+            for div, block_len, _ in _expand_lab_requirements(c, lab_minutes, slot_duration):
+                sessions[(div, block_len)] += 1
+            for (div, block_len), count in sessions.items():
+                tasks.append(Task(c, LAB, block_len=block_len, division=div, count=count))
+    return tasks
 
-    layout = state.get("layout", {})
-    grid = state.get("grid", {})
 
-    # Check if time_slots exists in layout
-    if "time_slots" not in layout:
-        logger.error(f"Missing time_slots in layout for dept={dept}, sem={sem}")
-        # Try to get time_slots from a default configuration or raise a more specific error
-        raise ValueError("Timetable layout is incomplete. Please ensure the schedule form was submitted correctly.")
+def _lab_slot_len(layout: Dict) -> int:
+    return max(1, int(layout.get("lab_minutes", 110)) // int(layout.get("slot_duration", 55)))
 
-    time_labels = _collect_time_labels(layout)
-    slot_duration = int(layout.get("slot_duration", 55))
-    lab_minutes = int(layout.get("lab_minutes", 110))
-    lab_slot_len = max(1, lab_minutes // slot_duration)
 
-    # Initialize busy maps
-    busy_faculty = defaultdict(lambda: defaultdict(set))
-    busy_divisions = defaultdict(lambda: defaultdict(set))
+def _occupancy_for_grid(
+        grid: Dict, slot_model: SlotModel, faculty_calendar: Optional[FacultyCalendar] = None
+) -> OccupancyEngine:
+    """Convert ``grid``'s cells to lists in place and record what they already hold"""
+    occupancy = OccupancyEngine(grid.keys(), slot_model, faculty_calendar)
 
     # Convert grid to list format
     for day, day_slots in grid.items():
@@ -696,53 +817,384 @@ def generate_timetable(db, dept, sem, user_id=None, persist_to_db=False) -> Dict
                 grid[day][slot] = []
             elif not isinstance(cell, list):
                 grid[day][slot] = [cell] if _is_break(cell) else [cell]
-                if faculty := cell.get("faculty_name"):
-                    busy_faculty[day][slot].add(faculty)
-                if division := cell.get("division"):
-                    busy_divisions[day][slot].add(division)
+                occupancy.occupy(day, occupancy.slot_mask((slot,)),
+                                 faculty=cell.get("faculty_name"), division=cell.get("division"))
+
+            if slot in slot_model.index:
+                for activity in grid[day][slot]:
+                    stored = is_activity(activity)
+                    occupancy.add_cell_activity(day, occupancy.slot_mask((slot,)),
+                                                lab=stored and activity.get("type") == "lab",
+                                                division=activity.get("division") if stored else None)
+    return occupancy
+
+
+def check_schedule_feasibility(
+        layout: Dict, grid: Dict, needs: List[CourseNeed], faculty_calendar: Optional[FacultyCalendar] = None
+) -> FeasibilityReport:
+    """
+        Pre-solve capacity analysis of ``needs`` against ``grid``, see
+        check_feasibility(). Reads the inputs like build_schedule() does and
+        leaves them unchanged.
+    """
+    return check_feasibility(*_feasibility_inputs(layout, grid, needs, faculty_calendar))
+
+
+def _feasibility_inputs(
+        layout: Dict, grid: Dict, needs: List[CourseNeed], faculty_calendar: Optional[FacultyCalendar] = None
+) -> Tuple[List[Task], OccupancyEngine, int]:
+    """The tasks left to place, the occupancy of a copy of ``grid`` and the lab block length, as the checks take them"""
+    slot_model = compile_slot_model(layout)
+    slot_duration = int(layout.get("slot_duration", 55))
+    lab_minutes = int(layout.get("lab_minutes", 110))
+    lab_slot_len = _lab_slot_len(layout)
+    grid = copy.deepcopy(grid)
+    occupancy = _occupancy_for_grid(grid, slot_model, faculty_calendar)
+    compile_needs(needs, occupancy.days, slot_model, lab_slot_len)
+    state = AllocationState(pending=expand_tasks(_build_tasks(needs, lab_minutes, slot_duration)))
+    _load_pinned(grid, state, occupancy, needs, lab_slot_len)
+    return state.pending, occupancy, lab_slot_len
+
+
+def _without_placements(layout: Dict, grid: Dict) -> Dict:
+    """
+        Copy of a stored ``grid`` holding only the breaks of ``layout``, as
+        the layout form lays them out, and the grid's pinned activities.
+        Breaks are rebuilt from ``layout["time_slots"]`` rather than read
+        from the grid, where earlier runs may have moved them.
+    """
+    breaks = {
+        f"{ts['start']}-{ts['end']}": {"type": "break", "name": ts.get("break_name", "Break")}
+        for ts in layout.get("time_slots", []) if ts.get("is_break")
+    }
 
-    # Get course needs and create tasks
-    needs = _course_needs_from_db_and_redis(db, dept, sem, r)
-    logger.debug(f"Found {len(needs)} courses with faculty assignments")
+    def _cell(label: str, cells: Any) -> Any:
+        if label in breaks:
+            return dict(breaks[label])
+        pinned = [a for a in (cells if isinstance(cells, list) else [cells])
+                  if is_activity(a) and not _is_break(a) and a.get("protected", False)]
+        return pinned or None
 
-    tasks = []
-    for c in needs:
-        # Lectures
-        for _ in range(c.t_hours):
-            tasks.append({"course": c, "type": "lecture", "block_len": 1})
+    return {day: {label: _cell(label, cells) for label, cells in day_slots.items()} for day, day_slots in grid.items()}
 
-        # Labs
-        if c.practical:
-            for div, block_len, _ in _expand_lab_requirements(c, lab_minutes, slot_duration):
-                tasks.append({"course": c, "type": "lab", "block_len": block_len, "division": div})
 
-    # Allocation with retries
+def _take_covered_tasks(state: AllocationState, covered: Dict[Tuple[str, str, str], int]):
+    """Drop from ``state.pending`` ``covered[(course name, type, division)]`` tasks of each kind, keeping the order"""
+    pending = []
+    for task in state.pending:
+        key = (task.course.course_name, task.type, task.division)
+        if covered.get(key, 0) > 0:
+            covered[key] -= 1
+        else:
+            pending.append(task)
+    state.pending = pending
+
+
+def _load_pinned(
+        grid: Dict, state: AllocationState, occupancy: OccupancyEngine, needs: List[CourseNeed], lab_slot_len: int
+) -> Set[int]:
+    """
+        Count the pinned activities of ``grid`` (``protected``, see
+        pin_activities()) as placed: they hold their faculty and divisions,
+        and each takes one matching task out of ``state.pending`` while
+        ``needs`` still call for it. Returns their id(), so nothing evicts or
+        moves them.
+    """
+    by_key = {_assignment_key(c): c for c in needs}
+    pinned = set()
+    covered = defaultdict(int)
+    for activity, day, slot_mask in _stored_placements(grid, occupancy.slot_model):
+        if not activity.get("protected", False):
+            continue
+        is_lab = activity.get("type") == LAB
+        division = activity.get("division") if is_lab else "ALL"
+        occupancy.occupy(day, slot_mask, faculty=activity.get("faculty_name"), division=division)
+        pinned.add(id(activity))
+        if (c := by_key.get(_assignment_key(activity))) is None:
+            continue
+        task = Task(c, LAB, block_len=lab_slot_len, division=division) if is_lab else Task(c, LECTURE)
+        state.record(activity, task, day, slot_mask)
+        covered[(c.course_name, task.type, task.division)] += 1
+    _take_covered_tasks(state, covered)
+    return pinned
+
+
+def _prior_placements(
+        prior: Dict, needs: List[CourseNeed], slot_model: SlotModel, lab_slot_len: int
+) -> List[Tuple[Task, str, int]]:
+    """
+        (task, day, slot mask) of each placement in a simplified ``prior``
+        grid (see simplify_grid()) that names an assignment of ``needs``:
+        lab entries at their window labels, lectures at their slot labels.
+        Course names compare like in the stored assignments. Constrained
+        courses come first, then labs before lectures, each in grid order.
+    """
+    by_key = {_assignment_key(c): c for c in needs}
+    windows = {window.label: window for window in slot_model.windows(lab_slot_len)}
+
+    def _need(display: str) -> Optional[CourseNeed]:
+        # "course - faculty", split at the last separator
+        course_name, _, faculty_name = display.rpartition(" - ")
+        return by_key.get((course_name.strip().lower(), faculty_name))
+
+    placements = []
+    for day, day_slots in (prior or {}).items():
+        for label, value in (day_slots or {}).items():
+            if isinstance(value, list) and label in windows:
+                for entry in value:
+                    divisions, _, display = str(entry).partition(" - ")
+                    c = _need(display)
+                    for division in divisions.split(", ") if c is not None and c.practical else ():
+                        task = Task(c, LAB, block_len=lab_slot_len, division=division)
+                        placements.append((task, day, windows[label].mask))
+            elif isinstance(value, str) and label in slot_model.index:
+                c = _need(value)
+                if c is not None:
+                    placements.append((Task(c, LECTURE), day, 1 << slot_model.index[label]))
+    placements.sort(key=lambda p: (not p[0].course.constraints, p[0].type != LAB))
+    return placements
+
+
+def _seed_prior_placements(
+        placements: List[Tuple[Task, str, int]], state: AllocationState, grid: Dict,
+        occupancy: OccupancyEngine, lab_slot_len: int
+) -> Set[int]:
+    """
+        Place the ``placements`` of an earlier run that are still valid: their
+        need still calls for them, their constraints allow them, and their
+        cells, faculty and divisions are free. As in repair_schedule(), the
+        allocator's spreading preferences (no back-to-back lectures, one lab
+        block per division and day, no lecture inside a lab's window) are not
+        checked again; the earlier run's Saturday moves may have bent them.
+        Each placement takes one matching task out of ``state.pending``.
+        Returns the id() of the activities placed.
+    """
+    lab_windows = occupancy.slot_model.windows(lab_slot_len)
+    window_ids = {window.mask: k for k, window in enumerate(lab_windows)}
+    kept = set()
+    covered = defaultdict(int)
+    for task, day, slot_mask in placements:
+        c = task.course
+        if not occupancy.has_day(day) or not _fits_need(task, day, slot_mask, state, occupancy, window_ids):
+            continue
+        if task.type == LAB:
+            window = lab_windows[window_ids[slot_mask]]
+            if not _slots_ok_for_lab(window, c.faculty_name, task.division, occupancy, day):
+                continue
+            activity = _place_lab_activity(grid, occupancy, day, window, c, task.division)
+        else:
+            slot = slot_mask.bit_length() - 1
+            if not _slot_ok_for_lecture(slot, c.faculty_name, occupancy, day):
+                continue
+            activity = _place_lecture_activity(grid, occupancy, day, slot, c)
+        state.record(activity, task, day, slot_mask)
+        kept.add(id(activity))
+        covered[(c.course_name, task.type, task.division)] += 1
+    _take_covered_tasks(state, covered)
+    return kept
+
+
+def build_schedule(
+        layout: Dict,
+        grid: Dict,
+        needs: List[CourseNeed],
+        solver: str = "greedy",
+        node_budget: int = DEFAULT_NODE_BUDGET,
+        time_budget_ms: int = DEFAULT_TIME_BUDGET_MS,
+        optimize_ms: int = 0,
+        seed: Optional[int] = None,
+        faculty_calendar: Optional[FacultyCalendar] = None,
+        progress: Optional[ProgressCallback] = None,
+        events: Optional[EventStream] = None,
+        reproducible: bool = False,
+        debug_timings: bool = False,
+        explain: bool = False,
+        warm_start: Optional[Dict] = None
+) -> ScheduleOutcome:
+    """
+        Schedule ``needs`` into a copy of ``grid``, entirely in memory.
+
+        This is the allocation core behind generate_timetable(); it does no
+        Redis or database I/O, so it can run in a worker process. With a
+        ``seed`` the task order and lecture tie-breaks are randomized; without
+        one the run is the deterministic default. A ``faculty_calendar`` shared
+        between calls keeps faculty from being booked twice across grids.
+        ``progress(phase, placed, total)`` is called as the run moves through
+        its phases, with the number of placed tasks; ``events`` receives the
+        individual placements, conflicts, retries and results.
+
+        With ``reproducible`` the search and local search budgets count nodes
+        and iterations instead of time, and activity ids are drawn from
+        ``seed``, so the same inputs and seed give a byte-identical grid.
+        ``debug_timings`` records milliseconds per phase and per retry in
+        the outcome's ``timings``. ``explain`` adds a blocking set for each
+        unplaced task to ``explanations``, see explain_unplaced().
+
+        Activities in ``grid`` marked ``protected`` (pinned, see
+        pin_activities()) count as placed and never move; other activities
+        already in ``grid`` only take up their cells.
+
+        ``warm_start`` is the simplified grid of an earlier run (as saved by
+        save_timetable_json()). Its placements that are still valid are
+        placed first, after the constrained tasks, and are never evicted,
+        moved by local search or moved off Saturday; only the remaining
+        tasks are allocated or searched.
+    """
+    timer = phase_timer(debug_timings)
+    grid = copy.deepcopy(grid)
+    slot_model = compile_slot_model(layout)
+    slot_duration = int(layout.get("slot_duration", 55))
+    lab_minutes = int(layout.get("lab_minutes", 110))
+    lab_slot_len = _lab_slot_len(layout)
+    occupancy = _occupancy_for_grid(grid, slot_model, faculty_calendar)
+    # Normally done when the needs were loaded
+    compile_needs(needs, occupancy.days, slot_model, lab_slot_len)
+    timer.lap("grid_setup")
+
+    tasks = expand_tasks(_build_tasks(needs, lab_minutes, slot_duration))
+    if seed is not None:
+        random.Random(seed).shuffle(tasks)
+    report = progress or (lambda phase, placed, total: None)
+    timer.lap("task_expansion")
+
     all_conflicts = []
+    unplaced = []
     retry_count = 0
 
-    for retry in range(MAX_RETRIES + 1):
-        conflicts = _allocate_tasks(
-            tasks, grid, busy_faculty, busy_divisions,
-            time_labels, lab_slot_len, 1
+    score_table = LectureScoreTable(
+        occupancy.days, slot_model, HIGH_CREDIT_DAY_RANK, LOW_CREDIT_DAY_RANK, LECTURE_TIME_RANK,
+        tiebreak_seed=seed
+    )
+    timer.lap("score_table")
+
+    state = AllocationState.for_tasks(tasks)
+    # Pinned activities stay where they are; their tasks are done
+    pinned = _load_pinned(grid, state, occupancy, needs, lab_slot_len)
+    if pinned:
+        logger.info(f"{len(pinned)} pinned activities kept in place")
+        timer.lap("pinned")
+    kept: Set[int] = set()
+    if warm_start:
+        prior = _prior_placements(warm_start, needs, slot_model, lab_slot_len)
+        kept = _seed_prior_placements(
+            [p for p in prior if p[0].course.constraints], state, grid, occupancy, lab_slot_len
         )
+        # Constrained tasks have nowhere else to go, so they are placed before the other kept placements
+        pending, state.pending = state.pending, [t for t in state.pending if t.course.constraints]
+        _allocate_tasks(state, grid, occupancy, lab_slot_len, 1, score_table, events)
+        state.pending += [t for t in pending if not t.course.constraints]
+        kept |= _seed_prior_placements(
+            [p for p in prior if not p[0].course.constraints], state, grid, occupancy, lab_slot_len
+        )
+        logger.info(f"Warm start kept {len(kept)} of {len(prior)} earlier placements")
+        if events is not None:
+            events.emit("warm_start", kept=len(kept), prior=len(prior))
+        timer.lap("warm_start")
+
+    if solver == "backtracking":
+        report("searching", len(tasks) - len(state.pending), len(tasks))
+        search = solve_backtracking(
+            _missing_tasks(needs, state, lab_minutes, slot_duration) if kept or pinned else tasks,
+            occupancy, lab_slot_len, score_table, lambda d: DAY_RANK.get(d, 7),
+            node_budget=node_budget, time_budget_ms=None if reproducible else time_budget_ms
+        )
+        for task, day, value in search.placements:
+            if task.type == LAB:
+                _place_lab_activity(grid, occupancy, day, value, task.course, task.division)
+            else:
+                _place_lecture_activity(grid, occupancy, day, value, task.course)
+            if events is not None:
+                events.emit("placed", course=task.course.course_name, type=task.type, division=task.division,
+                            day=day, slot=value.label if task.type == LAB else slot_model.labels[value])
+
+        unplaced_tasks = search.unplaced
+        unplaced = [_describe_task(task) for task in search.unplaced]
+        all_conflicts = list(dict.fromkeys(
+            f"Could not place {t['course_name']} ({t['type']}) for {t['faculty_name']}" for t in unplaced
+        ))
+        timer.lap("search")
 
-        if not conflicts:
+    # Allocation with retries; each retry only revisits unplaced and evicted tasks
+    for retry in range(MAX_RETRIES + 1 if solver == "greedy" else 0):
+        all_conflicts = _allocate_tasks(
+            state, grid, occupancy, lab_slot_len, 1, score_table, events
+        )
+        retry_count = retry
+        report("allocating", len(tasks) - len(state.pending), len(tasks))
+        allocate_ms = timer.lap("allocate")
+
+        if not all_conflicts:
+            timer.retry(attempt=retry + 1, allocate_ms=round(allocate_ms, 3), free_ms=0.0,
+                        placed=len(tasks) - len(state.pending), pending=0, conflicts=0, freed=0)
             logger.info(f"Timetable generated successfully on attempt {retry + 1}")
-            retry_count = retry
             break
 
-        all_conflicts.extend(conflicts)
+        freed = 0
+        if retry < MAX_RETRIES:
+            freed = _free_low_priority_slots(grid, occupancy, len(all_conflicts) * 2, state, kept | pinned)
+        free_ms = timer.lap("free_slots")
+        timer.retry(attempt=retry + 1, allocate_ms=round(allocate_ms, 3), free_ms=round(free_ms, 3),
+                    placed=len(tasks) - len(state.pending), pending=len(state.pending),
+                    conflicts=len(all_conflicts), freed=freed)
+
         if retry < MAX_RETRIES:
-            freed = _free_low_priority_slots(grid, busy_faculty, busy_divisions, len(conflicts) * 2)
             logger.info(f"Retry {retry + 1}: Freed {freed} low-priority slots")
+            if events is not None:
+                events.emit("retry", attempt=retry + 2, conflicts=len(all_conflicts), freed=freed)
+            if not freed:
+                # Nothing changed, another attempt would fail the same way
+                logger.warning(f"Nothing left to free with {len(all_conflicts)} conflicts")
+                break
+        else:
+            logger.warning(f"Max retries reached with {len(all_conflicts)} conflicts")
+
+    if solver == "greedy":
+        unplaced_tasks = state.pending
+        unplaced = [_describe_task(task) for task in state.pending]
+    placed = len(tasks) - len(unplaced)
+
+    # Improve soft quality of the placement within the remaining budget
+    if optimize_ms > 0:
+        report("optimizing", placed, len(tasks))
+        # Only activities placed by this run move, and never those of constrained courses
+        # or those kept from a warm start
+        movable = {
+            id(activity) for day_slots in grid.values() for activities in day_slots.values()
+            for activity in activities
+            if isinstance(activity, Activity) and not activity.course.constraints and id(activity) not in kept
+        }
+        if reproducible:
+            optimize_schedule(grid, occupancy, lab_slot_len, score_table, movable, time_budget_ms=None,
+                              max_iterations=optimize_ms * OPTIMIZE_ITERATIONS_PER_MS, seed=seed or 0)
         else:
-            logger.warning(f"Max retries reached with {len(conflicts)} conflicts")
-            retry_count = MAX_RETRIES
+            optimize_schedule(grid, occupancy, lab_slot_len, score_table, movable,
+                              time_budget_ms=optimize_ms, seed=seed or 0)
+        timer.lap("optimize")
+
+    explanations = None
+    if explain:
+        # Against the grid the allocator left, before Saturday moves bend the cell rules
+        timer.skip()
+        explanations = explain_unplaced(unplaced_tasks, grid, occupancy, lab_slot_len)
+        timer.lap("explain")
 
     # Optimize Saturday schedule
-    saturday_optimized = _optimize_saturday_schedule(grid, busy_faculty, busy_divisions)
+    timer.skip()
+    saturday_optimized = _optimize_saturday_schedule(grid, occupancy, kept | pinned)
+    timer.lap("saturday")
     if saturday_optimized > 0:
         logger.info(f"Moved {saturday_optimized} activities from Saturday to Friday")
+    if events is not None:
+        events.emit("saturday", moved=saturday_optimized)
+
+    score = score_schedule(grid, slot_model, score_table)
+    timer.lap("score")
+    if events is not None:
+        events.emit("score", score=score, placed=placed, total=len(tasks))
+    report("finishing", placed, len(tasks))
+
+    if reproducible:
+        assign_ids(grid, seed or 0)
 
     # Cleanup empty slots
     for day in grid:
@@ -750,25 +1202,89 @@ def generate_timetable(db, dept, sem, user_id=None, persist_to_db=False) -> Dict
             if not grid[day][slot]:
                 grid[day][slot] = None
 
-    # Save results
-    r.set(rkey_layout, json.dumps({"layout": layout, "grid": grid}, ensure_ascii=False))
+    busy_faculty, busy_divisions = occupancy.to_busy_maps()
+    timer.lap("busy_maps")
+    simplified_grid = simplify_grid(grid, slot_model, lab_slot_len,
+                                    {day: occupancy.lab_mask(day) for day in occupancy.days})
+    timer.lap("simplify_grid")
+
+    return ScheduleOutcome(
+        grid=grid,
+        simplified_grid=simplified_grid,
+        conflicts=all_conflicts,
+        attempts=retry_count + 1,
+        unplaced=unplaced,
+        busy_faculty=busy_faculty,
+        busy_divisions=busy_divisions,
+        score=score,
+        seed=seed,
+        placed=placed,
+        reproducible=reproducible,
+        timings=timer.to_dict(),
+        explanations=explanations,
+    )
+
+
+def _outcome_rank(outcome: ScheduleOutcome) -> Tuple[int, int, int]:
+    return len(outcome.unplaced), len(outcome.conflicts), -outcome.score
+
+
+def _load_schedule_inputs(
+        db, dept, sem, r, timer: PhaseTimer = NULL_TIMER, fac_rows: Optional[List[Dict[str, Any]]] = None
+) -> Tuple[Dict, Dict, List[CourseNeed]]:
+    """
+        Read the stored layout and grid and the course needs for one
+        department/semester; ``fac_rows`` stands in for the stored faculty
+        assignments.
+    """
+    rkey_layout = f"tt:{dept}:{sem}:layout"
+
+    try:
+        state = json.loads(r.get(rkey_layout) or "{}")
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON decode error: {str(e)}")
+        raise ValueError("Invalid JSON in timetable layout")
+
+    layout = state.get("layout", {})
+    grid = state.get("grid", {})
+    timer.lap("redis_layout_read")
+
+    # Check if time_slots exists in layout
+    if "time_slots" not in layout:
+        logger.error(f"Missing time_slots in layout for dept={dept}, sem={sem}")
+        # Try to get time_slots from a default configuration or raise a more specific error
+        raise ValueError("Timetable layout is incomplete. Please ensure the schedule form was submitted correctly.")
 
-    # Convert sets to lists for JSON serialization
-    def convert_sets(obj):
-        if isinstance(obj, set):
-            return list(obj)
-        elif isinstance(obj, dict):
-            return {k: convert_sets(v) for k, v in obj.items()}
-        return obj
+    # Get course needs
+    needs = _course_needs_from_db_and_redis(db, dept, sem, r, fac_rows)
+    compile_needs(needs, list(grid.keys()), compile_slot_model(layout), _lab_slot_len(layout))
+    timer.lap("course_load")
+    logger.debug(f"Found {len(needs)} courses with faculty assignments")
+    if errors := constraint_errors(needs):
+        logger.warning(f"{len(errors)} invalid constraints for dept={dept}, sem={sem}")
+    return layout, grid, needs
 
-    r.set(f"tt:{dept}:{sem}:busy_faculty", json.dumps(convert_sets(busy_faculty)))
-    r.set(f"tt:{dept}:{sem}:busy_divisions", json.dumps(convert_sets(busy_divisions)))
 
-    simplified_grid = simplify_grid(grid, time_labels, lab_slot_len)
+def _store_outcome(
+        db, dept, sem, r, layout: Dict, outcome: ScheduleOutcome, user_id=None, persist_to_db=False,
+        timer: PhaseTimer = NULL_TIMER
+) -> Dict[str, Any]:
+    """Save a schedule to Redis (and the database when asked) and build the API result"""
+    # Save results
+    r.set(f"tt:{dept}:{sem}:layout",
+          json.dumps({"layout": layout, "grid": serialize_grid(outcome.grid)}, ensure_ascii=False))
+    r.set(f"tt:{dept}:{sem}:busy_faculty", json.dumps(outcome.busy_faculty))
+    r.set(f"tt:{dept}:{sem}:busy_divisions", json.dumps(outcome.busy_divisions))
+    timer.lap("redis_writes")
+    publish_faculty_busy(r, dept, sem, outcome.busy_faculty, compile_slot_model(layout))
+    timer.lap("faculty_index_publish")
 
     result = {
-        "grid": simplified_grid
+        "grid": outcome.simplified_grid
     }
+    if outcome.reproducible:
+        # Regenerating with this seed (and one start) gives the same grid
+        result["seed"] = outcome.seed
 
     if persist_to_db and user_id:
         # Save to database with user association
@@ -779,5 +1295,785 @@ def generate_timetable(db, dept, sem, user_id=None, persist_to_db=False) -> Dict
             user_id=user_id,  # Pass the user_id
             timetable_json=result,
         )
+        timer.lap("save_timetable_json")
+
+    return {
+        **result,
+        "conflicts": outcome.conflicts,
+        "attempts": outcome.attempts,
+        "unplaced": outcome.unplaced,
+        "seed": outcome.seed if outcome.reproducible else None,
+        "explanations": outcome.explanations,
+    }
 
-    return result
\ No newline at end of file
+
+def generate_timetable(
+        db,
+        dept,
+        sem,
+        user_id=None,
+        persist_to_db=False,
+        solver: str = "greedy",
+        node_budget: int = DEFAULT_NODE_BUDGET,
+        time_budget_ms: int = DEFAULT_TIME_BUDGET_MS,
+        optimize_ms: int = 0,
+        starts: int = DEFAULT_STARTS,
+        workers: Optional[int] = None,
+        deadline_ms: int = DEFAULT_DEADLINE_MS,
+        respect_faculty_index: bool = False,
+        use_cache: bool = True,
+        seed: Optional[int] = None,
+        debug_timings: bool = False,
+        precheck: bool = True,
+        explain: bool = False,
+        warm_start: bool = False,
+        progress: Optional[ProgressCallback] = None,
+        events: Optional[EventStream] = None
+) -> Dict[str, Any]:
+    """
+        Schedule one department/semester from its stored layout, course rows
+        and faculty assignments, store the result and return it.
+
+        With ``use_cache`` a run whose inputs (layout and grid, course needs,
+        solver options, preloaded faculty bookings) hash the same as an
+        earlier one reuses that outcome instead of allocating again.
+
+        With a ``seed`` the run is reproducible: budgets count work instead
+        of time, activity ids come from the seed, and multi-start uses seeds
+        ``seed .. seed + starts - 1`` and waits for all of them.
+
+        With ``debug_timings`` the result also carries ``timings``: the
+        milliseconds spent in each phase, from loading to storing, and one
+        record per greedy retry. The same numbers are logged.
+
+        With ``precheck`` constraints naming days or times the layout does
+        not have raise ConstraintValidationError, and inputs that provably
+        cannot be scheduled in full (see check_feasibility()) raise
+        InfeasibleScheduleError, both before the cache lookup and any
+        allocation; turn it off to
+        get a best-effort partial timetable that ignores invalid constraints.
+        With ``explain`` the result lists, for each unplaced task, a small
+        set of constraints and placements that block every slot it could
+        take.
+
+        Activities pinned in the stored grid (see pin_activities()) keep
+        their place and the rest is scheduled around them; the stored
+        grid's other placements, left by the last run, are dropped.
+
+        With ``warm_start`` the timetable last saved for this
+        department/semester (the user's own, see save_timetable_json()) is
+        the starting point: its placements that are still valid stay where
+        they are and only the rest is scheduled, see build_schedule().
+        Without a saved timetable the run starts from the layout and the
+        pinned activities.
+    """
+    if solver not in SOLVER_MODES:
+        raise ValueError(f"Unknown solver '{solver}', expected one of {', '.join(SOLVER_MODES)}")
+
+    report = progress or (lambda phase, placed, total: None)
+    started = time.perf_counter()
+    timer = phase_timer(debug_timings)
+    report("loading", 0, 0)
+    r = get_redis()
+    layout, grid, needs = _load_schedule_inputs(db, dept, sem, r, timer)
+    # The stored grid holds the last run's placements; only the pinned ones stay
+    grid = _without_placements(layout, grid)
+    prior = None
+    if warm_start:
+        prior = (crud_timetables.get_timetable_json(db, dept, sem, user_id) or {}).get("grid")
+        if not prior:
+            logger.info(f"No saved timetable to warm start dept={dept}, sem={sem} from")
+        timer.lap("warm_start_load")
+    calendar = None
+    if respect_faculty_index:
+        # Faculty time booked by other timetables is a hard constraint
+        calendar = load_faculty_calendar(r, (c.faculty_name for c in needs), grid.keys(), exclude=[(dept, sem)])
+        timer.lap("faculty_index_load")
+
+    # Before the cache lookup: an outcome stored by a run without the
+    # precheck must not answer a run that asked for one
+    if precheck:
+        if errors := constraint_errors(needs):
+            raise ConstraintValidationError(errors, f"dept={dept}, sem={sem}")
+        feasibility = check_schedule_feasibility(layout, grid, needs, calendar)
+        timer.lap("feasibility")
+        if not feasibility.feasible:
+            raise InfeasibleScheduleError(feasibility, f"dept={dept}, sem={sem}")
+
+    digest = None
+    if use_cache:
+        options = {
+            "solver": solver,
+            "node_budget": node_budget,
+            "time_budget_ms": time_budget_ms,
+            "optimize_ms": optimize_ms,
+            "starts": starts,
+            "seed": seed,
+            "explain": explain,
+            "warm_start": prior,
+        }
+        digest = input_digest(layout, grid, needs, options, calendar.entries() if calendar else None)
+        cached = get_cached(r, digest)
+        timer.lap("cache_lookup")
+        if cached is not None:
+            outcome = ScheduleOutcome(**cached)
+            logger.info(f"Cache hit for dept={dept}, sem={sem}")
+            report("cached", outcome.placed, outcome.placed + len(outcome.unplaced))
+            result = _store_outcome(db, dept, sem, r, layout, outcome, user_id, persist_to_db, timer)
+            observe_generation(solver, time.perf_counter() - started, len(outcome.conflicts), 0, cached=True)
+            return _with_timings(result, timer, dept, sem)
+
+    payload = {
+        "layout": layout,
+        "grid": grid,
+        "needs": needs,
+        "solver": solver,
+        "node_budget": node_budget,
+        "time_budget_ms": time_budget_ms,
+        "optimize_ms": optimize_ms,
+        "faculty_calendar": calendar,
+        "reproducible": seed is not None,
+        "debug_timings": debug_timings,
+        "explain": explain,
+        "warm_start": prior,
+    }
+    if starts > 1:
+        # Unseeded, the first start is the deterministic default and the rest
+        # are randomized; the starts may run in other processes, so only the
+        # outcome is reported
+        report("multi-start", 0, 0)
+        if seed is None:
+            seeds, deadline = [None] + list(range(1, starts)), deadline_ms
+        else:
+            seeds, deadline = [seed + i for i in range(starts)], None
+        outcome, finished = run_multistart(
+            build_schedule, payload, seeds, _outcome_rank, workers=workers, deadline_ms=deadline
+        )
+        logger.info(
+            f"Multi-start: kept seed {outcome.seed} of {finished}/{starts} finished starts "
+            f"({len(outcome.unplaced)} unplaced, score {outcome.score})"
+        )
+        # The starts overlap, so only the wall time counts; the retries are the kept start's
+        timer.lap("multi_start")
+        if outcome.timings:
+            timer.retries.extend(outcome.timings["retries"])
+    else:
+        outcome = build_schedule(**payload, seed=seed, progress=progress, events=events)
+        timer.merge(outcome.timings)
+        timer.skip()
+
+    if digest:
+        put_cached(r, dept, sem, digest, {**vars(outcome), "grid": serialize_grid(outcome.grid), "timings": None})
+        timer.lap("cache_store")
+
+    report("storing", outcome.placed, outcome.placed + len(outcome.unplaced))
+    result = _store_outcome(db, dept, sem, r, layout, outcome, user_id, persist_to_db, timer)
+    observe_generation(solver, time.perf_counter() - started, len(outcome.conflicts), outcome.attempts - 1)
+    return _with_timings(result, timer, dept, sem)
+
+
+def _with_timings(result: Dict[str, Any], timer: PhaseTimer, dept, sem) -> Dict[str, Any]:
+    """Attach and log the timings of a generate_timetable() run, when they were asked for"""
+    if not timer.enabled:
+        return result
+    timings = timer.to_dict()
+    logger.info(f"Generation timings dept={dept}, sem={sem}: {json.dumps(timings)}", extra={"timings": timings})
+    return {**result, "timings": timings}
+
+
+def generate_joint_timetables(
+        db,
+        pairs: List[Tuple[str, int]],
+        user_id=None,
+        persist_to_db=False,
+        solver: str = "greedy",
+        node_budget: int = DEFAULT_NODE_BUDGET,
+        time_budget_ms: int = DEFAULT_TIME_BUDGET_MS,
+        optimize_ms: int = 0,
+        respect_faculty_index: bool = False,
+        precheck: bool = True
+) -> List[Dict[str, Any]]:
+    """
+        Schedule several (department, semester) pairs against one shared
+        faculty calendar, so nobody is booked in two grids at once.
+
+        Pairs are scheduled one after another, each seeing the faculty time
+        taken by the earlier ones; ``time_budget_ms`` and ``optimize_ms`` are
+        totals split evenly across the pairs. Returns one result per pair, in
+        the order given, shaped like generate_timetable()'s. With
+        ``respect_faculty_index`` the calendar starts with the faculty time
+        booked by timetables outside ``pairs``. With ``precheck`` every pair
+        is checked for feasibility before any is scheduled, and so are the
+        faculty members teaching in several of them, against all their
+        grids together.
+    """
+    if solver not in SOLVER_MODES:
+        raise ValueError(f"Unknown solver '{solver}', expected one of {', '.join(SOLVER_MODES)}")
+
+    pairs = list(dict.fromkeys(pairs))
+    if not pairs:
+        return []
+
+    r = get_redis()
+    inputs = [
+        (layout, _without_placements(layout, grid), needs)
+        for layout, grid, needs in (_load_schedule_inputs(db, dept, sem, r) for dept, sem in pairs)
+    ]
+
+    calendar = FacultyCalendar()
+    if respect_faculty_index:
+        load_faculty_calendar(
+            r,
+            (c.faculty_name for _, _, needs in inputs for c in needs),
+            dict.fromkeys(day for _, grid, _ in inputs for day in grid),
+            exclude=pairs,
+            calendar=calendar
+        )
+    if precheck:
+        loads = []
+        for (dept, sem), (layout, grid, needs) in zip(pairs, inputs):
+            if errors := constraint_errors(needs):
+                raise ConstraintValidationError(errors, f"dept={dept}, sem={sem}")
+            tasks, occupancy, lab_slot_len = _feasibility_inputs(layout, grid, needs, calendar)
+            feasibility = check_feasibility(tasks, occupancy, lab_slot_len)
+            if not feasibility.feasible:
+                raise InfeasibleScheduleError(feasibility, f"dept={dept}, sem={sem}")
+            loads.append(faculty_loads(tasks, occupancy, lab_slot_len))
+        # Each pair fits on its own; faculty shared between pairs must fit in all of them at once
+        feasibility = check_joint_faculty(loads)
+        if not feasibility.feasible:
+            where = "; ".join(f"dept={dept}, sem={sem}" for dept, sem in pairs)
+            raise InfeasibleScheduleError(feasibility, where)
+
+    results = []
+    for (dept, sem), (layout, grid, needs) in zip(pairs, inputs):
+        started = time.perf_counter()
+        outcome = build_schedule(
+            layout, grid, needs,
+            solver=solver,
+            node_budget=node_budget,
+            time_budget_ms=max(1, time_budget_ms // len(pairs)),
+            optimize_ms=optimize_ms // len(pairs),
+            faculty_calendar=calendar
+        )
+        result = _store_outcome(db, dept, sem, r, layout, outcome, user_id, persist_to_db)
+        observe_generation(solver, time.perf_counter() - started, len(outcome.conflicts), outcome.attempts - 1)
+        results.append({"department_name": dept, "semester_number": sem, **result})
+
+    logger.info(f"Joint scheduling: {len(pairs)} timetables, {len(calendar)} faculty members")
+    return results
+
+
+# Delta actions accepted by apply_assignment_delta()
+REPAIR_ACTIONS = ("add", "remove", "update")
+
+# Assignment fields a delta may set
+_ASSIGNMENT_FIELDS = ("theory", "practical", "number_of_sublabs", "division_names", "constraints")
+
+# Blocked options a changed assignment's task tries before it stays unplaced
+REPAIR_DISPLACEMENT_TRIES = 3
+
+
+def apply_assignment_delta(
+        rows: List[Dict[str, Any]], delta: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+        The faculty assignment rows (as stored under ``tt:{dept}:{sem}:faculty``)
+        with ``delta`` applied, the row it replaced or removed and the row it
+        added; None where there is none.
+
+        ``delta`` names an assignment by ``course_name`` and ``faculty_name``
+        and says what to do with it: ``action`` "add", "remove" or "update".
+        Added and updated rows take the delta's ``theory``, ``practical``,
+        ``number_of_sublabs``, ``division_names`` and ``constraints``, and an
+        update may hand the course to ``new_faculty_name``; fields left out
+        keep their stored values (for a new row: no theory or practical, no
+        constraints and the divisions of the other rows).
+    """
+    action = delta.get("action")
+    if action not in REPAIR_ACTIONS:
+        raise ValueError(f"Unknown action '{action}', expected one of {', '.join(REPAIR_ACTIONS)}")
+
+    def _find(course_name: str, faculty_name: str) -> Optional[int]:
+        course_name = course_name.strip().lower()
+        return next((
+            i for i, row in enumerate(rows)
+            if row.get("course_name", "").strip().lower() == course_name and row.get("faculty_name") == faculty_name
+        ), None)
+
+    course_name, faculty_name = delta["course_name"], delta["faculty_name"]
+    at = _find(course_name, faculty_name)
+    changes = {key: delta[key] for key in _ASSIGNMENT_FIELDS if delta.get(key) is not None}
+
+    if action == "add":
+        if at is not None:
+            raise ValueError(f"{faculty_name} is already assigned to {course_name}")
+        # Division settings are shared by a semester's assignments
+        template = rows[0] if rows else {}
+        new_row = {
+            "course_name": course_name,
+            "faculty_name": faculty_name,
+            "theory": False,
+            "practical": False,
+            "number_of_sublabs": template.get("number_of_sublabs", 0),
+            "division_names": template.get("division_names", []),
+            "constraints": [],
+            **changes,
+        }
+        return rows + [new_row], None, new_row
+
+    if at is None:
+        raise ValueError(f"{faculty_name} is not assigned to {course_name}")
+    old_row = rows[at]
+    if action == "remove":
+        return rows[:at] + rows[at + 1:], old_row, None
+
+    new_row = {**old_row, **changes}
+    if (new_faculty := delta.get("new_faculty_name")) and new_faculty != faculty_name:
+        if _find(course_name, new_faculty) is not None:
+            raise ValueError(f"{new_faculty} is already assigned to {course_name}")
+        new_row["faculty_name"] = new_faculty
+    return rows[:at] + [new_row] + rows[at + 1:], old_row, new_row
+
+
+def _assignment_key(item: Any) -> Tuple[str, str]:
+    """(normalized course name, faculty name) of a CourseNeed or an activity"""
+    if isinstance(item, CourseNeed):
+        return item.course_name.strip().lower(), item.faculty_name
+    return (item.get("course_name") or "").strip().lower(), item.get("faculty_name")
+
+
+def _assignment_keys(pairs: Iterable[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+    return {(course_name.strip().lower(), faculty_name) for course_name, faculty_name in pairs}
+
+
+def _stored_placements(grid: Dict, slot_model: SlotModel) -> List[Tuple[Any, str, int]]:
+    """
+        (activity, day, slot mask) of every activity in a grid read back from
+        JSON. The cells of a lab hold copies of one dict; they are replaced by
+        a single object (matched by id), as the allocator leaves them.
+    """
+    placements: Dict[Tuple[str, Any], List] = {}
+    for day, day_slots in grid.items():
+        for label, cells in day_slots.items():
+            slot = slot_model.index.get(label)
+            if slot is None or not cells:
+                continue
+            for i, activity in enumerate(cells):
+                if not is_activity(activity) or _is_break(activity):
+                    continue
+                key = (day, activity.get("id") or id(activity))
+                if (known := placements.get(key)) is not None:
+                    cells[i] = known[0]
+                    known[2] |= 1 << slot
+                else:
+                    placements[key] = [activity, day, 1 << slot]
+    return [tuple(p) for p in placements.values()]
+
+
+def _activity_cells(grid: Dict, wanted: Set[int]) -> Dict[int, Tuple[Any, str, List[str]]]:
+    """id() -> (activity, day, cells) for the activities of ``grid`` whose id() is in ``wanted``"""
+    found: Dict[int, Tuple[Any, str, List[str]]] = {}
+    for day, day_slots in grid.items():
+        for label, cells in day_slots.items():
+            for activity in cells or ():
+                if id(activity) in wanted:
+                    found.setdefault(id(activity), (activity, day, []))[2].append(label)
+    return found
+
+
+def _describe_placement(activity: Any, day: str, slot_mask: int, slot_model: SlotModel) -> Dict[str, Any]:
+    described = {
+        "course_name": activity.get("course_name"),
+        "faculty_name": activity.get("faculty_name"),
+        "type": activity.get("type"),
+        "day": day,
+        "slots": [label for s, label in enumerate(slot_model.labels) if slot_mask >> s & 1],
+    }
+    if activity.get("type") == LAB:
+        described["division"] = activity.get("division")
+    return described
+
+
+def _fits_need(task: Task, day: str, slot_mask: int, state: AllocationState,
+               occupancy: OccupancyEngine, window_ids: Dict[int, int]) -> bool:
+    """Whether a stored placement still counts towards ``task``'s need, given what ``state`` already counts"""
+    c = task.course
+    d = occupancy.day_index(day)
+    if task.type == LAB:
+        if not c.practical or task.division not in c.division_names:
+            return False
+        if (c.course_name, task.division) in state.subject_division_allocated:
+            return False
+        window = window_ids.get(slot_mask)
+        return window is not None and (not c.constraints or bool(c.compiled.lab_masks[d] >> window & 1))
+    if state.lecture_allocations[c.course_name] >= c.t_hours:
+        return False
+    return not c.constraints or bool(c.compiled.lecture_masks[d] & slot_mask)
+
+
+def _missing_tasks(needs: List[CourseNeed], state: AllocationState, lab_minutes: int, slot_duration: int) -> List[Task]:
+    """One task per placement ``needs`` call for that ``state`` does not count, constrained ones first"""
+    missing = []
+    lectures = defaultdict(int, state.lecture_allocations)
+    for task in _build_tasks(needs, lab_minutes, slot_duration):
+        c = task.course
+        if task.type == LAB:
+            # As in a full run, one lab block per course and division
+            if (c.course_name, task.division) not in state.subject_division_allocated:
+                missing.append(task)
+        else:
+            count = max(0, task.count - lectures[c.course_name])
+            lectures[c.course_name] += count
+            missing.extend([task] * count)
+    return [t for t in missing if t.course.constraints] + [t for t in missing if not t.course.constraints]
+
+
+def _place_by_displacing(
+        task: Task, state: AllocationState, grid: Dict, occupancy: OccupancyEngine, lab_slot_len: int,
+        score_table: LectureScoreTable
+) -> Optional[List[Tuple[Any, str, int]]]:
+    """
+        Place a pending ``task`` that found no free slot by moving the
+        placements in the way of one of its slots (fewest and lowest credits
+        first) elsewhere. A move is kept only when the task and every moved
+        placement find room; otherwise the grid is put back as it was.
+        Returns the moved placements' old (activity, day, slot mask), or None.
+    """
+    options = [
+        activities for activities in displacements(task, grid, occupancy, lab_slot_len)
+        if all(id(a) in state.placed and not a.get("protected", False) for a in activities)
+    ]
+    options.sort(key=lambda activities: (len(activities), sum(a.get("credits", 0) or 0 for a in activities)))
+
+    for activities in options[:REPAIR_DISPLACEMENT_TRIES]:
+        pending = list(state.pending)
+        last_course_per_day = {day: dict(courses) for day, courses in state.last_course_per_day.items()}
+        placed_before = set(state.placed)
+
+        # Only the task and the tasks of the moved placements are allocated
+        state.pending = []
+        moved = []
+        for activity, day, cells in _activity_cells(grid, {id(a) for a in activities}).values():
+            moved.append((activity, day, cells, state.placed[id(activity)]))
+            state.evict(activity, day, _unplace_activity(grid, occupancy, day, activity, cells))
+        state.pending.insert(0, task)
+        _allocate_tasks(state, grid, occupancy, lab_slot_len, 1, score_table)
+        if not state.pending:
+            pending.remove(task)
+            state.pending = pending
+            return [(activity, day, occupancy.slot_mask(cells)) for activity, day, cells, _ in moved]
+
+        # Undo: take out what this attempt placed and put the moved placements back
+        new_ids = set(state.placed) - placed_before
+        for activity, day, cells in _activity_cells(grid, new_ids).values():
+            state.evict(activity, day, _unplace_activity(grid, occupancy, day, activity, cells))
+        for activity, day, cells, moved_task in moved:
+            state.record(activity, moved_task, day, _restore_activity(grid, occupancy, day, activity, cells))
+        state.pending = pending
+        state.last_course_per_day = defaultdict(dict, last_course_per_day)
+    return None
+
+
+def repair_schedule(
+        layout: Dict,
+        grid: Dict,
+        needs: List[CourseNeed],
+        changed: Iterable[Tuple[str, str]],
+        busy_faculty: Optional[Dict[str, Dict[str, List[str]]]] = None,
+        busy_divisions: Optional[Dict[str, Dict[str, List[str]]]] = None,
+        faculty_calendar: Optional[FacultyCalendar] = None,
+        debug_timings: bool = False
+) -> Tuple[ScheduleOutcome, Dict[str, List[Dict[str, Any]]]]:
+    """
+        Patch a finished ``grid`` after the assignments in ``changed``
+        ((course name, faculty name) pairs, as before and after the change;
+        course names compare like in the stored assignments) were added,
+        removed or edited, entirely in memory.
+
+        Placements of the changed assignments that ``needs`` no longer call
+        for, or that break their new constraints, are taken out; everything
+        else stays where it is. The changed assignments' missing placements
+        are made next, and one that finds no free slot may move the
+        placements in its way (its direct conflicts) if they all find room
+        again, see _place_by_displacing(). Other courses' missing placements
+        then get the room left. Allocation work grows with the placements
+        touched, not with the timetable.
+
+        ``busy_faculty`` and ``busy_divisions`` are the busy maps stored with
+        ``grid``; without them they are rebuilt from its activities. Returns
+        the outcome and the placements ``removed`` and ``placed`` (a moved
+        placement is in both).
+    """
+    timer = phase_timer(debug_timings)
+    # Stored activities move between cells but are never edited, copying the cells is enough
+    grid = {
+        day: {label: list(cells) if isinstance(cells, list) else cells for label, cells in day_slots.items()}
+        for day, day_slots in grid.items()
+    }
+    slot_model = compile_slot_model(layout)
+    slot_duration = int(layout.get("slot_duration", 55))
+    lab_minutes = int(layout.get("lab_minutes", 110))
+    lab_slot_len = _lab_slot_len(layout)
+    occupancy = _occupancy_for_grid(grid, slot_model, faculty_calendar)
+    compile_needs(needs, occupancy.days, slot_model, lab_slot_len)
+    placements = _stored_placements(grid, slot_model)
+
+    if busy_faculty is None or busy_divisions is None:
+        for activity, day, slot_mask in placements:
+            is_lab = activity.get("type") == LAB
+            occupancy.occupy(day, slot_mask, faculty=activity.get("faculty_name"),
+                             division=activity.get("division") if is_lab else "ALL")
+    else:
+        for busy_map, kind in ((busy_faculty, "faculty"), (busy_divisions, "division")):
+            for day, day_slots in busy_map.items():
+                if not occupancy.has_day(day):
+                    continue
+                for label, names in day_slots.items():
+                    if label in slot_model.index:
+                        for name in names:
+                            occupancy.occupy(day, 1 << slot_model.index[label], **{kind: name})
+    timer.lap("grid_setup")
+
+    # Count what stays; placements of courses without a need are left alone and never moved
+    changed = _assignment_keys(changed)
+    by_key = {(c.course_name, c.faculty_name): c for c in needs}
+    tasks: Dict[Tuple[str, str, str, str], Task] = {}
+    state = AllocationState(pending=[])
+    window_ids = {window.mask: k for k, window in enumerate(slot_model.windows(lab_slot_len))}
+    removed = []
+
+    def _task_for(activity: Any) -> Optional[Task]:
+        c = by_key.get((activity.get("course_name"), activity.get("faculty_name")))
+        if c is None:
+            return None
+        is_lab = activity.get("type") == LAB
+        division = activity.get("division") if is_lab else "ALL"
+        key = (c.course_name, c.faculty_name, activity.get("type"), division)
+        if key not in tasks:
+            tasks[key] = Task(c, LAB, block_len=lab_slot_len, division=division) if is_lab else Task(c, LECTURE)
+        return tasks[key]
+
+    revisit = []
+    for activity, day, slot_mask in placements:
+        if _assignment_key(activity) in changed:
+            revisit.append((activity, day, slot_mask))
+        elif task := _task_for(activity):
+            state.record(activity, task, day, slot_mask)
+    for activity, day, slot_mask in revisit:
+        task = _task_for(activity)
+        if task is not None and _fits_need(task, day, slot_mask, state, occupancy, window_ids):
+            state.record(activity, task, day, slot_mask)
+            continue
+        labels = [label for s, label in enumerate(slot_model.labels) if slot_mask >> s & 1]
+        _unplace_activity(grid, occupancy, day, activity, labels)
+        removed.append(_describe_placement(activity, day, slot_mask, slot_model))
+    timer.lap("unplace")
+
+    score_table = LectureScoreTable(
+        occupancy.days, slot_model, HIGH_CREDIT_DAY_RANK, LOW_CREDIT_DAY_RANK, LECTURE_TIME_RANK
+    )
+    changed_needs = [c for c in needs if _assignment_key(c) in changed]
+    state.pending = _missing_tasks(changed_needs, state, lab_minutes, slot_duration)
+    _allocate_tasks(state, grid, occupancy, lab_slot_len, 1, score_table)
+    timer.lap("allocate")
+
+    for task in list(dict.fromkeys(state.pending)):
+        while task in state.pending:
+            moved = _place_by_displacing(task, state, grid, occupancy, lab_slot_len, score_table)
+            if moved is None:
+                break
+            removed.extend(_describe_placement(activity, day, mask, slot_model) for activity, day, mask in moved)
+    timer.lap("displace")
+
+    # Room freed by the change goes to other courses' missing placements
+    other_needs = [c for c in needs if _assignment_key(c) not in changed]
+    unplaced_changed, state.pending = state.pending, _missing_tasks(other_needs, state, lab_minutes, slot_duration)
+    if state.pending:
+        _allocate_tasks(state, grid, occupancy, lab_slot_len, 1, score_table)
+    state.pending = unplaced_changed + state.pending
+    timer.lap("fill")
+
+    new_activities = _activity_cells(grid, {
+        id(activity) for day_slots in grid.values() for cells in day_slots.values() for activity in cells or ()
+        if isinstance(activity, Activity)
+    })
+    placed = [
+        _describe_placement(activity, day, occupancy.slot_mask(cells), slot_model)
+        for activity, day, cells in new_activities.values()
+    ]
+    unplaced = [_describe_task(task) for task in state.pending]
+    conflicts = list(dict.fromkeys(
+        f"Could not place {t['course_name']} ({t['type']}) for {t['faculty_name']}" for t in unplaced
+    ))
+    score = score_schedule(grid, slot_model, score_table)
+
+    for day in grid:
+        for slot in list(grid[day].keys()):
+            if not grid[day][slot]:
+                grid[day][slot] = None
+
+    busy_faculty, busy_divisions = occupancy.to_busy_maps()
+    simplified_grid = simplify_grid(grid, slot_model, lab_slot_len,
+                                    {day: occupancy.lab_mask(day) for day in occupancy.days})
+    timer.lap("finish")
+    logger.info(f"Repair removed {len(removed)} and placed {len(placed)} placements, {len(unplaced)} unplaced")
+
+    outcome = ScheduleOutcome(
+        grid=grid,
+        simplified_grid=simplified_grid,
+        conflicts=conflicts,
+        attempts=1,
+        unplaced=unplaced,
+        busy_faculty=busy_faculty,
+        busy_divisions=busy_divisions,
+        score=score,
+        placed=len(state.placed),
+        timings=timer.to_dict(),
+    )
+    return outcome, {"removed": removed, "placed": placed}
+
+
+def repair_timetable(
+        db,
+        dept,
+        sem,
+        delta: Dict[str, Any],
+        user_id=None,
+        persist_to_db=False,
+        respect_faculty_index: bool = False,
+        precheck: bool = True,
+        debug_timings: bool = False
+) -> Dict[str, Any]:
+    """
+        Apply one faculty assignment ``delta`` (see apply_assignment_delta())
+        to a department/semester with a generated timetable and repair the
+        stored timetable (see repair_schedule()) instead of generating it
+        again. The changed assignments are stored along with the timetable.
+
+        With ``precheck`` invalid constraints in the changed assignment raise
+        ConstraintValidationError before anything is stored. The result is
+        shaped like generate_timetable()'s, with the ``removed`` and
+        ``placed`` placements added.
+    """
+    started = time.perf_counter()
+    timer = phase_timer(debug_timings)
+    r = get_redis()
+    busy_faculty = r.get(f"tt:{dept}:{sem}:busy_faculty")
+    busy_divisions = r.get(f"tt:{dept}:{sem}:busy_divisions")
+    if busy_faculty is None:
+        raise ValueError(f"No timetable has been generated for dept={dept}, sem={sem}")
+
+    rows, old_row, new_row = apply_assignment_delta(_faculty_rows(r, dept, sem), delta)
+    layout, grid, needs = _load_schedule_inputs(db, dept, sem, r, timer, fac_rows=rows)
+    changed = [(row["course_name"], row["faculty_name"]) for row in (old_row, new_row) if row]
+    keys = _assignment_keys(changed)
+    if precheck and (errors := constraint_errors(c for c in needs if _assignment_key(c) in keys)):
+        raise ConstraintValidationError(errors, f"dept={dept}, sem={sem}")
+
+    calendar = None
+    if respect_faculty_index:
+        calendar = load_faculty_calendar(r, (c.faculty_name for c in needs), grid.keys(), exclude=[(dept, sem)])
+        timer.lap("faculty_index_load")
+
+    outcome, changes = repair_schedule(
+        layout, grid, needs, changed,
+        busy_faculty=json.loads(busy_faculty),
+        busy_divisions=json.loads(busy_divisions) if busy_divisions else None,
+        faculty_calendar=calendar,
+        debug_timings=debug_timings
+    )
+    timer.merge(outcome.timings)
+    timer.skip()
+
+    result = _store_outcome(db, dept, sem, r, layout, outcome, user_id, persist_to_db, timer)
+    r.set(f"tt:{dept}:{sem}:faculty", json.dumps(rows))
+    if old_row and (not new_row or new_row["faculty_name"] != old_row["faculty_name"]):
+        r.delete(generate_redis_key(old_row["faculty_name"], old_row["course_name"]))
+    if new_row:
+        store_assignment_constraints(
+            generate_redis_key(new_row["faculty_name"], new_row["course_name"]),
+            {key: new_row.get(key) for key in _ASSIGNMENT_FIELDS}
+        )
+    invalidate_cache(r, dept, sem)
+    timer.lap("assignment_store")
+
+    observe_generation("repair", time.perf_counter() - started, len(outcome.conflicts), 0)
+    return _with_timings({**result, **changes}, timer, dept, sem)
+
+
+def _read_stored_grid(r, dept, sem) -> Tuple[Dict, Dict]:
+    """The stored layout and grid of a department/semester that has a generated timetable"""
+    try:
+        stored = json.loads(r.get(f"tt:{dept}:{sem}:layout") or "{}")
+    except json.JSONDecodeError:
+        raise ValueError("Invalid JSON in timetable layout")
+    layout, grid = stored.get("layout", {}), stored.get("grid", {})
+    if "time_slots" not in layout:
+        raise ValueError(f"No timetable layout for dept={dept}, sem={sem}")
+    return layout, grid
+
+
+def pin_activities(
+        dept,
+        sem,
+        day: str,
+        time_label: str,
+        course_name: str,
+        faculty_name: Optional[str] = None,
+        division: Optional[str] = None,
+        pinned: bool = True
+) -> List[Dict[str, Any]]:
+    """
+        Pin (or with ``pinned=False`` unpin) the activities of ``course_name``
+        at ``day`` and ``time_label`` in the stored grid, narrowed down by
+        ``faculty_name`` and ``division`` when given. ``time_label`` is a
+        slot label, or a lab window label as the simplified grid shows it;
+        course names compare like in the stored assignments.
+
+        Pinned activities are marked ``protected``: generate_timetable()
+        keeps them where they are, counts them towards their course's needs
+        and schedules the rest around them, and neither retries nor repair
+        displacements move them. Returns the placements matched; raises LookupError when
+        there are none.
+    """
+    r = get_redis()
+    layout, grid = _read_stored_grid(r, dept, sem)
+    slot_model = compile_slot_model(layout)
+    if day not in grid:
+        raise ValueError(f"Unknown day '{day}' for dept={dept}, sem={sem}")
+    if time_label in slot_model.index:
+        mask = 1 << slot_model.index[time_label]
+    elif window := next((w for w in slot_model.windows(_lab_slot_len(layout)) if w.label == time_label), None):
+        mask = window.mask
+    else:
+        raise ValueError(f"Unknown time '{time_label}' for dept={dept}, sem={sem}")
+
+    wanted = course_name.strip().lower()
+    matched = []
+    for activity, activity_day, slot_mask in _stored_placements(grid, slot_model):
+        if (activity_day != day or not slot_mask & mask or _assignment_key(activity)[0] != wanted or
+                faculty_name and activity.get("faculty_name") != faculty_name or
+                division and activity.get("division") != division):
+            continue
+        if pinned:
+            activity["protected"] = True
+        else:
+            activity.pop("protected", None)
+        matched.append(_describe_placement(activity, day, slot_mask, slot_model))
+
+    if not matched:
+        raise LookupError(f"No activity of {course_name} on {day} at {time_label} for dept={dept}, sem={sem}")
+    r.set(f"tt:{dept}:{sem}:layout", json.dumps({"layout": layout, "grid": grid}, ensure_ascii=False))
+    logger.info(f"{'Pinned' if pinned else 'Unpinned'} {len(matched)} activities for dept={dept}, sem={sem}")
+    return matched
+
+
+def pinned_activities(dept, sem) -> List[Dict[str, Any]]:
+    """The pinned placements of a department/semester's stored grid, see pin_activities()"""
+    layout, grid = _read_stored_grid(get_redis(), dept, sem)
+    slot_model = compile_slot_model(layout)
+    return [
+        _describe_placement(activity, day, slot_mask, slot_model)
+        for activity, day, slot_mask in _stored_placements(grid, slot_model) if activity.get("protected", False)
+    ]
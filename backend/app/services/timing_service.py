@@ -0,0 +1,79 @@
+import time
+from typing import Any, Dict, List, Optional
+
+
+class PhaseTimer:
+    """
+        Wall-clock milliseconds per named phase, plus one record per greedy
+        retry.
+
+        Phases are laps: ``lap(name)`` charges the time since the previous
+        lap to ``name`` (a name lapped several times accumulates) and returns
+        it. Picklable, so a worker process can send its timings back with its
+        outcome.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.retries: List[Dict[str, Any]] = []
+        self._started = self._mark = time.perf_counter()
+
+    def lap(self, name: str) -> float:
+        now = time.perf_counter()
+        ms = (now - self._mark) * 1000
+        self._mark = now
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+        return ms
+
+    def skip(self):
+        """Restart the lap clock without charging the time to any phase"""
+        self._mark = time.perf_counter()
+
+    def retry(self, **record: Any):
+        self.retries.append(record)
+
+    def merge(self, timings: Optional[Dict[str, Any]]):
+        """Fold in another timer's to_dict(), e.g. from build_schedule()"""
+        if not timings:
+            return
+        for name, ms in timings["phases"].items():
+            self.phases[name] = self.phases.get(name, 0.0) + ms
+        self.retries.extend(timings["retries"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "phases": {name: round(ms, 3) for name, ms in self.phases.items()},
+            "retries": self.retries,
+        }
+
+
+class _NullTimer(PhaseTimer):
+    """Stands in when timings are off; every call is a no-op"""
+    enabled = False
+
+    def __init__(self):
+        pass
+
+    def lap(self, name: str) -> float:
+        return 0.0
+
+    def skip(self):
+        pass
+
+    def retry(self, **record: Any):
+        pass
+
+    def merge(self, timings: Optional[Dict[str, Any]]):
+        pass
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return None
+
+
+NULL_TIMER = _NullTimer()
+
+
+def phase_timer(enabled: bool) -> PhaseTimer:
+    return PhaseTimer() if enabled else NULL_TIMER
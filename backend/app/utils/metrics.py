@@ -0,0 +1,135 @@
+"""
+    Prometheus metrics, exposed by GET /metrics in app.main.
+
+    Collectors live in the default registry of this process. Each observation
+    is a lock and a few additions, so instrumenting the hot paths (every Redis
+    round trip and SQL statement) costs microseconds. With several server
+    processes each one serves its own numbers.
+"""
+import time
+
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+
+# Redis and SQL round trips are mostly sub-millisecond
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+GENERATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+CONFLICT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response starts, per router",
+    ["router", "method", "status"],
+)
+GENERATION_SECONDS = Histogram(
+    "timetable_generation_duration_seconds",
+    "Wall time of one timetable generation",
+    ["solver", "cached"],
+    buckets=GENERATION_BUCKETS,
+)
+GENERATION_CONFLICTS = Histogram(
+    "timetable_generation_conflicts",
+    "Conflicts left in a generated timetable",
+    ["solver"],
+    buckets=CONFLICT_BUCKETS,
+)
+GENERATION_RETRIES = Counter(
+    "timetable_generation_retries_total",
+    "Greedy retries used by timetable generations",
+    ["solver"],
+)
+REDIS_SECONDS = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round-trip latency; a pipeline is one round trip",
+    ["command"],
+    buckets=FAST_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement latency",
+    ["statement"],
+    buckets=FAST_BUCKETS,
+)
+UPLOAD_PARSE_SECONDS = Histogram(
+    "excel_upload_parse_duration_seconds",
+    "Time to parse an uploaded course spreadsheet",
+)
+
+
+def observe_generation(solver: str, seconds: float, conflicts: int, retries: int, cached: bool = False):
+    GENERATION_SECONDS.labels(solver, "true" if cached else "false").observe(seconds)
+    GENERATION_CONFLICTS.labels(solver).observe(conflicts)
+    if retries:
+        GENERATION_RETRIES.labels(solver).inc(retries)
+
+
+def observe_redis(command: str, seconds: float):
+    # Histogram children are cached per label values, the lookup is a dict hit
+    REDIS_SECONDS.labels(command).observe(seconds)
+
+
+def instrument_engine(engine):
+    """Time every SQL statement run through ``engine``, labelled by its verb (SELECT, INSERT, ...)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _started(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finished(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.labels(verb).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        # after_cursor_execute does not run for a failed statement
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+
+class MetricsMiddleware:
+    """
+        ASGI middleware timing each HTTP request up to its response start,
+        labelled by the prefix of the router that served it. A streamed
+        response (e.g. server-sent events) counts until its headers are sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status, started
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                HTTP_REQUEST_SECONDS.labels(_router_label(scope), scope["method"], status).observe(
+                    time.perf_counter() - started
+                )
+                started = None
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if started is not None:
+                # Failed before sending anything
+                HTTP_REQUEST_SECONDS.labels(_router_label(scope), scope["method"], status).observe(
+                    time.perf_counter() - started
+                )
+
+
+def _router_label(scope) -> str:
+    """The first segment of the matched route's path, e.g. "/timetables"; unmatched paths share one label"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return "unmatched"
+    return "/" + path.strip("/").split("/", 1)[0]
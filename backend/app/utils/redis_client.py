@@ -3,8 +3,35 @@ import os
 #from app.config import settings
 from typing import Dict, Any, Optional
 import json
+import time
 
-redis_client = redis.Redis(
+from app.utils.metrics import observe_redis
+
+
+class _InstrumentedPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            observe_redis("PIPELINE", time.perf_counter() - started)
+
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client recording each round trip's latency, labelled by command"""
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            observe_redis(str(args[0]).upper(), time.perf_counter() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+redis_client = InstrumentedRedis(
     host=os.getenv("REDIS_HOST", "localhost"),
     port=int(os.getenv("REDIS_PORT", 6379)),
     password=os.getenv("REDIS_PASSWORD", None),
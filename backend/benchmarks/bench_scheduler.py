@@ -0,0 +1,259 @@
+"""
+    Scheduler benchmark on synthetic institutions.
+
+    Builds a parametric institution (department/semester pairs, courses per
+    pair, a shared faculty pool, divisions per pair, constraint density),
+    stores its courses in an in-memory SQLite database and its layouts and
+    faculty assignments in an in-memory Redis stand-in, then loads every
+    pair through the same path as generate_timetable() and schedules them
+    against one shared faculty calendar with build_schedule().
+
+    Usage (from backend/):
+        python -m benchmarks.bench_scheduler
+        python -m benchmarks.bench_scheduler --sizes small,large --solver backtracking --output bench.json
+        python -m benchmarks.bench_scheduler --pairs 6 --courses 9 --faculty 40 --divisions 3 --density 0.2
+
+    Runs are seeded and reproducible (budgets count work, not time), so the
+    quality figures only change when the scheduler does. Prints one JSON
+    document (also written to --output): run metadata and one record per
+    size with wall time, peak memory, conflicts, retries, unplaced tasks
+    and soft score.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# app.database builds its engine on import
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Course, Department, Semester
+from app.services.layout_service import compile_slot_model, generate_timetable_layout
+from app.services.occupancy_service import FacultyCalendar
+from app.services.timetable_service import ScheduleOutcome, _load_schedule_inputs, build_schedule
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+
+@dataclass
+class InstitutionSize:
+    pairs: int
+    courses: int
+    faculty: int
+    divisions: int
+    density: float
+
+
+SIZES: Dict[str, InstitutionSize] = {
+    "small": InstitutionSize(pairs=2, courses=6, faculty=10, divisions=2, density=0.1),
+    "medium": InstitutionSize(pairs=8, courses=8, faculty=40, divisions=2, density=0.2),
+    "large": InstitutionSize(pairs=24, courses=8, faculty=90, divisions=3, density=0.2),
+    "xlarge": InstitutionSize(pairs=48, courses=9, faculty=160, divisions=4, density=0.3),
+}
+
+
+class MemoryRedis:
+    """The slice of the Redis client the schedule loaders use, kept in a dict"""
+
+    def __init__(self):
+        self._data: Dict[str, str] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        return self._data.get(key)
+
+    def set(self, key: str, value: str, ex: Optional[int] = None):
+        self._data[key] = value
+
+
+def _layout(rng: random.Random) -> Dict[str, Any]:
+    return generate_timetable_layout(
+        start_time_str=rng.choice(["07:30", "08:00"]),
+        end_time_str="13:40",
+        breaks=[{"start": "09:20", "end": "09:50", "name": "Recess"}],
+        lecture_duration_minutes=55,
+        lab_duration_minutes=110,
+        working_days=DAYS,
+    )
+
+
+def _constraint(rng: random.Random, layout: Dict[str, Any], practical: bool) -> Dict[str, str]:
+    slot_model = compile_slot_model(layout["layout"])
+    if practical and rng.random() < 0.5:
+        window = rng.choice(slot_model.windows(2))
+        return {"day": rng.choice(DAYS), "time": window.label, "type": "lab"}
+    slot = rng.choice([i for i in range(slot_model.size) if not slot_model.is_break[i]])
+    return {"day": rng.choice(DAYS), "time": slot_model.labels[slot], "type": "lecture"}
+
+
+def build_institution(size: InstitutionSize, seed: int, db, r: MemoryRedis) -> List[Tuple[str, int]]:
+    """Store a synthetic institution: courses in ``db``, layouts and assignments in ``r``"""
+    rng = random.Random(seed)
+    faculty = [f"Faculty {i}" for i in range(size.faculty)]
+    divisions = [chr(ord("A") + i) for i in range(size.divisions)]
+    pairs = []
+
+    for p in range(size.pairs):
+        dept, sem = f"DEPT{p // 8}", p % 8 + 1
+        if sem == 1:
+            db.add(Department(name=dept))
+        db.add(Semester(department_name=dept, semester_number=sem))
+
+        layout = _layout(rng)
+        rows = []
+        for i in range(size.courses):
+            name = f"{dept} S{sem} Course {i}"
+            practical_hours = rng.choice([0, 0, 2])
+            db.add(Course(
+                department_name=dept, semester_number=sem, course_code=f"{dept}-{sem}-{i}",
+                course_name=name, t_hrs=rng.choice([2, 3, 3, 4]), tu_hrs=0, p_hrs=practical_hours,
+                credits=rng.choice([1, 2, 3, 4]),
+            ))
+            constrained = rng.random() < size.density
+            rows.append({
+                "course_name": name,
+                "faculty_name": rng.choice(faculty),
+                "theory": True,
+                "practical": practical_hours > 0,
+                "number_of_sublabs": len(divisions),
+                "division_names": divisions,
+                "constraints": [_constraint(rng, layout, practical_hours > 0)] if constrained else [],
+            })
+
+        r.set(f"tt:{dept}:{sem}:layout", json.dumps(layout))
+        r.set(f"tt:{dept}:{sem}:faculty", json.dumps(rows))
+        pairs.append((dept, sem))
+
+    db.commit()
+    return pairs
+
+
+def _run_once(inputs, solver: str, optimize_ms: int, seed: int) -> List[ScheduleOutcome]:
+    calendar = FacultyCalendar()
+    return [
+        build_schedule(layout, grid, needs, solver=solver, optimize_ms=optimize_ms, seed=seed,
+                       faculty_calendar=calendar, reproducible=True)
+        for layout, grid, needs in inputs
+    ]
+
+
+def bench_size(name: str, size: InstitutionSize, solver: str, optimize_ms: int,
+               repeat: int, seed: int) -> Dict[str, Any]:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Department.__table__, Semester.__table__, Course.__table__])
+    db = sessionmaker(bind=engine)()
+    r = MemoryRedis()
+    try:
+        pairs = build_institution(size, seed, db, r)
+        started = time.perf_counter()
+        inputs = [_load_schedule_inputs(db, dept, sem, r) for dept, sem in pairs]
+        load_ms = (time.perf_counter() - started) * 1000
+    finally:
+        db.close()
+
+    wall_ms = []
+    outcomes: List[ScheduleOutcome] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        outcomes = _run_once(inputs, solver, optimize_ms, seed)
+        wall_ms.append((time.perf_counter() - started) * 1000)
+
+    # A separate traced run, tracemalloc slows the timed ones down
+    tracemalloc.start()
+    _run_once(inputs, solver, optimize_ms, seed)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tasks = sum(o.placed + len(o.unplaced) for o in outcomes)
+    return {
+        "size": name,
+        **asdict(size),
+        "solver": solver,
+        "optimize_ms": optimize_ms,
+        "seed": seed,
+        "repeat": repeat,
+        "tasks": tasks,
+        "load_ms": round(load_ms, 2),
+        "wall_ms_min": round(min(wall_ms), 2),
+        "wall_ms_median": round(statistics.median(wall_ms), 2),
+        "peak_memory_kb": round(peak / 1024, 1),
+        "placed": sum(o.placed for o in outcomes),
+        "unplaced": sum(len(o.unplaced) for o in outcomes),
+        "conflicts": sum(len(o.conflicts) for o in outcomes),
+        "retries": sum(o.attempts - 1 for o in outcomes),
+        "score": sum(o.score for o in outcomes),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Benchmark the scheduler on synthetic institutions")
+    parser.add_argument("--sizes", default="small,medium,large", help=f"Comma-separated presets: {', '.join(SIZES)}")
+    parser.add_argument("--pairs", type=int, help="Custom size: department/semester pairs")
+    parser.add_argument("--courses", type=int, help="Custom size: courses per pair")
+    parser.add_argument("--faculty", type=int, help="Custom size: faculty members shared by all pairs")
+    parser.add_argument("--divisions", type=int, help="Custom size: lab divisions per pair")
+    parser.add_argument("--density", type=float, help="Custom size: share of assignments with a constraint")
+    parser.add_argument("--solver", choices=["greedy", "backtracking"], default="greedy")
+    parser.add_argument("--optimize-ms", type=int, default=0,
+                        help="Local search budget per pair, counted in iterations (OPTIMIZE_ITERATIONS_PER_MS)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size; the min and median are reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    custom = [args.pairs, args.courses, args.faculty, args.divisions, args.density]
+    if any(v is not None for v in custom):
+        if any(v is None for v in custom):
+            parser.error("a custom size needs --pairs, --courses, --faculty, --divisions and --density")
+        sizes = {"custom": InstitutionSize(*custom)}
+    else:
+        unknown = [s for s in args.sizes.split(",") if s not in SIZES]
+        if unknown:
+            parser.error(f"unknown sizes: {', '.join(unknown)}")
+        sizes = {s: SIZES[s] for s in args.sizes.split(",")}
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": [
+            bench_size(name, size, args.solver, args.optimize_ms, max(1, args.repeat), args.seed)
+            for name, size in sizes.items()
+        ],
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return report
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.CRITICAL)
+    main(sys.argv[1:])
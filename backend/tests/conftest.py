@@ -0,0 +1,93 @@
+import json
+import os
+import random
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services import layout_service, timetable_service  # noqa: E402
+from app.services.timetable_service import CourseNeed  # noqa: E402
+
+BREAKS = [{"start": "09:20", "end": "09:50", "name": "Recess"}, {"start": "11:40", "end": "11:50", "name": "Short"}]
+LECTURE_TIMES = ["07:30-08:25", "08:25-09:20", "09:50-10:45", "10:45-11:40", "11:50-12:45", "12:45-13:40"]
+LAB_TIMES = ["07:30-09:20", "09:50-11:40", "11:50-13:40"]
+
+
+def make_layout(start: str = "07:30", end: str = "13:40"):
+    """A Monday-Saturday layout with a recess and a short break, as the schedule form stores it"""
+    return layout_service.generate_timetable_layout(start, end, BREAKS, 55, 110)
+
+
+def make_needs(seed: int, courses: int = 8, faculty: int = 5, divisions=("A", "B"), constrained: float = 0.0,
+               prefix: str = "Course"):
+    """Random course needs: lectures and labs for ``divisions``, some with day/time constraints"""
+    rnd = random.Random(seed)
+    needs = []
+    for i in range(courses):
+        t_hours, p_hours = rnd.choice([2, 3, 3, 4]), rnd.choice([0, 2, 2])
+        constraints = []
+        if rnd.random() < constrained:
+            day = rnd.choice(["Monday", "Tuesday", "Wednesday", "Friday"])
+            constraints.append({"day": day, "time": rnd.choice(LECTURE_TIMES), "type": "lecture"})
+            if p_hours and rnd.random() < 0.5:
+                constraints.append({"day": day, "time": rnd.choice(LAB_TIMES), "type": "lab"})
+        needs.append(CourseNeed(
+            course_name=f"{prefix}{i}", course_code=f"{prefix[:2].upper()}{i}", credits=rnd.choice([1, 2, 3, 4]),
+            faculty_name=f"Prof{rnd.randrange(faculty)}", theory=True, practical=p_hours > 0,
+            t_hours=t_hours, tu_hours=0, p_hours=p_hours, num_sublabs=len(divisions) if p_hours else 0,
+            division_names=list(divisions) if p_hours else [], constraints=constraints
+        ))
+    return needs
+
+
+def activities(grid):
+    """(day, slot, course, type, division, faculty) of every activity in a build_schedule() grid"""
+    return sorted(
+        (day, label, a.get("course_name"), a.get("type"), a.get("division"), a.get("faculty_name"))
+        for day, day_slots in grid.items() for label, cells in day_slots.items()
+        for a in (cells if isinstance(cells, list) else [cells] if cells else [])
+        if isinstance(a, dict) and a.get("type") in ("lecture", "lab")
+    )
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    """A fakeredis client standing in for the app's Redis"""
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.utils import redis_client
+
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client, "redis_client", r)
+    return r
+
+
+@pytest.fixture
+def store_timetable(redis_store, monkeypatch):
+    """
+        Store a department/semester's layout and faculty assignments in Redis
+        and its course rows behind the course CRUD, as the upload forms do.
+    """
+    courses_by = {}
+    monkeypatch.setattr(
+        timetable_service.crud_courses, "get_courses_for_department_semester",
+        lambda db, dept, sem: courses_by.get((dept, sem), [])
+    )
+
+    def _store(dept, sem, needs, layout=None):
+        redis_store.set(f"tt:{dept}:{sem}:layout", json.dumps(layout or make_layout()))
+        redis_store.set(f"tt:{dept}:{sem}:faculty", json.dumps([
+            {"course_name": c.course_name, "faculty_name": c.faculty_name, "theory": c.theory,
+             "practical": c.practical, "number_of_sublabs": c.num_sublabs, "division_names": c.division_names,
+             "constraints": c.constraints}
+            for c in needs
+        ]))
+        courses_by[(dept, sem)] = [
+            SimpleNamespace(course_name=c.course_name, course_code=c.course_code, credits=c.credits,
+                            t_hrs=c.t_hours, tu_hrs=c.tu_hours, p_hrs=c.p_hours)
+            for c in needs
+        ]
+        return dept, sem
+
+    return _store
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.crud import timetables as crud_timetables
+from app.routers import timetables as timetables_router
+from app.services import availability_service as availability
+from app.services.layout_service import compile_slot_model
+from conftest import make_layout
+
+MONDAY_0730 = {"Monday": {"07:30-08:25": ["Prof0"]}}
+MONDAY_0825 = {"Monday": {"08:25-09:20": ["Prof0"]}}
+MINUTES_0730, MINUTES_0825 = (450, 505), (505, 560)
+
+
+@pytest.fixture
+def slot_model():
+    return compile_slot_model(make_layout()["layout"])
+
+
+def _aggregates_match(r):
+    for key in r.scan_iter("faculty_busy:*"):
+        fields = r.hgetall(key)
+        assert int(fields.pop(availability.ALL_OWNERS), 16) == availability._owner_masks(fields)
+
+
+def test_index_keeps_aggregate_of_owners(redis_store, slot_model):
+    availability.publish_faculty_busy(redis_store, "CS", 1, MONDAY_0730, slot_model)
+    availability.publish_faculty_busy(redis_store, "EE", 1, MONDAY_0825, slot_model)
+    _aggregates_match(redis_store)
+
+    assert availability.faculty_bookings(redis_store, "Prof0", "Monday", *MINUTES_0730) == ["CS:1"]
+    assert availability.faculty_bookings(redis_store, "Prof0", "Tuesday", *MINUTES_0730) == []
+    assert availability.faculty_busy_minutes(redis_store, "Prof0", "Monday", exclude=[("CS", 1)]) == \
+        availability._minute_range(*MINUTES_0825)
+
+    calendar = availability.load_faculty_calendar(redis_store, ["Prof0"], ["Monday"], exclude=[("EE", 1)])
+    assert calendar.busy("Prof0", "Monday") == availability._minute_range(*MINUTES_0730)
+
+    availability.clear_faculty_busy(redis_store, "EE", 1)
+    _aggregates_match(redis_store)
+    assert availability.faculty_bookings(redis_store, "Prof0", "Monday", *MINUTES_0825) == []
+    availability.clear_faculty_busy(redis_store, "CS", 1)
+    assert list(redis_store.scan_iter("faculty_busy:*")) == []
+
+
+def test_hash_without_aggregate_is_read_in_full(redis_store):
+    redis_store.hset(availability.faculty_day_key("Prof0", "Monday"), "CS:1", format(1 << 460, "x"))
+    assert availability.faculty_bookings(redis_store, "Prof0", "Monday", *MINUTES_0730) == ["CS:1"]
+    assert availability.faculty_busy_minutes(redis_store, "Prof0", "Monday") == 1 << 460
+
+
+def test_deleting_a_timetable_clears_its_bookings(redis_store, slot_model, monkeypatch):
+    availability.publish_faculty_busy(redis_store, "CS", 1, MONDAY_0730, slot_model)
+    redis_store.set("tt:CS:1:layout", "{}")
+    timetable = SimpleNamespace(department_name="CS", semester_number=1)
+    db = SimpleNamespace(delete=lambda row: None, flush=lambda: None, commit=lambda: None, rollback=lambda: None)
+    monkeypatch.setattr(crud_timetables, "get_timetable", lambda db, timetable_id: timetable)
+
+    timetables_router.delete_timetable(7, db)
+
+    assert availability.faculty_bookings(redis_store, "Prof0", "Monday", *MINUTES_0730) == []
+
+
+def test_failed_index_update_keeps_the_row():
+    calls = []
+    db = SimpleNamespace(delete=lambda row: calls.append("delete"), flush=lambda: calls.append("flush"),
+                         commit=lambda: calls.append("commit"), rollback=lambda: calls.append("rollback"))
+
+    def _fail():
+        raise ConnectionError("redis down")
+
+    with pytest.raises(ConnectionError):
+        crud_timetables.delete_timetable(db, object(), on_delete=_fail)
+    assert calls == ["delete", "flush", "rollback"]
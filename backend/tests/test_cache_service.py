@@ -0,0 +1,13 @@
+from app.services import cache_service, timetable_service
+from conftest import make_needs
+
+
+def test_repeated_generation_hits_cache(redis_store, store_timetable):
+    dept, sem = store_timetable("CS", 3, make_needs(1, courses=4, faculty=2))
+
+    first = timetable_service.generate_timetable(None, dept, sem, precheck=False)
+    second = timetable_service.generate_timetable(None, dept, sem, precheck=False)
+
+    stats = cache_service.cache_stats(redis_store)
+    assert (stats["misses"], stats["hits"]) == (1, 1)
+    assert second["grid"] == first["grid"]
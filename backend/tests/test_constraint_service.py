@@ -0,0 +1,83 @@
+import pytest
+
+from app.services import timetable_service
+from app.services.constraint_service import (
+    ConstraintValidationError, compile_constraints, compile_needs
+)
+from app.services.layout_service import compile_slot_model
+from conftest import make_layout, make_needs
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+
+@pytest.fixture
+def slot_model():
+    return compile_slot_model(make_layout()["layout"])
+
+
+def test_constraints_compile_to_slot_and_window_masks(slot_model):
+    windows = [w.label for w in slot_model.windows(2)]
+    compiled = compile_constraints([
+        {"day": "monday", "time": "08:25-09:20", "type": "lecture"},
+        {"day": "Monday", "time": "12:45-13:40", "type": "lecture"},
+        {"day": "Friday", "time": "09:50-11:40", "type": "lab"},
+        {"day": "Tuesday", "time": "07:30-09:20"},
+    ], DAYS, slot_model, 2)
+
+    assert compiled.errors == []
+    assert [(e.day, e.type) for e in compiled.entries] == [
+        ("Monday", "lecture"), ("Monday", "lecture"), ("Friday", "lab"), ("Tuesday", None)
+    ]
+    assert compiled.lecture_masks[0] == 1 << 1 | 1 << 7
+    assert compiled.lab_masks[4] == 1 << windows.index("09:50-11:40")
+    # An untyped time may name a lab window
+    assert compiled.lab_masks[1] == 1 << windows.index("07:30-09:20")
+    assert compiled.lecture_masks[1] == 0
+
+
+@pytest.mark.parametrize("entry, reason", [
+    ({"day": "Funday", "time": "07:30-08:25", "type": "lecture"}, "unknown day"),
+    ({"day": "Sunday", "time": "07:30-08:25", "type": "lecture"}, "not a working day"),
+    ({"day": "Monday", "time": "07:30-08:25", "type": "seminar"}, "unknown type 'seminar'"),
+    ({"day": "Monday", "time": "09:20-09:50", "type": "lecture"}, "not a lecture slot"),
+    ({"day": "Monday", "time": "07:30-09:20", "type": "lecture"}, "not a lecture slot"),
+    ({"day": "Monday", "time": "07:30-08:25", "type": "lab"}, "not a 2-slot lab window"),
+    ({"day": "Monday", "time": "07:00-08:00"}, "not a lecture slot or lab window"),
+])
+def test_unresolvable_constraints_are_reported(slot_model, entry, reason):
+    compiled = compile_constraints([entry, {"day": "Monday", "time": "07:30-08:25", "type": "lecture"}],
+                                   DAYS, slot_model, 2)
+
+    assert compiled.errors == [{"day": entry["day"], "time": entry["time"], "type": entry.get("type"),
+                                "reason": reason}]
+    assert len(compiled.entries) == 1
+
+
+def test_needs_are_compiled_once_per_layout(slot_model):
+    needs = make_needs(5, courses=3, constrained=1.0)
+    compile_needs(needs, DAYS, slot_model, 2)
+    compiled = [c.compiled for c in needs]
+
+    compile_needs(needs, DAYS, slot_model, 2)
+    assert all(c.compiled is before for c, before in zip(needs, compiled))
+
+    compile_needs(needs, DAYS[:5], slot_model, 2)
+    assert all(c.compiled.key[0] == tuple(DAYS[:5]) for c in needs)
+
+
+def test_generation_rejects_invalid_constraints(store_timetable):
+    needs = make_needs(6, courses=4, faculty=3)
+    needs[1].constraints = [{"day": "Sunday", "time": "07:30-08:25", "type": "lecture"}]
+    dept, sem = store_timetable("CS", 3, needs)
+
+    with pytest.raises(ConstraintValidationError) as excinfo:
+        timetable_service.generate_timetable(None, dept, sem)
+
+    assert excinfo.value.errors == [{"course_name": needs[1].course_name, "faculty_name": needs[1].faculty_name,
+                                     "day": "Sunday", "time": "07:30-08:25", "type": "lecture",
+                                     "reason": "not a working day"}]
+    assert "dept=CS, sem=3" in str(excinfo.value)
+
+    # Without the precheck the unusable entry is left out, which leaves the course no slot at all
+    result = timetable_service.generate_timetable(None, dept, sem, precheck=False)
+    assert f"Could not place {needs[1].course_name} (lecture) for {needs[1].faculty_name}" in result["conflicts"]
@@ -0,0 +1,65 @@
+import json
+import time
+
+from app.services import event_service
+from app.services.event_service import EventStream, events_channel, sse_events
+
+
+def _parse(chunk):
+    event, data = chunk.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def test_finished_job_gets_only_the_snapshot_and_end(redis_store):
+    job = {"id": "j1", "status": "done"}
+
+    assert [_parse(c) for c in sse_events(redis_store, "j1", lambda: job)] == [
+        ("status", job), ("end", {"status": "done"})
+    ]
+
+
+def test_stream_relays_batches_until_the_end_message(redis_store):
+    stream = sse_events(redis_store, "j2", lambda: {"id": "j2", "status": "running"})
+    assert _parse(next(stream))[0] == "status"
+
+    events = EventStream(redis_store, events_channel("j2"))
+    events.emit("placed", course="Course0", day="Monday")
+    events.emit("placed", course="Course1", day="Tuesday")
+    events.close(status="done")
+
+    chunks = [_parse(c) for c in stream]
+    assert chunks[-1] == ("end", {"status": "done"})
+    placed = [e["course"] for name, batch in chunks[:-1] for e in batch["events"]]
+    assert [name for name, _ in chunks[:-1]] == ["batch"] * len(chunks[:-1])
+    assert placed == ["Course0", "Course1"]
+
+
+def test_stream_ends_when_the_job_fails_without_an_end_message(redis_store):
+    states = iter(["running", "running", "failed"])
+    started = time.monotonic()
+
+    chunks = [_parse(c) for c in sse_events(redis_store, "j3", lambda: {"id": "j3", "status": next(states)})]
+
+    assert [name for name, _ in chunks] == ["status", "end"]
+    assert chunks[-1][1] == {"status": "failed"}
+    assert time.monotonic() - started < 5
+
+
+def test_stream_ends_when_the_job_expires(redis_store):
+    jobs = iter([{"id": "j4", "status": "running"}, None])
+
+    chunks = [_parse(c) for c in sse_events(redis_store, "j4", lambda: next(jobs))]
+
+    assert chunks[-1] == ("end", {"status": None})
+
+
+def test_events_without_subscribers_are_dropped(redis_store, monkeypatch):
+    published = []
+    monkeypatch.setattr(redis_store, "publish", lambda channel, message: published.append(message))
+    events = EventStream(redis_store, events_channel("j5"))
+
+    for i in range(event_service.MAX_BATCH + 10):
+        events.emit("placed", course=f"Course{i}")
+    events.flush()
+
+    assert published == []
@@ -0,0 +1,69 @@
+import random
+
+from app.services import timetable_service
+from app.services.explanation_service import blocking_core
+from app.services.timetable_service import CourseNeed
+from conftest import make_layout, make_needs
+
+
+def _random_candidates(rnd):
+    kinds = ("placement", "faculty_booking", "lab_spread", "constraints")
+    blockers = [(rnd.choice(kinds), i) for i in range(rnd.randint(1, 12))]
+    return [set(rnd.sample(blockers, rnd.randint(1, len(blockers)))) for _ in range(rnd.randint(1, 15))]
+
+
+def test_blocking_core_blocks_every_candidate_and_is_minimal():
+    rnd = random.Random(7)
+    for _ in range(500):
+        candidates = _random_candidates(rnd)
+        core = set(blocking_core(candidates))
+
+        assert all(blockers & core for blockers in candidates)
+        for blocker in core:
+            # Relaxing this blocker alone opens at least one candidate
+            assert any(blockers & core == {blocker} for blockers in candidates)
+
+
+def test_blocking_core_prefers_to_keep_constraints():
+    candidates = [{("placement", 1), ("constraints",)}, {("placement", 2), ("constraints",)}]
+
+    assert blocking_core(candidates) == [("constraints",)]
+
+
+def _lecture(name, faculty, constraints):
+    return CourseNeed(course_name=name, course_code=name, credits=3, faculty_name=faculty, theory=True,
+                      practical=False, t_hours=1, tu_hours=0, p_hours=0, num_sublabs=0, division_names=[],
+                      constraints=constraints)
+
+
+def test_explanation_names_the_constraint_and_the_competing_placement():
+    layout = make_layout()
+    monday = [{"day": "Monday", "time": "07:30-08:25", "type": "lecture"}]
+    outcome = timetable_service.build_schedule(
+        layout["layout"], layout["grid"], [_lecture("First", "Prof0", monday), _lecture("Second", "Prof1", monday)],
+        explain=True
+    )
+
+    explanation, = outcome.explanations
+    assert explanation["placeable_now"] is False
+    assert explanation["candidates"] >= 1
+    blocking = {b["kind"]: b for b in explanation["blocking"]}
+    assert sorted(blocking) == ["constraints", "placement"]
+    assert blocking["constraints"]["course_name"] == explanation["course_name"]
+    assert blocking["constraints"]["allowed"] == ["Monday 07:30-08:25"]
+    other = blocking["placement"]
+    assert {other["course_name"], explanation["course_name"]} == {"First", "Second"}
+    assert (other["day"], other["slots"]) == ("Monday", ["07:30-08:25"])
+
+
+def test_every_unplaced_task_is_explained():
+    layout = make_layout()
+    outcome = timetable_service.build_schedule(
+        layout["layout"], layout["grid"], make_needs(3, courses=16, faculty=5, divisions=("A", "B", "C")),
+        explain=True, seed=1
+    )
+
+    assert outcome.unplaced
+    assert sum(e["missing"] for e in outcome.explanations) == len(outcome.unplaced)
+    for e in outcome.explanations:
+        assert e["placeable_now"] or e["blocking"]
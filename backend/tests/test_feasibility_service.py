@@ -0,0 +1,101 @@
+import pytest
+
+from app.services import timetable_service
+from app.services.feasibility_service import InfeasibleScheduleError
+from app.services.layout_service import _minutes
+from app.services.occupancy_service import FacultyCalendar
+from app.services.timetable_service import CourseNeed
+from conftest import LECTURE_TIMES, make_layout, make_needs
+
+
+def _need(name, faculty, t_hours=0, p_hours=0, divisions=(), constraints=()):
+    return CourseNeed(course_name=name, course_code=name, credits=3, faculty_name=faculty, theory=t_hours > 0,
+                      practical=p_hours > 0, t_hours=t_hours, tu_hours=0, p_hours=p_hours,
+                      num_sublabs=len(divisions), division_names=list(divisions), constraints=list(constraints))
+
+
+def _check(needs, calendar=None):
+    layout = make_layout()
+    return timetable_service.check_schedule_feasibility(layout["layout"], layout["grid"], needs, calendar)
+
+
+def _overloads(report):
+    return [(o.kind, o.name, o.demand, o.supply, o.unit) for o in report.overloads]
+
+
+def test_schedulable_inputs_pass():
+    report = _check(make_needs(1, courses=4, faculty=4))
+
+    assert report.feasible
+    assert report.to_dict()["overloads"] == []
+
+
+def test_faculty_with_more_lectures_than_slots():
+    report = _check([_need(f"C{i}", "Solo", t_hours=4) for i in range(10)])
+
+    assert ("faculty", "Solo", 40, 36, "slots") in _overloads(report)
+    assert ("grid", "slots", 40, 36, "slots") in _overloads(report)
+    assert next(o for o in report.overloads if o.kind == "faculty").courses == [f"C{i}" for i in range(10)]
+
+
+def test_constrained_course_with_too_few_allowed_slots():
+    only_monday = [{"day": "Monday", "time": "07:30-08:25", "type": "lecture"}]
+
+    report = _check([_need("Narrow", "Prof0", t_hours=3, constraints=only_monday)])
+
+    assert _overloads(report) == [("assignment", "Narrow (lecture)", 3, 1, "slots")]
+
+
+def test_slot_every_constrained_course_has_to_use():
+    monday = [{"day": "Monday", "time": "07:30-08:25", "type": "lecture"}]
+
+    report = _check([_need("First", "Prof0", t_hours=1, constraints=monday),
+                     _need("Second", "Prof1", t_hours=1, constraints=monday)])
+
+    slot, = report.overloads
+    assert (slot.kind, slot.name, slot.courses) == ("slot", "Monday 07:30-08:25", ["First", "Second"])
+
+
+def test_division_with_more_lab_blocks_than_windows():
+    report = _check([_need(f"Lab{i}", f"Prof{i}", p_hours=2, divisions=("A",)) for i in range(19)])
+
+    assert ("division", "A", 19, 18, "lab blocks") in _overloads(report)
+
+
+def test_time_booked_in_other_timetables_counts():
+    calendar = FacultyCalendar()
+    whole_morning = ((1 << (_minutes("13:40") - _minutes("07:30"))) - 1) << _minutes("07:30")
+    for day in ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday"):
+        calendar.occupy("Busy", day, whole_morning)
+
+    needs = [_need(f"Elsewhere{i}", "Busy", t_hours=4) for i in range(2)]
+
+    assert _check(needs).feasible
+    assert ("faculty", "Busy", 8, len(LECTURE_TIMES), "slots") in _overloads(_check(needs, calendar))
+
+
+def test_never_rejects_what_the_solver_schedules():
+    layout = make_layout()
+    scheduled = 0
+    for seed in range(8):
+        for constrained in (0.0, 0.4):
+            needs = make_needs(seed, courses=6, faculty=4, constrained=constrained)
+            outcome = timetable_service.build_schedule(layout["layout"], layout["grid"], needs,
+                                                       solver="backtracking", seed=1)
+            if not outcome.unplaced:
+                scheduled += 1
+                assert _check(needs).feasible, (seed, constrained)
+
+    assert scheduled >= 4
+
+
+def test_generation_is_rejected_before_the_cache_is_read(store_timetable, monkeypatch):
+    dept, sem = store_timetable("CS", 3, [_need(f"C{i}", "Solo", t_hours=4) for i in range(10)])
+    timetable_service.generate_timetable(None, dept, sem, precheck=False)
+    monkeypatch.setattr(timetable_service, "get_cached", lambda *args: pytest.fail("cache consulted"))
+
+    with pytest.raises(InfeasibleScheduleError) as excinfo:
+        timetable_service.generate_timetable(None, dept, sem)
+
+    assert excinfo.value.where == "dept=CS, sem=3"
+    assert excinfo.value.report.to_dict()["feasible"] is False
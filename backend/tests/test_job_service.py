@@ -0,0 +1,118 @@
+import time
+
+import pytest
+import redis
+
+from app.services import job_service
+from app.services.feasibility_service import FeasibilityReport, InfeasibleScheduleError, Overload
+
+
+@pytest.fixture
+def claimed_job(redis_store):
+    job_id = job_service.submit_job(job_service.GENERATE_TIMETABLE, {"dept": "CS", "sem": 3})
+    assert job_service._claim(redis_store) == job_id
+    return job_id
+
+
+def _expire_lease(r, job_id):
+    r.hset(job_service.job_key(job_id), "lease_until", time.time() - 1)
+
+
+def test_expired_lease_is_requeued(redis_store, claimed_job):
+    _expire_lease(redis_store, claimed_job)
+
+    assert job_service.requeue_expired(redis_store) == 1
+    assert redis_store.lrange(job_service.QUEUE_KEY, 0, -1) == [claimed_job]
+    assert redis_store.lrange(job_service.PROCESSING_KEY, 0, -1) == []
+    assert job_service.get_job(claimed_job)["status"] == job_service.QUEUED
+
+
+def test_lease_renewed_during_requeue_keeps_the_job(redis_store, claimed_job, monkeypatch):
+    _expire_lease(redis_store, claimed_job)
+    multi = redis.client.Pipeline.multi
+
+    def heartbeat_then_multi(pipe):
+        # The heartbeat lands between reading the expired lease and MULTI
+        monkeypatch.setattr(redis.client.Pipeline, "multi", multi)
+        redis_store.hset(job_service.job_key(claimed_job), "lease_until", time.time() + job_service.LEASE_SECONDS)
+        return multi(pipe)
+
+    monkeypatch.setattr(redis.client.Pipeline, "multi", heartbeat_then_multi)
+
+    assert job_service.requeue_expired(redis_store) == 0
+    assert redis_store.lrange(job_service.PROCESSING_KEY, 0, -1) == [claimed_job]
+    assert job_service.get_job(claimed_job)["status"] == job_service.RUNNING
+
+
+def test_live_lease_is_not_requeued(redis_store, claimed_job):
+    assert job_service.requeue_expired(redis_store) == 0
+    assert redis_store.lrange(job_service.PROCESSING_KEY, 0, -1) == [claimed_job]
+
+
+def test_claim_without_a_lease_gets_one_before_any_requeue(redis_store, claimed_job):
+    redis_store.hdel(job_service.job_key(claimed_job), "lease_until")
+
+    assert job_service.requeue_expired(redis_store) == 0
+    assert float(redis_store.hget(job_service.job_key(claimed_job), "lease_until")) > time.time()
+
+
+def _handled_by(monkeypatch, handler):
+    monkeypatch.setitem(job_service._handlers, job_service.GENERATE_TIMETABLE, handler)
+
+
+def test_run_stores_progress_and_result(redis_store, claimed_job, monkeypatch):
+    def handler(params, progress, events):
+        progress("allocating", 3, 4)
+        assert job_service.get_job(claimed_job)["phase"] == "allocating"
+        return {"params": params}
+
+    _handled_by(monkeypatch, handler)
+    job_service.JobWorkerPool(1)._run(redis_store, claimed_job)
+
+    job = job_service.get_job(claimed_job)
+    assert (job["status"], job["placed"], job["total"], job["attempts"]) == (job_service.DONE, 3, 4, 1)
+    assert job["result"] == {"params": {"dept": "CS", "sem": 3}}
+    assert redis_store.lrange(job_service.PROCESSING_KEY, 0, -1) == []
+    assert redis_store.hget(job_service.job_key(claimed_job), "lease_until") is None
+    assert 0 < redis_store.ttl(job_service.job_key(claimed_job)) <= job_service.RESULT_TTL_SECONDS
+
+
+def test_run_reports_precheck_rejections(redis_store, claimed_job, monkeypatch):
+    def handler(params, progress, events):
+        raise InfeasibleScheduleError(FeasibilityReport([Overload("faculty", "Prof0", 40, 36, "slots")]))
+
+    _handled_by(monkeypatch, handler)
+    job_service.JobWorkerPool(1)._run(redis_store, claimed_job)
+
+    job = job_service.get_job(claimed_job)
+    assert job["status"] == job_service.FAILED
+    assert job["error"].startswith("InfeasibleScheduleError: ")
+    assert job["error_detail"]["feasible"] is False
+    assert job["error_detail"]["overloads"][0]["name"] == "Prof0"
+
+
+def test_run_gives_up_after_max_attempts(redis_store, claimed_job, monkeypatch):
+    _handled_by(monkeypatch, lambda params, progress, events: pytest.fail("handler ran"))
+    redis_store.hset(job_service.job_key(claimed_job), "attempts", job_service.MAX_ATTEMPTS + 1)
+
+    job_service.JobWorkerPool(1)._run(redis_store, claimed_job)
+
+    job = job_service.get_job(claimed_job)
+    assert job["status"] == job_service.FAILED
+    assert "Gave up" in job["error"]
+
+
+def test_worker_pool_runs_queued_jobs(redis_store, monkeypatch):
+    _handled_by(monkeypatch, lambda params, progress, events: params["sem"] * 2)
+    pool = job_service.JobWorkerPool(2)
+    job_ids = [job_service.submit_job(job_service.GENERATE_TIMETABLE, {"dept": "CS", "sem": sem}) for sem in (1, 2, 3)]
+    pool.start()
+    try:
+        deadline = time.time() + 10
+        while time.time() < deadline and any(job_service.get_job(j)["status"] != job_service.DONE for j in job_ids):
+            time.sleep(0.02)
+    finally:
+        pool.stop()
+
+    assert [job_service.get_job(j)["result"] for j in job_ids] == [2, 4, 6]
+    assert redis_store.llen(job_service.QUEUE_KEY) == 0
@@ -0,0 +1,81 @@
+import json
+from collections import defaultdict
+
+import pytest
+
+from app.services import timetable_service
+from app.services.feasibility_service import InfeasibleScheduleError
+from app.services.layout_service import _minutes
+from app.services.timetable_service import CourseNeed
+from conftest import make_layout, make_needs
+
+
+def _booked_minutes(r, pairs):
+    """(faculty, day) -> [(start, end, pair)] of every cell they teach in"""
+    booked = defaultdict(set)
+    for dept, sem in pairs:
+        grid = json.loads(r.get(f"tt:{dept}:{sem}:layout"))["grid"]
+        for day, day_slots in grid.items():
+            for label, cells in day_slots.items():
+                for a in cells or []:
+                    if a.get("type") in ("lecture", "lab"):
+                        start, end = (_minutes(t) for t in label.split("-"))
+                        booked[a["faculty_name"], day].add((start, end, (dept, sem)))
+    return booked
+
+
+def _clashes(booked):
+    return [
+        (faculty, day, a, b) for (faculty, day), cells in booked.items()
+        for a in cells for b in cells if a[2] < b[2] and a[0] < b[1] and b[0] < a[1]
+    ]
+
+
+@pytest.fixture
+def shared_faculty(store_timetable):
+    """Three timetables on two layouts drawing on the same four faculty members"""
+    return [
+        store_timetable("CS", 3, make_needs(41, courses=5, faculty=4, prefix="CsA")),
+        store_timetable("CS", 5, make_needs(42, courses=5, faculty=4, prefix="CsB"), make_layout(start="08:00")),
+        store_timetable("IT", 3, make_needs(43, courses=5, faculty=4, prefix="ItA")),
+    ]
+
+
+def test_separate_generation_double_books_shared_faculty(redis_store, shared_faculty):
+    for dept, sem in shared_faculty:
+        timetable_service.generate_timetable(None, dept, sem, precheck=False, use_cache=False)
+
+    assert _clashes(_booked_minutes(redis_store, shared_faculty))
+
+
+def test_joint_generation_books_each_faculty_minute_once(redis_store, shared_faculty):
+    results = timetable_service.generate_joint_timetables(None, shared_faculty)
+
+    assert [(r["department_name"], r["semester_number"]) for r in results] == shared_faculty
+    booked = _booked_minutes(redis_store, shared_faculty)
+    assert booked
+    assert _clashes(booked) == []
+
+
+def _lectures_only(prefix, faculty, courses, hours):
+    return [
+        CourseNeed(course_name=f"{prefix}{i}", course_code=f"{prefix}{i}", credits=3, faculty_name=faculty,
+                   theory=True, practical=False, t_hours=hours, tu_hours=0, p_hours=0, num_sublabs=0,
+                   division_names=[], constraints=[])
+        for i in range(courses)
+    ]
+
+
+def test_joint_precheck_rejects_faculty_overbooked_across_timetables(redis_store, store_timetable):
+    # 20 lecture hours fit one 36-cell grid, 40 do not fit the same hours shared by two
+    pairs = [store_timetable("CS", 3, _lectures_only("CsA", "Shared", 5, 4)),
+             store_timetable("IT", 3, _lectures_only("ItA", "Shared", 5, 4))]
+    timetable_service.generate_timetable(None, *pairs[0], use_cache=False)
+
+    with pytest.raises(InfeasibleScheduleError) as excinfo:
+        timetable_service.generate_joint_timetables(None, pairs)
+
+    overload, = excinfo.value.report.overloads
+    assert (overload.kind, overload.name, overload.unit) == ("faculty", "Shared", "minutes")
+    assert overload.demand == 40 * 55 and overload.supply == 36 * 55
+    assert sorted(overload.courses) == [f"{p}{i}" for p in ("CsA", "ItA") for i in range(5)]
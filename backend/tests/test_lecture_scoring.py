@@ -0,0 +1,22 @@
+import json
+
+import pytest
+
+from app.services import timetable_service
+from conftest import make_layout, make_needs
+
+
+@pytest.mark.parametrize("seed", [None, 1, 2, 3])
+@pytest.mark.parametrize("scenario", [(11, 6, 3, 0.0), (12, 10, 5, 0.3), (13, 14, 6, 0.5)])
+def test_vectorized_scoring_matches_reference(monkeypatch, scenario, seed):
+    layout = make_layout()
+    grids = []
+    for vectorized in (True, False):
+        monkeypatch.setattr(timetable_service, "VECTORIZED_LECTURE_SCORING", vectorized)
+        outcome = timetable_service.build_schedule(
+            layout["layout"], layout["grid"], make_needs(*scenario[:3], constrained=scenario[3]),
+            seed=seed, reproducible=True
+        )
+        grids.append(json.dumps(timetable_service.serialize_grid(outcome.grid), sort_keys=True))
+
+    assert grids[0] == grids[1]
@@ -0,0 +1,36 @@
+import multiprocessing
+import time
+
+from app.services import multistart_service
+
+
+def _start(value: int, seed: int) -> int:
+    # The first start is quick; the others would run far past any deadline
+    if seed:
+        time.sleep(30)
+    return value + seed
+
+
+def _quick_start(value: int, seed: int) -> int:
+    return value - seed % 2
+
+
+def test_tight_deadline_stops_running_starts():
+    started = time.perf_counter()
+    outcome, finished = multistart_service.run_multistart(
+        _start, {"value": 1}, [0, 1, 2], key=lambda outcome: outcome, workers=2, deadline_ms=200
+    )
+
+    assert (outcome, finished) == (1, 1)
+    assert time.perf_counter() - started < 10
+    assert multiprocessing.active_children() == []
+
+
+def test_without_deadline_every_start_counts():
+    outcome, finished = multistart_service.run_multistart(
+        _quick_start, {"value": 10}, [0, 1, 2, 3], key=lambda outcome: outcome, workers=2, deadline_ms=None
+    )
+    multistart_service.shutdown_pool()
+
+    assert (outcome, finished) == (9, 4)
+    assert multiprocessing.active_children() == []
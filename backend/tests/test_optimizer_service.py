@@ -0,0 +1,67 @@
+import json
+from collections import Counter
+
+import pytest
+
+from app.services import optimizer_service, timetable_service
+from conftest import activities, make_layout, make_needs
+
+SCENARIOS = [(31, 6, 4, 0.0), (32, 8, 5, 0.3), (33, 7, 4, 0.0)]
+
+
+def _build(scenario, **kwargs):
+    layout = make_layout()
+    needs = make_needs(scenario[0], courses=scenario[1], faculty=scenario[2], constrained=scenario[3])
+    return timetable_service.build_schedule(layout["layout"], layout["grid"], needs, seed=5, reproducible=True,
+                                            **kwargs)
+
+
+def _content(outcome):
+    """What was scheduled, regardless of where"""
+    return Counter((course, t, division, faculty) for _, _, course, t, division, faculty in
+                   activities(timetable_service.serialize_grid(outcome.grid)))
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_local_search_keeps_the_schedule_and_never_lowers_the_score(monkeypatch, scenario):
+    runs = []
+    real = timetable_service.optimize_schedule
+    monkeypatch.setattr(timetable_service, "optimize_schedule",
+                        lambda *args, **kwargs: runs.append(real(*args, **kwargs)) or runs[-1])
+
+    base = _build(scenario)
+    assert runs == []
+    improved = _build(scenario, optimize_ms=50)
+
+    assert len(runs) == 1
+    assert improved.score >= base.score
+    assert _content(improved) == _content(base)
+    assert improved.unplaced == base.unplaced
+    # No faculty double booked after the moves
+    placed = activities(timetable_service.serialize_grid(improved.grid))
+    assert max(Counter((d, slot, f) for d, slot, _, _, _, f in placed).values()) == 1
+
+
+def test_local_search_improves_a_greedy_grid():
+    assert _build(SCENARIOS[0], optimize_ms=50).score > _build(SCENARIOS[0]).score
+
+
+def test_local_search_is_reproducible():
+    grids = [json.dumps(timetable_service.serialize_grid(_build(SCENARIOS[1], optimize_ms=20).grid),
+                        sort_keys=True) for _ in range(2)]
+
+    assert grids[0] == grids[1]
+
+
+def test_local_search_stops_once_it_stalls(monkeypatch):
+    runs = []
+    real = timetable_service.optimize_schedule
+    monkeypatch.setattr(timetable_service, "optimize_schedule",
+                        lambda *args, **kwargs: runs.append(real(*args, **kwargs)) or runs[-1])
+
+    _build(SCENARIOS[0], optimize_ms=100)
+
+    result, = runs
+    assert result.stalled
+    assert optimizer_service.STALL_ITERATIONS <= result.iterations < 100 * optimizer_service.OPTIMIZE_ITERATIONS_PER_MS
+    assert result.final_score >= result.initial_score
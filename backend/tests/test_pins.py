@@ -0,0 +1,71 @@
+import json
+
+from app.services import timetable_service
+from app.services.layout_service import compile_slot_model
+from conftest import LECTURE_TIMES, make_layout, make_needs
+
+BREAK_SLOTS = {"09:20-09:50": "Recess", "11:40-11:50": "Short"}
+
+
+def _stored_grid(r, dept, sem):
+    return json.loads(r.get(f"tt:{dept}:{sem}:layout"))["grid"]
+
+
+def _lectures(grid, course_name):
+    return sorted(
+        (day, label) for day, day_slots in grid.items() for label, cells in day_slots.items()
+        for a in cells or [] if a.get("type") == "lecture" and a.get("course_name") == course_name
+    )
+
+
+def test_pinned_lecture_survives_regeneration(redis_store, store_timetable):
+    needs = make_needs(21, courses=6, faculty=4)
+    dept, sem = store_timetable("CS", 5, needs)
+    timetable_service.generate_timetable(None, dept, sem, precheck=False)
+
+    # Move one lecture by hand to a slot the allocator would not pick, then pin it there
+    grid = _stored_grid(redis_store, dept, sem)
+    course = needs[0]
+    day, label = _lectures(grid, course.course_name)[0]
+    lecture = next(a for a in grid[day][label] if a.get("type") == "lecture")
+    grid[day][label] = [a for a in grid[day][label] if a is not lecture]
+    target_day, target = next(
+        (d, t) for d in reversed(list(grid)) for t in reversed(LECTURE_TIMES)
+        if d != day and not grid[d][t]
+    )
+    grid[target_day][target] = [lecture]
+    stored = json.loads(redis_store.get(f"tt:{dept}:{sem}:layout"))
+    redis_store.set(f"tt:{dept}:{sem}:layout", json.dumps({**stored, "grid": grid}))
+    assert timetable_service.pin_activities(dept, sem, target_day, target, course.course_name)
+
+    for _ in range(2):
+        timetable_service.generate_timetable(None, dept, sem, precheck=False)
+        grid = _stored_grid(redis_store, dept, sem)
+        assert [a.get("protected") for a in grid[target_day][target]] == [True]
+        assert len(_lectures(grid, course.course_name)) == course.t_hours
+
+    assert [p["day"] for p in timetable_service.pinned_activities(dept, sem)] == [target_day]
+
+
+def test_regeneration_keeps_breaks_on_the_layout(redis_store, store_timetable):
+    dept, sem = store_timetable("CS", 5, make_needs(22, courses=10, faculty=5, divisions=("A", "B", "C")))
+    for _ in range(3):
+        timetable_service.generate_timetable(None, dept, sem, precheck=False)
+        for day, day_slots in _stored_grid(redis_store, dept, sem).items():
+            for label, cells in day_slots.items():
+                breaks = [a.get("name") for a in cells or [] if a.get("type") == "break"]
+                assert breaks == ([BREAK_SLOTS[label]] if label in BREAK_SLOTS else []), (day, label)
+                if label in BREAK_SLOTS:
+                    assert len(cells) == 1
+
+
+def test_saturday_pass_never_moves_a_break():
+    layout = make_layout()
+    slot_model = compile_slot_model(layout["layout"])
+    grid = json.loads(json.dumps(layout["grid"]))
+    occupancy = timetable_service._occupancy_for_grid(grid, slot_model)
+
+    assert timetable_service._optimize_saturday_schedule(grid, occupancy) == 0
+    for label, name in BREAK_SLOTS.items():
+        assert grid["Saturday"][label] == [{"type": "break", "name": name}]
+    assert all(not cells for label, cells in grid["Friday"].items() if label not in BREAK_SLOTS)
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from app.services import timetable_service
+from app.services.timetable_service import apply_assignment_delta
+from conftest import activities, make_needs
+
+ROWS = [
+    {"course_name": "Maths", "faculty_name": "Prof0", "theory": True, "practical": False, "number_of_sublabs": 2,
+     "division_names": ["A", "B"], "constraints": []},
+    {"course_name": "Physics", "faculty_name": "Prof1", "theory": True, "practical": True, "number_of_sublabs": 2,
+     "division_names": ["A", "B"], "constraints": []},
+]
+
+
+def test_delta_adds_updates_and_removes_rows():
+    rows, old, new = apply_assignment_delta(ROWS, {"action": "add", "course_name": "Chemistry",
+                                                   "faculty_name": "Prof2", "theory": True})
+    assert old is None and rows[-1] is new
+    assert (new["theory"], new["practical"], new["division_names"]) == (True, False, ["A", "B"])
+
+    rows, old, new = apply_assignment_delta(ROWS, {"action": "update", "course_name": " maths ",
+                                                   "faculty_name": "Prof0", "new_faculty_name": "Prof3"})
+    assert old is ROWS[0] and new == {**ROWS[0], "faculty_name": "Prof3"} and rows[1:] == ROWS[1:]
+
+    rows, old, new = apply_assignment_delta(ROWS, {"action": "remove", "course_name": "Physics",
+                                                   "faculty_name": "Prof1"})
+    assert (rows, old, new) == (ROWS[:1], ROWS[1], None)
+    assert len(ROWS) == 2
+
+
+@pytest.mark.parametrize("delta, message", [
+    ({"action": "rename", "course_name": "Maths", "faculty_name": "Prof0"}, "Unknown action"),
+    ({"action": "add", "course_name": "Maths", "faculty_name": "Prof0"}, "already assigned"),
+    ({"action": "remove", "course_name": "Maths", "faculty_name": "Prof9"}, "not assigned"),
+    ({"action": "update", "course_name": "Maths", "faculty_name": "Prof0", "new_faculty_name": "Prof0x"}, "Prof0x is already assigned"),
+])
+def test_delta_errors(delta, message):
+    rows = ROWS + [{**ROWS[0], "faculty_name": "Prof0x"}]
+    with pytest.raises(ValueError, match=message):
+        apply_assignment_delta(rows, delta)
+
+
+def _stored(r, dept, sem):
+    return activities(json.loads(r.get(f"tt:{dept}:{sem}:layout"))["grid"])
+
+
+def test_repair_only_touches_the_changed_assignment(redis_store, store_timetable):
+    needs = make_needs(51, courses=5, faculty=4)
+    dept, sem = store_timetable("CS", 3, needs)
+    timetable_service.generate_timetable(None, dept, sem)
+    before = _stored(redis_store, dept, sem)
+    course = needs[2]
+
+    result = timetable_service.repair_timetable(None, dept, sem, {
+        "action": "update", "course_name": course.course_name, "faculty_name": course.faculty_name,
+        "new_faculty_name": "Visiting"
+    })
+
+    after = _stored(redis_store, dept, sem)
+    untouched = [a for a in before if a[2] != course.course_name]
+    assert [a for a in after if a[2] != course.course_name] == untouched
+    moved = [a for a in after if a[2] == course.course_name]
+    assert moved and {a[5] for a in moved} == {"Visiting"}
+    assert {p["faculty_name"] for p in result["removed"]} == {course.faculty_name}
+    assert {p["faculty_name"] for p in result["placed"]} == {"Visiting"}
+
+    rows = json.loads(redis_store.get(f"tt:{dept}:{sem}:faculty"))
+    assert [r["faculty_name"] for r in rows if r["course_name"] == course.course_name] == ["Visiting"]
+
+
+def test_repair_removing_an_assignment_frees_its_cells(redis_store, store_timetable):
+    needs = make_needs(52, courses=5, faculty=4)
+    dept, sem = store_timetable("CS", 3, needs)
+    timetable_service.generate_timetable(None, dept, sem)
+    before = _stored(redis_store, dept, sem)
+
+    timetable_service.repair_timetable(None, dept, sem, {
+        "action": "remove", "course_name": needs[0].course_name, "faculty_name": needs[0].faculty_name
+    })
+
+    assert _stored(redis_store, dept, sem) == [a for a in before if a[2] != needs[0].course_name]
+
+
+def test_repair_needs_a_generated_timetable(store_timetable):
+    dept, sem = store_timetable("CS", 3, make_needs(53, courses=3))
+
+    with pytest.raises(ValueError, match="No timetable has been generated"):
+        timetable_service.repair_timetable(None, dept, sem, {"action": "remove", "course_name": "Course0",
+                                                             "faculty_name": "Prof0"})
@@ -0,0 +1,43 @@
+from collections import defaultdict
+
+import pytest
+
+from app.services import timetable_service
+from app.services.layout_service import compile_slot_model
+from app.services.occupancy_service import FacultyCalendar
+from conftest import make_layout, make_needs
+
+
+def _held(grid):
+    """{day: {slot: faculty names}} of the activities actually in ``grid``"""
+    held = defaultdict(lambda: defaultdict(set))
+    for day, day_slots in grid.items():
+        for label, cells in day_slots.items():
+            for a in cells or []:
+                if isinstance(a, dict) and a.get("type") in ("lecture", "lab"):
+                    held[day][label].add(a["faculty_name"])
+    return held
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_moved_saturday_cells_release_their_bookings(seed):
+    layout = make_layout()
+    slot_model = compile_slot_model(layout["layout"])
+    calendar = FacultyCalendar()
+    outcome = timetable_service.build_schedule(
+        layout["layout"], layout["grid"], make_needs(seed, courses=10, faculty=5, divisions=("A", "B", "C")),
+        faculty_calendar=calendar
+    )
+    held = _held(timetable_service.serialize_grid(outcome.grid))
+
+    for day, day_slots in outcome.busy_faculty.items():
+        for label, names in day_slots.items():
+            assert set(names) <= held[day][label], f"{names} booked on {day} {label} without an activity"
+
+    for faculty, day, minutes in calendar.entries():
+        booked = [i for i, label in enumerate(slot_model.labels) if faculty in held[day][label]]
+        expected = 0
+        for i in booked:
+            start, end = slot_model.start_minutes[i], slot_model.end_minutes[i]
+            expected |= ((1 << (end - start)) - 1) << start
+        assert minutes == expected, f"calendar of {faculty} on {day} holds minutes no activity takes"
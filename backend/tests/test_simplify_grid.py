@@ -0,0 +1,72 @@
+import copy
+
+import pytest
+
+from app.services import timetable_service
+from app.services.layout_service import compile_slot_model
+from conftest import make_layout, make_needs
+
+
+def _lab(course, faculty, division):
+    return {"type": "lab", "course_name": course, "faculty_name": faculty, "division": division,
+            "display": f"{course} ({division}) - {faculty}"}
+
+
+def _lecture(course, faculty):
+    return {"type": "lecture", "course_name": course, "faculty_name": faculty, "display": f"{course} - {faculty}"}
+
+
+def _grid():
+    grid = {day: {label: [cell] if cell else [] for label, cell in slots.items()}
+            for day, slots in make_layout()["grid"].items()}
+    monday = grid["Monday"]
+    # Two parallel labs of one course plus another course across the first window
+    for label in ("07:30-08:25", "08:25-09:20"):
+        monday[label] = [_lab("Course1", "Prof1", "B"), _lab("Course1", "Prof1", "A"), _lab("Course2", "Prof2", "B")]
+    monday["09:50-10:45"] = [_lab("Course3", "Prof3", "C")]
+    monday["10:45-11:40"] = [_lab("Course3", "Prof3", "C"), _lecture("Course4", "Prof4")]
+    # A lab cell split by a break is not a lab window
+    monday["12:45-13:40"] = [_lab("Course5", "Prof0", "A")]
+    grid["Tuesday"]["11:50-12:45"] = [_lecture("Course4", "Prof4"), _lecture("Course6", "Prof1")]
+    return grid
+
+
+def test_simplify_grid_matches_the_reference_layout():
+    grid = _grid()
+    before = copy.deepcopy(grid)
+    slot_model = compile_slot_model(make_layout()["layout"])
+
+    simplified = timetable_service.simplify_grid(grid, slot_model, 2)
+
+    assert grid == before
+    assert simplified["Monday"] == {
+        "07:30-09:20": ["A, B - Course1 - Prof1", "B - Course2 - Prof2"],
+        "09:20-09:50": "Recess",
+        "09:50-11:40": ["C - Course3 - Prof3"],
+        "11:40-11:50": "Short",
+        "12:45-13:40": ["Course5 (A) - Prof0"],
+    }
+    assert list(simplified["Monday"]) == ["07:30-09:20", "09:20-09:50", "09:50-11:40", "11:40-11:50", "12:45-13:40"]
+    assert simplified["Tuesday"] == {"09:20-09:50": "Recess", "11:40-11:50": "Short", "11:50-12:45": "Course4 - Prof4"}
+
+
+def test_simplify_grid_sorts_foreign_labels_by_start():
+    grid = _grid()
+    grid["Tuesday"]["08:00-08:30"] = [_lecture("Course7", "Prof2")]
+    slot_model = compile_slot_model(make_layout()["layout"])
+
+    simplified = timetable_service.simplify_grid(grid, slot_model, 2)
+
+    assert list(simplified["Tuesday"]) == ["08:00-08:30", "09:20-09:50", "11:40-11:50", "11:50-12:45"]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_engine_lab_masks_give_the_same_display_grid(seed):
+    layout = make_layout()
+    slot_model = compile_slot_model(layout["layout"])
+    outcome = timetable_service.build_schedule(
+        layout["layout"], layout["grid"], make_needs(seed, courses=10, faculty=5, divisions=("A", "B", "C"))
+    )
+    grid = timetable_service.serialize_grid(outcome.grid)
+
+    assert outcome.simplified_grid == timetable_service.simplify_grid(grid, slot_model, 2)
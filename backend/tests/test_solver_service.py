@@ -0,0 +1,55 @@
+from collections import Counter, defaultdict
+
+import pytest
+
+from app.services import timetable_service
+from conftest import activities, make_layout, make_needs
+
+LAB_PAIRS = [("07:30-08:25", "08:25-09:20"), ("09:50-10:45", "10:45-11:40"), ("11:50-12:45", "12:45-13:40")]
+
+
+def _assert_valid(acts, needs):
+    """No double bookings, labs on whole windows, constrained lectures only where allowed"""
+    assert max(Counter((d, slot, f) for d, slot, _, _, _, f in acts).values()) == 1
+    assert max(Counter((d, slot) for d, slot, _, t, _, _ in acts if t == "lecture").values(), default=0) <= 1
+    kinds = defaultdict(set)
+    for d, slot, _, t, _, _ in acts:
+        kinds[d, slot].add(t)
+    assert all(len(k) == 1 for k in kinds.values())
+
+    lab_cells = defaultdict(set)
+    for d, slot, course, t, division, _ in acts:
+        if t == "lab":
+            lab_cells[d, course, division].add(slot)
+    for cells in lab_cells.values():
+        assert cells == {s for pair in LAB_PAIRS if cells & set(pair) for s in pair}
+
+    allowed = {c.course_name: {(x["day"], x["time"]) for x in c.constraints if x["type"] == "lecture"}
+               for c in needs}
+    for d, slot, course, t, _, _ in acts:
+        if t == "lecture" and allowed[course]:
+            assert (d, slot) in allowed[course]
+
+
+def test_backtracking_completes_where_greedy_gives_up():
+    layout = make_layout()
+    needs = make_needs(0, courses=6, faculty=4)
+    greedy = timetable_service.build_schedule(layout["layout"], layout["grid"], needs, seed=1)
+    search = timetable_service.build_schedule(layout["layout"], layout["grid"], needs, solver="backtracking", seed=1)
+
+    assert greedy.unplaced
+    assert search.unplaced == []
+    assert search.placed > greedy.placed
+    _assert_valid(activities(timetable_service.serialize_grid(search.grid)), needs)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_backtracking_grid_is_valid(seed):
+    layout = make_layout()
+    needs = make_needs(seed, courses=7, faculty=4, constrained=0.5)
+    outcome = timetable_service.build_schedule(layout["layout"], layout["grid"], needs, solver="backtracking", seed=1)
+    acts = activities(timetable_service.serialize_grid(outcome.grid))
+
+    _assert_valid(acts, needs)
+    assert len(acts) >= outcome.placed
+
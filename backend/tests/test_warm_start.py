@@ -0,0 +1,49 @@
+from app.services import timetable_service
+from conftest import activities, make_layout, make_needs
+
+
+def _build(needs, seed, warm_start=None):
+    layout = make_layout()
+    outcome = timetable_service.build_schedule(layout["layout"], layout["grid"], needs, seed=seed,
+                                               warm_start=warm_start)
+    return outcome, activities(timetable_service.serialize_grid(outcome.grid))
+
+
+def test_warm_start_keeps_the_earlier_placements():
+    needs = make_needs(61, courses=6, faculty=4)
+    first, before = _build(needs, seed=1)
+    assert not first.unplaced
+
+    # Another seed and one course dropped: a cold run reshuffles, a warm one keeps what still applies
+    changed = make_needs(61, courses=6, faculty=4)[1:]
+    kept = [a for a in before if a[2] != needs[0].course_name]
+    _, cold = _build(changed, seed=9)
+    warm_outcome, warm = _build(changed, seed=9, warm_start=first.simplified_grid)
+
+    assert set(kept) - set(cold)
+    assert warm == kept
+    assert warm_outcome.unplaced == []
+
+
+def test_warm_start_places_new_work_around_the_kept_grid():
+    needs = make_needs(62, courses=5, faculty=4)
+    first, before = _build(needs, seed=1)
+    extra = make_needs(63, courses=1, faculty=4, prefix="Extra")
+
+    outcome, after = _build(needs + extra, seed=1, warm_start=first.simplified_grid)
+
+    assert set(before) <= set(after)
+    added = [a for a in after if a[2] == "Extra0"]
+    assert len([a for a in added if a[3] == "lecture"]) == extra[0].t_hours
+
+
+def test_generation_warm_starts_from_the_saved_timetable(store_timetable, monkeypatch):
+    needs = make_needs(64, courses=5, faculty=4)
+    dept, sem = store_timetable("CS", 3, needs)
+    saved = timetable_service.generate_timetable(None, dept, sem, seed=1, use_cache=False)
+    monkeypatch.setattr(timetable_service.crud_timetables, "get_timetable_json",
+                        lambda db, d, s, user_id=None: {"grid": saved["grid"]})
+
+    again = timetable_service.generate_timetable(None, dept, sem, seed=7, use_cache=False, warm_start=True)
+
+    assert again["grid"] == saved["grid"]